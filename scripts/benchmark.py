@@ -0,0 +1,554 @@
+"""
+Benchmarks for the site arrangement search.
+
+Run from the scripts folder:
+    python benchmark.py
+
+The benchmark builds a made-up cohort, walks the search tree with the same
+Site methods that the search uses at every node (find_potential_sites,
+order_potential_sites, validate_person, add_member and remove_member) and
+reports how many nodes are expanded per second. compare_node_rates runs the
+same walk on the scripts of an older git revision (by default the first
+commit) so that the rates before and after a change can be compared.
+
+It then compares the best arrangement of the exact search with the one found
+by the local search on cohorts small enough for both, times the search
+with and without the runtime type checks (refer to settings.py) and times
+the array-backed search of compiled.py against the default one.
+
+Finally, run_scaling_benchmark searches cohorts from generator.py over a
+grid of sizes, both through iter_site_arrangements and with
+ForwardCheckingSearch alone, and writes the time to the first arrangement,
+the total time, the number of nodes and the peak memory of each search to a
+JSON file, so that runs from different versions of the scripts can be
+compared.
+"""
+import inspect
+import json
+import os
+import random
+import subprocess
+import sys
+import tarfile
+import tempfile
+import time
+import tracemalloc
+from functools import partial
+from typing import List, Literal, Optional
+
+from classes import (DecalMember, StaffMember, SiteArrangement, SiteLeader,
+                     District, Scenario, check_all_sites_are_full,
+                     check_all_sites_are_valid, clear_all_records,
+                     create_priority_list, ids_to_sites,
+                     order_potential_sites)
+from compiled import iter_compiled_arrangements
+from generator import generate_cohort
+from local_search import improve_site_arrangement
+from settings import PRODUCTION_VARIABLE
+from stats import SearchStats
+from solver import (ForwardCheckingSearch, create_site_arrangements,
+                    iter_site_arrangements)
+
+
+# Cohorts searched by run_scaling_benchmark: 1 SL and 3-4 decal members per
+# site, with a staff member for every other site
+SCALING_GRID = [
+    {'num_site_leaders': num_sites, 'num_staff': num_sites // 2,
+     'num_nonstaff': 3 * num_sites + num_sites // 4, 'num_sites': num_sites,
+     'num_schools': max(1, num_sites // 3),
+     'num_time_slots': max(1, num_sites // 2),
+     'availability_density': 0.5, 'driver_fraction': 0.5}
+    for num_sites in [4, 8, 12, 16, 24, 32, 48]
+]
+
+BENCHMARK_TIMES = [f"{day} {slot}"
+                   for day in ["Monday", "Tuesday", "Wednesday", "Thursday"]
+                   for slot in ["2PM - 3PM", "3PM - 4PM", "4PM - 5PM"]]
+
+# Changes made to classes.py of an older revision before compare_node_rates
+# runs it. The first commit cannot be imported without them (circular import
+# with data_preprocessing, School.add_site passing the district and a wrong
+# return annotation on Site.clear). Nothing else is changed.
+RUNNABLE_FIXES = [
+    ("from data_preprocessing import initialize_empty_site_map\n", ""),
+    ("Site(name, time, self.district)", "Site(name, time, self)"),
+    ("def clear(self) -> None:", "def clear(self) -> \"Site\":")
+]
+
+# Runs build_cohort and measure_node_rate in the scripts folder of
+# compare_node_rates. Older revisions have no clear_all_records, so the
+# dictionaries of classes.py are emptied by hand there.
+NODE_RATE_RUNNER = """
+import random
+import time
+from typing import List
+
+import classes
+from classes import *
+
+if not hasattr(classes, 'clear_all_records'):
+    def clear_all_records():
+        for name in ['times_to_sites', 'ids_to_sites', 'names_to_schools',
+                     'names_to_districts', 'names_to_site_leaders',
+                     'names_to_nonSL_staff_members', 'names_to_nonstaff',
+                     'names_to_people']:
+            getattr(classes, name).clear()
+
+BENCHMARK_TIMES = {times!r}
+exec({source!r})
+for num_sites in {sizes!r}:
+    cohort = build_cohort(num_sites)
+    print(max(measure_node_rate(cohort) for _ in range(3)))
+"""
+
+
+def build_cohort(num_sites: int,
+                 seed: int = 0) -> List[DecalMember]:
+    """
+    Builds a district with num_sites sites along with 1 SL and 3 decal
+    members per site, plus a non-SL staff member for every other site.
+    Every person gets 2-3 random availabilities on top of the time of
+    "their" site so that the cohort can always be arranged.
+
+    Args:
+        num_sites (int): number of sites to create
+        seed (int): seed for the random number generator
+
+    Returns:
+        List[DecalMember]: everyone in the cohort
+    """
+    clear_all_records()
+    rng = random.Random(seed)
+    district = District("Benchmark District")
+    school = district.add_school("Benchmark Elementary")
+    site_times = [BENCHMARK_TIMES[i % len(BENCHMARK_TIMES)]
+                  for i in range(num_sites)]
+    for i, site_time in enumerate(site_times):
+        school.add_site(f"Benchmark {i}", site_time)
+
+    def availabilities(site_time: str) -> List[str]:
+        extra = rng.sample(site_times,
+                           min(rng.randint(2, 3), len(site_times)))
+        return list(dict.fromkeys([site_time] + extra))
+
+    people = []
+    for i, site_time in enumerate(site_times):
+        drives = [rng.random() < 0.5] + [rng.random() < 0.3 for _ in range(4)]
+
+        # Make sure that every site has at least one driver even without
+        # the staff member
+        if not drives[0] and not any(drives[2:]):
+            drives[0] = True
+
+        people.append(SiteLeader(f"SL {i}", drives[0],
+                                 availabilities(site_time)))
+        if i % 2 == 0:
+            people.append(StaffMember(f"Staff {i}", drives[1],
+                                      availabilities(site_time)))
+        for j in range(3):
+            people.append(DecalMember(f"Decal {i}-{j}", drives[j + 2],
+                                      availabilities(site_time)))
+    return people
+
+
+def measure_node_rate(people: List[DecalMember],
+                      max_nodes: int = 20000) -> float:
+    """
+    Walks the search tree depth-first until max_nodes nodes have been
+    expanded or the tree is exhausted.
+
+    Args:
+        people (List[DecalMember]): cohort to arrange
+        max_nodes (int): number of nodes after which the walk stops
+
+    Returns:
+        float: nodes expanded per second
+    """
+    priority_list = create_priority_list(people)
+    num_nodes = 0
+
+    def expand(depth: int) -> None:
+        nonlocal num_nodes
+        num_nodes += 1
+        if depth == len(priority_list):
+            check_all_sites_are_valid()
+            check_all_sites_are_full()
+            return
+        person = priority_list[depth]
+        for site in order_potential_sites(person,
+                                          person.find_potential_sites()):
+            if num_nodes >= max_nodes:
+                return
+            if site.validate_person(person):
+                site.add_member(person)
+                expand(depth + 1)
+                site.remove_member(person)
+
+    start_time = time.perf_counter()
+    expand(0)
+    elapsed = time.perf_counter() - start_time
+    return num_nodes / elapsed
+
+
+def measure_revision_node_rates(scripts_path: str,
+                                sizes: List[int]) -> List[float]:
+    """
+    Runs measure_node_rate on build_cohort(num_sites) for every size with
+    the scripts in scripts_path, in a new Python process with the runtime
+    type checks on. The first commit always checked types, so this keeps
+    the comparison fair.
+
+    Returns:
+        List[float]: best nodes per second of 3 runs for each size
+    """
+    source = (inspect.getsource(build_cohort) +
+              inspect.getsource(measure_node_rate))
+    output = subprocess.run(
+        [sys.executable, "-c",
+         NODE_RATE_RUNNER.format(times=BENCHMARK_TIMES, source=source,
+                                 sizes=sizes)],
+        cwd=scripts_path, env={**os.environ, PRODUCTION_VARIABLE: "0"},
+        capture_output=True, text=True, check=True).stdout
+    return [float(line) for line in output.split()]
+
+
+def export_revision(revision: str,
+                    directory: str) -> str:
+    """
+    Exports the scripts folder at a git revision with git archive and
+    applies RUNNABLE_FIXES to its classes.py.
+
+    Args:
+        revision (str): git revision
+        directory (str): folder to export to, created if needed
+
+    Returns:
+        str: path of the exported scripts folder
+    """
+    os.makedirs(directory, exist_ok=True)
+    archive_path = os.path.join(directory, "scripts.tar")
+    subprocess.run(["git", "archive", "--output", archive_path, revision,
+                    "--", "."], check=True)
+    scripts_path = os.path.join(directory, "scripts")
+    with tarfile.open(archive_path) as archive:
+        archive.extractall(scripts_path)
+
+    classes_path = os.path.join(scripts_path, "classes.py")
+    with open(classes_path) as file:
+        classes_source = file.read()
+    for old, new in RUNNABLE_FIXES:
+        classes_source = classes_source.replace(old, new)
+    with open(classes_path, "w") as file:
+        file.write(classes_source)
+    return scripts_path
+
+
+def compare_node_rates(old_revision: Optional[str] = None,
+                       new_revision: Optional[str] = None,
+                       sizes: Optional[List[int]] = None) -> None:
+    """
+    Prints the node rates of the scripts at two git revisions next to each
+    other, e.g. compare_node_rates("HEAD~1", "HEAD") for the last commit.
+    Revisions are exported with export_revision.
+
+    Args:
+        old_revision (Optional[str]): revision to compare with. None means
+                                      the first commit.
+        new_revision (Optional[str]): None means the scripts in this folder,
+                                      including uncommitted changes
+        sizes (Optional[List[int]]): numbers of sites. None means 12, 36
+                                     and 60.
+    """
+    if sizes is None:
+        sizes = [12, 36, 60]
+    if old_revision is None:
+        old_revision = subprocess.run(
+            ["git", "rev-list", "--max-parents=0", "--abbrev-commit", "HEAD"],
+            capture_output=True, text=True, check=True).stdout.split()[0]
+
+    with tempfile.TemporaryDirectory() as directory:
+        old_rates = measure_revision_node_rates(
+            export_revision(old_revision, os.path.join(directory, "old")),
+            sizes)
+        if new_revision is None:
+            new_path = os.path.dirname(os.path.abspath(__file__))
+        else:
+            new_path = export_revision(new_revision,
+                                       os.path.join(directory, "new"))
+        new_rates = measure_revision_node_rates(new_path, sizes)
+
+    print(f"Nodes per second at {old_revision} and "
+          f"{new_revision or 'now'}:")
+    for num_sites, old_rate, new_rate in zip(sizes, old_rates, new_rates):
+        print(f"{num_sites} sites: {old_rate:,.0f} before, "
+              f"{new_rate:,.0f} after ({new_rate / old_rate:.1f}x)")
+
+
+def count_full_sites(arrangement: SiteArrangement) -> int:
+    """
+    Installs an arrangement, counts its full sites and clears the sites
+    again.
+    """
+    arrangement.unfreeze()
+    num_full_sites = sum(site.is_full for site in ids_to_sites.values())
+    for site in ids_to_sites.values():
+        site.clear()
+    return num_full_sites
+
+
+def compare_local_search(num_sites: int,
+                         time_budget: float = 2.0,
+                         exact_deadline: float = 60.0) -> None:
+    """
+    Prints the number of full sites, score and time of the best arrangement
+    from the exact search and from the local search.
+
+    Args:
+        num_sites (int): number of sites in the cohort
+        time_budget (float): number of seconds given to the local search
+        exact_deadline (float): number of seconds after which the exact
+                                search stops
+    """
+    cohort = build_cohort(num_sites)
+
+    start_time = time.perf_counter()
+    exact = create_site_arrangements(cohort, 'full', top_k=1,
+                                     deadline_seconds=exact_deadline)
+    exact_time = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    local = improve_site_arrangement(cohort, time_budget, seed=0,
+                                     verbose=False)
+    local_time = time.perf_counter() - start_time
+
+    if exact:
+        print(f"{num_sites} sites, exact: {count_full_sites(exact[0])} full, "
+              f"score {exact[0].score} in {exact_time:.1f} seconds")
+    else:
+        print(f"{num_sites} sites, exact: nothing found in "
+              f"{exact_time:.1f} seconds")
+    print(f"{num_sites} sites, local: {count_full_sites(local)} full, "
+          f"score {local.score} in {local_time:.1f} seconds")
+
+
+def time_search(num_sites: int,
+                max_results: int = 200) -> float:
+    """
+    Times how long create_site_arrangements takes to find max_results
+    arrangements of a made-up cohort.
+
+    Returns:
+        float: number of seconds
+    """
+    cohort = build_cohort(num_sites)
+    start_time = time.perf_counter()
+    create_site_arrangements(cohort, 'full', max_results=max_results)
+    return time.perf_counter() - start_time
+
+
+def compare_production_mode(num_sites: int) -> None:
+    """
+    Prints how long time_search takes with the runtime type checks on and
+    off. Production mode is read when the scripts are imported, so each
+    setting is timed in a fresh Python process.
+
+    Args:
+        num_sites (int): number of sites in the cohort
+    """
+    times = {}
+    for production in ["0", "1"]:
+        output = subprocess.run(
+            [sys.executable, "-c",
+             f"from benchmark import time_search; "
+             f"print(time_search({num_sites}))"],
+            env={**os.environ, PRODUCTION_VARIABLE: production},
+            capture_output=True, text=True, check=True).stdout
+        times[production] = float(output.split()[-1])
+    print(f"{num_sites} sites: {times['0']:.2f} seconds with type checks, "
+          f"{times['1']:.2f} seconds in production mode "
+          f"({times['0'] / times['1']:.1f}x faster)")
+
+
+def compare_compiled_search(num_sites: int,
+                            max_results: int = 200,
+                            deadline_seconds: float = 60.0) -> None:
+    """
+    Prints how many arrangements of a made-up cohort iter_site_arrangements
+    and iter_compiled_arrangements find and how long they take. Symmetry
+    breaking is turned off for iter_site_arrangements since the compiled
+    search does not have it, so both find the same arrangements in the same
+    order.
+
+    Args:
+        num_sites (int): number of sites in the cohort
+        max_results (int): stop each search after this many arrangements
+        deadline_seconds (float): stop each search after this many seconds
+    """
+    cohort = build_cohort(num_sites)
+    for name, iter_arrangements in [
+            ("default", partial(iter_site_arrangements,
+                                break_symmetry=False)),
+            ("compiled", iter_compiled_arrangements)]:
+        start_time = time.perf_counter()
+        num_results = sum(1 for _ in iter_arrangements(
+            cohort, 'full', max_results=max_results,
+            deadline_seconds=deadline_seconds))
+        print(f"{num_sites} sites, {name} search: {num_results} "
+              f"arrangements in {time.perf_counter() - start_time:.2f} "
+              f"seconds")
+
+
+def search_cohort(parameters: dict,
+                  mode: Literal['full', 'partial'],
+                  max_results: Optional[int],
+                  deadline_seconds: Optional[float],
+                  path: Literal['pipeline', 'search'] = 'pipeline') -> dict:
+    """
+    Generates a cohort in a new Scenario and searches it.
+
+    Args:
+        parameters (dict): keyword arguments of generate_cohort
+        mode (Literal['full', 'partial']): refer to create_site_arrangements
+        max_results (Optional[int]): stop after this many arrangements
+        deadline_seconds (Optional[float]): stop after this many seconds
+        path (Literal['pipeline', 'search']): 'pipeline' goes through
+            iter_site_arrangements, so the presolve checks, the bounds on
+            the availabilities and the split into components are timed as
+            well. 'search' runs ForwardCheckingSearch on the whole cohort
+            without any of them.
+
+    Returns:
+        dict: time to the first arrangement (None if there is none), total
+              time, number of arrangements and nodes, whether the deadline
+              was reached and the time spent in each phase
+    """
+    with Scenario():
+        people = generate_cohort(**parameters)
+        stats = SearchStats()
+        start_time = time.perf_counter()
+        deadline = None
+        if deadline_seconds is not None:
+            deadline = start_time + deadline_seconds
+
+        if path == 'pipeline':
+            arrangements = iter_site_arrangements(
+                people, mode, deadline_seconds=deadline_seconds, stats=stats)
+        else:
+            search = ForwardCheckingSearch(people, mode, stats=stats)
+            arrangements = search.search(deadline)
+        time_to_first_solution = None
+        num_solutions = 0
+        try:
+            for _ in arrangements:
+                if time_to_first_solution is None:
+                    time_to_first_solution = time.perf_counter() - start_time
+                num_solutions += 1
+                if max_results is not None and num_solutions >= max_results:
+                    break
+        finally:
+            arrangements.close()
+        total_time = time.perf_counter() - start_time
+
+        # iter_site_arrangements does not say whether it stopped at the
+        # deadline, so it is assumed to have done so if it ran that long
+        # without finding max_results arrangements
+        if path == 'pipeline':
+            timed_out = (deadline_seconds is not None and
+                         total_time >= deadline_seconds and
+                         (max_results is None or
+                          num_solutions < max_results))
+        else:
+            timed_out = search.timed_out
+
+        return {'time_to_first_solution': time_to_first_solution,
+                'total_time': total_time,
+                'num_solutions': num_solutions,
+                'num_nodes': stats.num_nodes,
+                'timed_out': timed_out,
+                'phase_times': stats.phase_times}
+
+
+def run_scaling_benchmark(grid: Optional[List[dict]] = None,
+                          output_path: str = "benchmark_results.json",
+                          mode: Literal['full', 'partial'] = 'full',
+                          max_results: Optional[int] = 100,
+                          deadline_seconds: Optional[float] = 30.0
+                          ) -> List[dict]:
+    """
+    Searches a generated cohort for every set of parameters in the grid and
+    writes one record per cohort and path (refer to search_cohort) to
+    output_path as JSON.
+
+    Each cohort is searched twice per path: once for the times and number
+    of nodes, and once with tracemalloc on for the peak memory, since
+    tracing every allocation slows the search down.
+
+    Args:
+        grid (Optional[List[dict]]): keyword arguments of generate_cohort.
+                                     None means SCALING_GRID.
+        output_path (str): JSON file to write the results to
+        mode (Literal['full', 'partial']): refer to create_site_arrangements
+        max_results (Optional[int]): stop each search after this many
+                                     arrangements
+        deadline_seconds (Optional[float]): stop each search after this many
+                                            seconds
+
+    Returns:
+        List[dict]: the parameters and path of each search along with the
+                    output of search_cohort and the peak memory in bytes
+    """
+    if grid is None:
+        grid = SCALING_GRID
+
+    results = []
+    for parameters in grid:
+        for path in ['pipeline', 'search']:
+            result = {**parameters, 'mode': mode, 'path': path,
+                      'max_results': max_results,
+                      'deadline_seconds': deadline_seconds}
+            result.update(search_cohort(parameters, mode, max_results,
+                                        deadline_seconds, path))
+
+            tracemalloc.start()
+            try:
+                search_cohort(parameters, mode, max_results,
+                              deadline_seconds, path)
+                result['peak_memory_bytes'] = (
+                    tracemalloc.get_traced_memory()[1])
+            finally:
+                tracemalloc.stop()
+
+            print(f"{parameters['num_sites']} sites, {path}: "
+                  f"{result['num_solutions']} arrangements and "
+                  f"{result['num_nodes']:,} nodes in "
+                  f"{result['total_time']:.2f} seconds, peak memory "
+                  f"{result['peak_memory_bytes'] / 1e6:.1f} MB")
+            results.append(result)
+
+    with open(output_path, "w") as file:
+        json.dump({'python': sys.version.split()[0], 'results': results},
+                  file, indent=2)
+    return results
+
+
+if __name__ == "__main__":
+    for num_sites in [12, 36, 60]:
+        cohort = build_cohort(num_sites)
+
+        # Take the best of 3 runs since the first run is usually slower
+        rate = max(measure_node_rate(cohort) for _ in range(3))
+        print(f"{num_sites} sites, {len(cohort)} people: "
+              f"{rate:,.0f} nodes per second")
+
+    compare_node_rates()
+
+    for num_sites in [2, 3, 4]:
+        compare_local_search(num_sites)
+
+    for num_sites in [6, 12]:
+        compare_production_mode(num_sites)
+
+    for num_sites in [6, 12]:
+        compare_compiled_search(num_sites)
+
+    run_scaling_benchmark()
@@ -1,9 +1,11 @@
 import pandas as pd
 import re
-from typing import Optional, Dict, Tuple, List, Union, Literal
-from data_preprocessing import initialize_empty_site_map
-import time
-from typeguard import typechecked
+from array import array
+from collections.abc import MutableMapping
+from contextvars import ContextVar
+from typing import (Callable, Optional, Dict, Tuple, List, Union, Literal,
+                    Sequence)
+from settings import typechecked
 
 
 # TODO: Updates 8/10/2024
@@ -13,22 +15,188 @@ from typeguard import typechecked
 # TODO: UI
 
 
-# TODO: Try to find a way to log when you reach the end of the branch & then
-# TODO: log the branch
+@typechecked
+class Scenario:
+    """
+    Owns every record of one problem: the districts, schools, sites and
+    people, and the dictionaries that relate them to their names, IDs and
+    times. Every District, School, Site, DecalMember and SiteArrangement
+    belongs to the scenario that was active when it was created.
+
+    The module-level dictionaries below (times_to_sites, ids_to_sites,
+    names_to_people, etc.) and every function in the scripts work on the
+    active scenario of the current thread. Several scenarios can exist at
+    once, e.g. to solve what-if versions of the same problem in different
+    threads. A scenario is thrown away by dropping every reference to it, so
+    there is no need to call eliminate_all_districts first.
+
+    Usage:
+        with Scenario() as scenario:
+            district = District("EBAYC")  # belongs to scenario
+            ...
+    """
+    __slots__ = ('times_to_sites', 'ids_to_sites', 'times_to_ids',
+                 'ids_to_times', 'names_to_schools', 'names_to_districts',
+                 'names_to_site_leaders', 'names_to_nonSL_staff_members',
+                 'names_to_nonstaff', 'names_to_people', 'indexed_people',
+                 'person_sites', 'sites_version', 'tokens')
+
+    def __init__(self):
+        # Maps times to a list of sites that operate at that time
+        self.times_to_sites = {}
+        self.ids_to_sites = {} # Maps IDs to a list of sites
+        # Maps each standardized time slot to its integer ID
+        self.times_to_ids = {}
+        self.ids_to_times = {} # Maps each time slot ID back to the time slot
+        self.names_to_schools = {}
+        self.names_to_districts = {}
+
+        # Classes for each person in decal
+        # TODO: Are these dictionaries necessary?
+        # TODO: If not, delete all references to these dictionaries.
+        self.names_to_site_leaders = {}
+        self.names_to_nonSL_staff_members = {}
+        self.names_to_nonstaff = {}
+        self.names_to_people = {}
+
+        # Every person ever created, by their index (DecalMember.index)
+        self.indexed_people = []
+
+        # person_sites[i]: ID of the site of indexed_people[i], or -1 if they
+        # are not in a site. SiteArrangement.freeze copies this array.
+        self.person_sites = array('i')
+
+        # Incremented whenever a site is added to or removed from
+        # times_to_sites so that each person's cached list of potential
+        # sites can be refreshed
+        self.sites_version = 0
+
+        # One token per (possibly nested) with block
+        self.tokens = []
+
+    def __enter__(self) -> "Scenario":
+        """
+        Makes this the active scenario until the end of the with block.
+        Only affects the current thread.
+        """
+        self.tokens.append(active_scenario.set(self))
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        active_scenario.reset(self.tokens.pop())
+
+    def run(self,
+            function: Callable,
+            *args,
+            **kwargs):
+        """
+        Calls function with this scenario active and returns its result,
+        e.g. executor.submit(scenario.run, create_site_arrangements, ...)
+        """
+        with self:
+            return function(*args, **kwargs)
+
+    def clear(self) -> None:
+        """
+        Empties every record (refer to clear_all_records).
+        """
+        self.sites_version += 1
+        for record in [self.times_to_sites, self.ids_to_sites,
+                       self.times_to_ids, self.ids_to_times,
+                       self.names_to_schools, self.names_to_districts,
+                       self.names_to_site_leaders,
+                       self.names_to_nonSL_staff_members,
+                       self.names_to_nonstaff, self.names_to_people,
+                       self.indexed_people]:
+            record.clear()
+        del self.person_sites[:]
+
+    def get_time_id(self,
+                    time: str) -> int:
+        """
+        Refer to get_time_id
+        """
+        time_id = self.times_to_ids.get(time)
+        if time_id is None:
+            time_id = len(self.times_to_ids)
+            self.times_to_ids[time] = time_id
+            self.ids_to_times[time_id] = time
+        return time_id
+
+    def get_availability_mask(self,
+                              availabilities: Sequence[str]) -> int:
+        """
+        Refer to get_availability_mask
+        """
+        mask = 0
+        for availability in availabilities:
+            mask |= 1 << self.get_time_id(availability)
+        return mask
+
+
+# Scenario used when no other scenario is active. Each thread starts with it.
+default_scenario = Scenario()
+active_scenario = ContextVar('active_scenario', default=default_scenario)
 
 
-times_to_sites = {} # Maps times to a list of sites that operate at that time
-ids_to_sites = {} # Maps IDs to a list of sites
-names_to_schools = {}
-names_to_districts = {}
+def get_scenario() -> Scenario:
+    """
+    Returns:
+        Scenario: the active scenario of the current thread
+    """
+    return active_scenario.get()
+
+
+class ScenarioRecord(MutableMapping):
+    """
+    One of the dictionaries of the active scenario, e.g. ids_to_sites. Lets
+    the rest of the scripts keep using the names below while every
+    scenario has dictionaries of its own.
+    """
+    __slots__ = ('name',)
+
+    def __init__(self,
+                 name: str):
+        self.name = name
+
+    def get_record(self) -> dict:
+        return getattr(active_scenario.get(), self.name)
 
-# Classes for each person in decal
-# TODO: Are these dictionaries necessary?
-# TODO: If not, delete all references to these dictionaries.
-names_to_site_leaders = {}
-names_to_nonSL_staff_members = {}
-names_to_nonstaff = {}
-names_to_people = {}
+    def __getitem__(self, key):
+        return self.get_record()[key]
+
+    def __setitem__(self, key, value):
+        self.get_record()[key] = value
+
+    def __delitem__(self, key):
+        del self.get_record()[key]
+
+    def __iter__(self):
+        return iter(self.get_record())
+
+    def __len__(self):
+        return len(self.get_record())
+
+    def __contains__(self, key):
+        return key in self.get_record()
+
+    def get(self, key, default=None):
+        return self.get_record().get(key, default)
+
+    def __repr__(self):
+        return repr(self.get_record())
+
+
+times_to_sites = ScenarioRecord('times_to_sites')
+ids_to_sites = ScenarioRecord('ids_to_sites')
+times_to_ids = ScenarioRecord('times_to_ids')
+ids_to_times = ScenarioRecord('ids_to_times')
+names_to_schools = ScenarioRecord('names_to_schools')
+names_to_districts = ScenarioRecord('names_to_districts')
+names_to_site_leaders = ScenarioRecord('names_to_site_leaders')
+names_to_nonSL_staff_members = ScenarioRecord('names_to_nonSL_staff_members')
+names_to_nonstaff = ScenarioRecord('names_to_nonstaff')
+names_to_people = ScenarioRecord('names_to_people')
 
 
 # Limits for number of people in staff and nonstaff
@@ -39,14 +207,28 @@ MAX_NONSTAFF_PER_SITE = 4
 MIN_PEOPLE_PER_SITE = 4
 MAX_PEOPLE_PER_SITE = 5
 
+# Rules of Site.validate_person, as returned by Site.get_violated_rule
+VALIDATION_RULES = ['site_leader', 'staff_cap', 'people_cap', 'driver',
+                    'nonstaff_cap']
+
+# Used by Site.score_person
+IDEAL_NONSTAFF_PER_STAFF = 2
+BUSY_THRESHOLD = 3
+
 
 
 @typechecked
 class DecalMember:
+    __slots__ = ('name', 'drives', 'in_staff', 'leads_site',
+                 'stored_availabilities', 'availability_mask',
+                 'potential_sites',
+                 'potential_sites_key', 'assigned_site', 'index',
+                 'scenario')
+
     def __init__(self,
                  name: str,
                  can_drive: bool,
-                 availabilities: List[str] = []):
+                 availabilities: Optional[List[str]] = None):
         """
         Represents each person who is a part of decal but NOT staff.
 
@@ -57,60 +239,99 @@ class DecalMember:
             availabilities (List[str]): the list of times during which the
                                         decal member is available
         """
+        self.scenario = get_scenario()
         self.name = name
         self.drives = can_drive
         self.in_staff = False
         self.leads_site = False
-        self.availabilities = availabilities
+        self.stored_availabilities = tuple(availabilities or ())
+        self.availability_mask = self.scenario.get_availability_mask(
+            self.stored_availabilities)
+        self.potential_sites = []
+        self.potential_sites_key = None
         self.assigned_site = None
+        self.index = len(self.scenario.indexed_people)
+        self.scenario.indexed_people.append(self)
+        self.scenario.person_sites.append(-1)
         self.add_to_record()
 
     def add_to_record(self):
-        names_to_people[self.name] = self
-        names_to_nonstaff[self.name] = self
+        self.scenario.names_to_people[self.name] = self
+        self.scenario.names_to_nonstaff[self.name] = self
+
 
+    @property
+    def availabilities(self) -> Tuple[str, ...]:
+        """
+        Times during which the person is available. The tuple can't be
+        modified, so that availability_mask always matches it: use
+        add_availability and remove_availability instead.
+        """
+        return self.stored_availabilities
 
     def add_availability(self,
                          availability: str):
         """
         Adds an availability to the list of availabilities.
         """
-        self.availabilities.append(availability)
+        self.stored_availabilities += (availability,)
+        self.availability_mask = self.scenario.get_availability_mask(
+            self.stored_availabilities)
 
     def remove_availability(self,
                             availability: str):
         """
-        Adds an availability to the list of availabilities.
+        Removes an availability from the list of availabilities.
         """
-        self.availabilities.remove(availability)
+        availabilities = list(self.stored_availabilities)
+        availabilities.remove(availability)
+        self.stored_availabilities = tuple(availabilities)
+        self.availability_mask = self.scenario.get_availability_mask(
+            self.stored_availabilities)
 
     def find_potential_sites(self) -> List:
         """
         Gets a list of sites where the person would be able to be added to the
         site.
 
+        The list is computed once and then reused until either the person's
+        availabilities or the sites in times_to_sites change. It should not
+        be modified by the caller.
+
         Returns:
             List[Site]: list of sites
         """
+        scenario = self.scenario
+        key = (scenario.sites_version, self.availability_mask)
+        if self.potential_sites_key == key:
+            return self.potential_sites
+
         potential_sites = []
 
-        # Iterate through each availability
-        for availability in self.availabilities:
+        # Iterate through each time slot ID in the availability bitmask
+        mask = self.availability_mask
+        while mask:
+            lowest_bit = mask & -mask
+            time_id = lowest_bit.bit_length() - 1
+            mask ^= lowest_bit
 
             # Get the list of sites that take place during that availability
-            # If that availability is not on the list of sites, return an
-            # empty list.
-            site_list = times_to_sites.get(availability, [])
-            potential_sites += site_list
+            # If no site takes place during that availability, skip it.
+            potential_sites += scenario.times_to_sites.get(
+                scenario.ids_to_times[time_id], [])
 
+        self.potential_sites = potential_sites
+        self.potential_sites_key = key
         return potential_sites
 
 @typechecked
 class StaffMember(DecalMember):
+    __slots__ = ()
+
     def __init__(self,
                  name: str,
                  can_drive: bool,
-                 availabilities: List[str] = []):
+                 availabilities: Optional[List[str]] = None):
         """
         Represents each person who is a part of staff.
 
@@ -125,15 +346,17 @@ class StaffMember(DecalMember):
         self.in_staff = True
 
     def add_to_record(self):
-        names_to_people[self.name] = self
-        names_to_nonSL_staff_members[self.name] = self
+        self.scenario.names_to_people[self.name] = self
+        self.scenario.names_to_nonSL_staff_members[self.name] = self
 
 @typechecked
 class SiteLeader(StaffMember):
+    __slots__ = ()
+
     def __init__(self,
                  name: str,
                  can_drive: bool,
-                 availabilities: List[str] = []):
+                 availabilities: Optional[List[str]] = None):
         """
         Represents each person who is a part of staff and leads a site.
         Also referred to as a SL.
@@ -150,8 +373,8 @@ class SiteLeader(StaffMember):
         self.leads_site = True
 
     def add_to_record(self):
-        names_to_people[self.name] = self
-        names_to_site_leaders[self.name] = self
+        self.scenario.names_to_people[self.name] = self
+        self.scenario.names_to_site_leaders[self.name] = self
 
 @typechecked
 class District:
@@ -164,18 +387,20 @@ class District:
         name(str): Name of the district.
 
     """
+    __slots__ = ('name', 'schools', 'scenario')
 
     def __init__(self,
                  name:str):
+        self.scenario = get_scenario()
         self.name = name
         self.schools = {}
         self.add_to_record()
 
     def add_to_record(self):
-        names_to_districts[self.name] = self
+        self.scenario.names_to_districts[self.name] = self
 
     def remove_from_record(self):
-        names_to_districts.pop(self.name)
+        self.scenario.names_to_districts.pop(self.name)
 
     def add_school(self,
                    name:str):
@@ -211,6 +436,8 @@ class District:
 
 @typechecked
 class School:
+    __slots__ = ('name', 'sites', 'district', 'scenario')
+
     def __init__(self,
                  name:str,
                  district:District):
@@ -225,6 +452,7 @@ class School:
             district (District): the district that the school belongs to
         """
 
+        self.scenario = district.scenario
         self.name = name
         self.sites = []
         self.district = district
@@ -243,15 +471,15 @@ class School:
         # TODO: Decide whether site_name will be used or not.
         # TODO: Ensure that the Site class definition accounts for the
         # TODO: presence or lack of a Site name
-        new_site = Site(name, time, self.district)
+        new_site = Site(name, time, self)
         self.sites.append(new_site)
         return new_site
 
     def add_to_record(self):
-        names_to_schools[self.name] = self
+        self.scenario.names_to_schools[self.name] = self
 
     def remove_from_record(self):
-        names_to_schools.pop(self.name)
+        self.scenario.names_to_schools.pop(self.name)
 
     def remove_site(self,
                     site) -> None:
@@ -306,6 +534,11 @@ class School:
 
 @typechecked
 class Site:
+    __slots__ = ('name', 'time', 'time_id', 'time_bit', 'school', 'members',
+                 'num_staff', 'num_nonstaff', 'num_drivers',
+                 'num_site_leaders', 'has_site_leader', 'has_driver',
+                 'is_full', 'id', 'scenario')
+
     def __init__(self,
                  name: str,
                  time: str,
@@ -325,10 +558,21 @@ class Site:
             school (School): the school at which the site takes place
 
         """
+        self.scenario = school.scenario
         self.name = name #location name - aka Harding NOT Harding C
         self.time = time
+        self.time_id = self.scenario.get_time_id(time)
+        self.time_bit = 1 << self.time_id
         self.school = school
         self.members = []
+
+        # Running counts of the members. These are updated every time a
+        # member is added or removed so that they never need to be recounted
+        self.num_staff = 0
+        self.num_nonstaff = 0
+        self.num_drivers = 0
+        self.num_site_leaders = 0
+
         self.has_site_leader = False
         self.has_driver = False
         self.is_full = False
@@ -339,7 +583,7 @@ class Site:
         add_to_times_to_sites(self.time, self)
 
     def remove_from_record(self):
-        ids_to_sites.pop(self.id)
+        self.scenario.ids_to_sites.pop(self.id)
         remove_from_times_to_sites(self.time, self)
 
     def assign_site_id(self):
@@ -347,7 +591,8 @@ class Site:
         Assigns a site id to the site. This is helpful when making
         SiteArrangement instances
         """
-        self.id = len(ids_to_sites)
+        ids_to_sites = self.scenario.ids_to_sites
+        self.id = max(ids_to_sites, default=-1) + 1
         ids_to_sites[self.id] = self
 
 
@@ -376,22 +621,63 @@ class Site:
 
         self.members.append(person)
         person.assigned_site = self
+        self.scenario.person_sites[person.index] = self.id
+        self.update_counts(person, 1)
+        self.update_booleans()
+
+    def add_members(self,
+                    people: List[DecalMember]) -> None:
+        """
+        Adds several people to the site at once without validating them.
+        The booleans are only updated once at the end.
+
+        Args:
+            people (List[DecalMember]): people who are not in any site
+        """
+        person_sites = self.scenario.person_sites
+        for person in people:
+            self.members.append(person)
+            person.assigned_site = self
+            person_sites[person.index] = self.id
+            self.update_counts(person, 1)
         self.update_booleans()
 
     def score_person(self,
                      person:DecalMember) -> int:
         """
         Assumes that the validate_person method has been run already
-        # TODO: Fix later once the script can actually generate working
-        # TODO: SiteArrangement instances
+
+        Scores how well a person fits in with the other members of the site.
+        The higher the better. The person can either be about to join the
+        site or already be one of its members; they are never compared with
+        themselves.
+
+        1. Driver redundancy: a driver gets +1 if there is exactly one other
+           driver (each is the other's backup) and -1 if there are already
+           two or more (a driver that another site could have used)
+        2. Staff/nonstaff balance: how much closer the person brings the
+           site to IDEAL_NONSTAFF_PER_STAFF nonstaff per staff member
+        3. Busyness: a busy person (at most BUSY_THRESHOLD availabilities)
+           gets -1 for every other busy member, since busy people are hard
+           to move if the site changes later
 
         Args:
-            person (DecalMember): _description_
+            person (DecalMember): person to score
+
+        Returns:
+            int: score of the pairing
+        """
+        return score_pairing(person, [member for member in self.members
+                                      if member is not person])
+
+    def get_score(self) -> int:
+        """
+        Gets the sum of the scores of every member of the site
 
         Returns:
-            int: _description_
+            int: refer to score_person
         """
-        pass
+        return sum(self.score_person(member) for member in self.members)
 
     def validate_person(self,
                         person:DecalMember) -> bool:
@@ -406,33 +692,56 @@ class Site:
         4. 3 decal people in site + 2 staff --> cannot add anyone else
         5. 4 people in site, no driver & we want to add someone who can't
            drive --> Don't add them
+        6. 4 nonstaff people in site & we want to add someone who is not in
+           staff --> Don't add them
 
         Args:
             person (DecalMember): _description_
         """
-        assert self.time in person.availabilities, (
+        return self.get_violated_rule(person) is None
+
+    def get_violated_rule(self,
+                          person: DecalMember) -> Optional[str]:
+        """
+        Same as validate_person, but says which rule stops the person from
+        joining the site.
+
+        Args:
+            person (DecalMember)
+
+        Returns:
+            Optional[str]: one of VALIDATION_RULES (situation 1, 2, 3 and 4,
+                           5 or 6 of validate_person), or None if the person
+                           can join the site
+        """
+        assert person.availability_mask & self.time_bit, (
             f"Just double-checked {person.name}'s availabilities. "
             f"Their availabilities don't match the site {self.name}"
         )
         # Situation 1
         if self.has_site_leader and person.leads_site:
-            return False
+            return 'site_leader'
 
         # Situation 2
-        elif self.get_num_staff() == MAX_STAFF_PER_SITE and person.in_staff:
-            return False
+        elif self.num_staff == MAX_STAFF_PER_SITE and person.in_staff:
+            return 'staff_cap'
 
         # Situations 3 and 4
-        elif self.get_num_people() == MAX_PEOPLE_PER_SITE:
-            return False
+        elif len(self.members) == MAX_PEOPLE_PER_SITE:
+            return 'people_cap'
 
         # Situation 5
-        elif (self.get_num_people() == MAX_PEOPLE_PER_SITE-1 and
+        elif (len(self.members) == MAX_PEOPLE_PER_SITE-1 and
               not self.has_driver and not person.drives):
-            return False
+            return 'driver'
+
+        # Situation 6
+        elif (self.num_nonstaff == MAX_NONSTAFF_PER_SITE and
+              not person.in_staff):
+            return 'nonstaff_cap'
 
         else:
-            return True
+            return None
 
 
     def remove_member(self,
@@ -445,8 +754,31 @@ class Site:
 
         self.members.remove(person)
         person.assigned_site = None
+        self.scenario.person_sites[person.index] = -1
+        self.update_counts(person, -1)
         self.update_booleans()
 
+    def update_counts(self,
+                      person: DecalMember,
+                      change: int) -> None:
+        """
+        Updates the running counts of staff, nonstaff, drivers and site
+        leaders after a person has been added to or removed from the site.
+
+        Args:
+            person (DecalMember): the person who was added or removed
+            change (int): 1 if the person was added, -1 if the person was
+                          removed
+        """
+        if person.in_staff:
+            self.num_staff += change
+        else:
+            self.num_nonstaff += change
+        if person.drives:
+            self.num_drivers += change
+        if person.leads_site:
+            self.num_site_leaders += change
+
     def get_num_staff(self) -> int:
         """
         Gets the number of people in the site who are part of staff.
@@ -454,20 +786,16 @@ class Site:
         Returns:
             int
         """
-        num_staff = len([
-            member for member in self.members if member.in_staff])
-        return num_staff
+        return self.num_staff
 
-    def get_num_nonstaff(self):
+    def get_num_nonstaff(self) -> int:
         """
         Gets the number of people in the site who are NOT part of staff.
 
         Returns:
             int
         """
-        num_nonstaff = len([
-            member for member in self.members if not member.in_staff])
-        return num_nonstaff
+        return self.num_nonstaff
 
     def get_num_people(self) -> int:
         """
@@ -479,32 +807,37 @@ class Site:
         """
         return len(self.members)
 
-    def update_booleans(self):
+    def get_num_site_leaders(self) -> int:
         """
-        Updates the self.has_site_leader and self.has_driver attributes.
-        # TODO: Should this be a descriptor or something?
+        Gets the number of site leaders in the site. A valid site never has
+        more than 1.
+
+        Returns:
+            int: number of site leaders
         """
-        self.has_site_leader = any([
-            person for person in self.members if person.leads_site])
-        self.has_driver = any([
-            person for person in self.members if person.drives])
+        return self.num_site_leaders
 
+    def update_booleans(self):
+        """
+        Updates the self.has_site_leader, self.has_driver and self.is_full
+        attributes using the running counts.
+        """
+        self.has_site_leader = self.num_site_leaders > 0
+        self.has_driver = self.num_drivers > 0
 
         # Criteria for a full site
-        if (self.has_site_leader and
-            self.has_driver):
-
-            num_staff = self.get_num_staff()
-            num_nonstaff = self.get_num_nonstaff()
-            num_people = num_staff + num_nonstaff
-            if (num_staff >= MIN_STAFF_PER_SITE and
-                num_staff <= MAX_STAFF_PER_SITE and
-                num_nonstaff >= MIN_NONSTAFF_PER_SITE and
-                num_nonstaff <= MAX_NONSTAFF_PER_SITE and
-                num_people >= MIN_PEOPLE_PER_SITE and
-                num_people <= MAX_PEOPLE_PER_SITE):
-
-                self.is_full = True
+        num_staff = self.num_staff
+        num_nonstaff = self.num_nonstaff
+        num_people = num_staff + num_nonstaff
+        self.is_full = (
+            self.has_site_leader and
+            self.has_driver and
+            num_staff >= MIN_STAFF_PER_SITE and
+            num_staff <= MAX_STAFF_PER_SITE and
+            num_nonstaff >= MIN_NONSTAFF_PER_SITE and
+            num_nonstaff <= MAX_NONSTAFF_PER_SITE and
+            num_people >= MIN_PEOPLE_PER_SITE and
+            num_people <= MAX_PEOPLE_PER_SITE)
 
     def get_num_drivers(self) -> int:
         """
@@ -513,7 +846,7 @@ class Site:
         Returns:
             int: number of eligible drivers
         """
-        return len([person for person in self.members if person.drives])
+        return self.num_drivers
 
 
     def get_SL_name(self) -> str:
@@ -534,7 +867,7 @@ class Site:
         # TODO: Will this be problematic if there is more than 1 driver?
         """
         sl_name = self.get_SL_name()
-        sl = names_to_site_leaders[sl_name]
+        sl = self.scenario.names_to_site_leaders[sl_name]
         driver_found = False
 
         if sl.drives:
@@ -542,7 +875,8 @@ class Site:
 
         if self.get_num_staff() == 2:
             non_SL_staff_name = self.get_non_SL_staff_name()
-            non_SL = names_to_nonSL_staff_members[non_SL_staff_name]
+            non_SL = self.scenario.names_to_nonSL_staff_members[
+                non_SL_staff_name]
             if non_SL.drives:
                 return non_SL_staff_name
             else:
@@ -550,7 +884,8 @@ class Site:
 
         if not driver_found:
             nonstaff_names = self.get_nonstaff_names()
-            nonstaff = [names_to_nonstaff[name] for name in nonstaff_names]
+            nonstaff = [self.scenario.names_to_nonstaff[name]
+                        for name in nonstaff_names]
             return [person for person in nonstaff if person.drives][0]
 
     def get_non_SL_staff_name(self) -> str:
@@ -562,7 +897,7 @@ class Site:
         As a result, it is imperative that the method get_num_staff is checked
         first before using the get_non_SL_staff_name method.
         """
-        return [person for person in self.members
+        return [person.name for person in self.members
                 if person.in_staff and not person.leads_site][0]
 
     def get_nonstaff_names(self) -> List[str]:
@@ -577,29 +912,38 @@ class Site:
         Returns:
             List[str]: list of the names of each member in self.members
         """
-        if self.get_num_staff() == 2:
-            return [self.get_SL_name(),
-                    self.get_non_SL_staff_name()] + self.get_nonstaff_names()
-        elif self.get_num_staff() == 1:
-            return [self.get_SL_name()] + self.get_nonstaff_names()
-        else:
-            return self.get_nonstaff_names()
+        # Site leader first, then the other staff member, then decal members
+        # A site may not have a site leader yet in 'partial' arrangements
+        sl_names = [member.name for member in self.members
+                    if member.leads_site]
+        non_SL_staff_names = [member.name for member in self.members
+                              if member.in_staff and not member.leads_site]
+        return sl_names + non_SL_staff_names + self.get_nonstaff_names()
 
-    def clear(self) -> None:
+    def clear(self) -> "Site":
         """
         Sets the entire self.members list to an empty list.
         Reassigns each DecalMember's assigned_site attribute to None
         Updates booleans.
         """
+        person_sites = self.scenario.person_sites
         for member in self.members:
             member.assigned_site = None
+            person_sites[member.index] = -1
         self.members = []
+        self.num_staff = 0
+        self.num_nonstaff = 0
+        self.num_drivers = 0
+        self.num_site_leaders = 0
         self.update_booleans()
         return self
 
 
 @typechecked
 class SiteArrangement:
+    __slots__ = ('sites', 'decoded_site_assignments', 'decoded_score',
+                 'scenario')
+
     def __init__(self):
         """
         Initializes a SiteArrangement which will store a "frozen"
@@ -609,34 +953,144 @@ class SiteArrangement:
         the people in the SiteArrangement to the Site instances and the
         DecalMember/StaffMember/SiteLeader instances, respectively.
         """
-        self.site_assignments = {}
+        self.scenario = get_scenario()
+
+        # sites[i]: ID of the site of indexed_people[i] or -1 (refer to
+        # Scenario.person_sites)
+        self.sites = array('i')
 
-    def freeze(self) -> Dict[int, List[str]]:
+        # Decoded from self.sites the first time they are needed
+        self.decoded_site_assignments = None
+        self.decoded_score = None
+
+    def freeze(self) -> "SiteArrangement":
         """
-        Freezes the current configuration of sites and assigned people.
-        Stores this information into the self.site_assignemnts dictionary
+        Freezes the current configuration of sites and assigned people by
+        copying person_sites. Nothing else is computed until it is needed.
+
+        Returns:
+            SiteArrangement: self, which can be indexed by site ID like
+                             self.site_assignments
         """
+        self.sites = self.scenario.person_sites[:]
+        self.decoded_site_assignments = None
+        self.decoded_score = None
+        return self
 
-        for time in times_to_sites.keys():
-            sites = times_to_sites[time]
-            for site in sites:
-                self.site_assignments[site.id] = site.get_member_names()
-        return self.site_assignments
+    @property
+    def site_assignments(self) -> Dict[int, List[str]]:
+        """
+        Maps the ID of every site to the names of its members: SL first, then
+        the other staff member, then decal members.
+        """
+        if self.decoded_site_assignments is None:
+            members = self.get_members()
+            self.decoded_site_assignments = {
+                site.id: [person.name for person in sorted(
+                    members.get(site.id, []),
+                    key=lambda person: (not person.leads_site,
+                                        not person.in_staff))]
+                for sites in self.scenario.times_to_sites.values()
+                for site in sites}
+            for site_id, people in members.items():
+                if site_id not in self.decoded_site_assignments:
+                    self.decoded_site_assignments[site_id] = [
+                        person.name for person in people]
+        return self.decoded_site_assignments
+
+    @site_assignments.setter
+    def site_assignments(self,
+                         site_assignments: Dict[int, List[str]]) -> None:
+        """
+        Encodes a dictionary of site IDs to member names, e.g. one that was
+        sent from another process.
+        """
+        names_to_people = self.scenario.names_to_people
+        self.sites = array('i', [-1]) * len(self.scenario.indexed_people)
+        for site_id, names in site_assignments.items():
+            for name in names:
+                self.sites[names_to_people[name].index] = site_id
+        self.decoded_site_assignments = None
+        self.decoded_score = None
+
+    @property
+    def score(self) -> int:
+        """
+        Sum of the scores of every site (refer to Site.score_person)
+        """
+        if self.decoded_score is None:
+            self.decoded_score = sum(
+                score_pairing(person, [other for other in people
+                                       if other is not person])
+                for people in self.get_members().values()
+                for person in people)
+        return self.decoded_score
+
+    def get_members(self) -> Dict[int, List[DecalMember]]:
+        """
+        Returns:
+            Dict[int, List[DecalMember]]: maps the ID of every site with at
+                                          least one member to its members
+        """
+        indexed_people = self.scenario.indexed_people
+        members = {}
+        for index, site_id in enumerate(self.sites):
+            if site_id >= 0:
+                members.setdefault(site_id, []).append(indexed_people[index])
+        return members
+
+    def __contains__(self, site_id):
+        return site_id in self.site_assignments
+
+    def __getitem__(self, site_id):
+        return self.site_assignments[site_id]
+
+    def validate(self) -> bool:
+        """
+        Checks the installed arrangement against the rules of
+        Site.validate_person: every member is available at the time of
+        their site and no site has more SLs, staff, nonstaff or people than
+        allowed. A site with the maximum number of people also needs a
+        driver.
+
+        Returns:
+            bool: True if every site follows the rules
+        """
+        for site_id, people in self.get_members().items():
+            site = self.scenario.ids_to_sites[site_id]
+            if any(not person.availability_mask & site.time_bit
+                   for person in people):
+                return False
+            if (site.num_site_leaders > 1 or
+                    site.num_staff > MAX_STAFF_PER_SITE or
+                    site.num_nonstaff > MAX_NONSTAFF_PER_SITE or
+                    len(site.members) > MAX_PEOPLE_PER_SITE or
+                    (len(site.members) == MAX_PEOPLE_PER_SITE and
+                     not site.has_driver)):
+                return False
+        return True
 
     def unfreeze(self,
                  empty_site_map: Optional[pd.DataFrame] = None,
-                 save_path: Optional[str] = None) -> Optional[pd.DataFrame]:
+                 save_path: Optional[str] = None,
+                 validate: bool = False) -> Optional[pd.DataFrame]:
         """
-        Takes the site assignments in self.site_assignments and
-        actually assigns each DecalMember instance to their respective
-        Site instance.
+        Takes the site assignments in self.sites and actually assigns each
+        DecalMember instance to their respective Site instance, one site at
+        a time with Site.add_members.
 
         Note that  'DecalMember instance' also refers to
         StaffMember and SiteLeader istances.
 
+        Arrangements made by the search are trusted and installed as they
+        are. Arrangements from anywhere else (e.g. loaded from a file) should
+        be checked with validate=True.
+
         Args:
             save_path (Optional[str]): if path is None --> returns None
                 if path is not None --> populate_site_map is called
+            validate (bool): if True, self.validate is run once everyone is
+                             installed
 
         Raises:
             Exception: Given an issue with the unfreeze method or if
@@ -646,7 +1100,7 @@ class SiteArrangement:
         Returns:
             None
         """
-        assert check_all_sites_are_clear(), (
+        assert self.scenario.run(check_all_sites_are_clear), (
             "Unfreezing cannot take place until all sites are clear")
 
         if (save_path is None and empty_site_map is not None or
@@ -654,17 +1108,12 @@ class SiteArrangement:
             raise Exception("Both the save path and the site map need to be "
                             "None or not None.")
 
-        for site_id in self.site_assignments.keys():
-            site = ids_to_sites[site_id]
-            member_names = self.site_assignments[site_id]
-            people = [names_to_people[name] for name in member_names]
-            for person in people:
-                if site.validate_person(person):
-                    site.add_member(person)
-                else:
-                    print(f"A site arrangement was made but {person.name} "
-                          "was not validated.")
-                    raise Exception("Issue with the unfreeze method!")
+        for site_id, people in self.get_members().items():
+            self.scenario.ids_to_sites[site_id].add_members(people)
+
+        if validate and not self.validate():
+            self.scenario.run(clear_all_sites)
+            raise Exception("Issue with the unfreeze method!")
 
         if save_path is not None:
             self.populate_site_map(empty_site_map,
@@ -689,6 +1138,7 @@ class SiteArrangement:
         index = 0
 
         # Iterate through each time slot
+        times_to_sites = self.scenario.times_to_sites
         for site_time in times_to_sites.keys():
             sites = times_to_sites[site_time]
 
@@ -739,11 +1189,14 @@ class SiteArrangement:
 
 
     def __str__(self):
+        lines = []
         for id in self.site_assignments.keys():
-            site = ids_to_sites[id]
+            site = self.scenario.ids_to_sites[id]
             names = self.site_assignments[id]
-            print(f"Site ID #{id}: {site.name}")
-            print(f"People: {names}")
+            lines.append(f"Site ID #{id}: {site.name}")
+            lines.append(f"People: {names}")
+        lines.append(f"Score: {self.score}")
+        return "\n".join(lines)
 
 @typechecked
 def get_day_and_time(site_time:str) -> Tuple[str, str]:
@@ -791,6 +1244,82 @@ def eliminate_all_schools() -> None:
     for district in list(names_to_districts.values()):
         district.remove_all_schools()
 
+def clear_all_records() -> None:
+    """
+    Empties every dictionary in this file so that a new set of districts,
+    schools, sites and people can be created from scratch.
+
+    Returns:
+        None
+    """
+    get_scenario().clear()
+
+@typechecked
+def export_records() -> Dict[str, list]:
+    """
+    Copies every district, school, site and person into plain lists that can
+    be pickled, e.g. to send them to another process. import_records turns
+    them back into objects.
+
+    Returns:
+        Dict[str, list]: lists of time slots (in the order of their IDs),
+                         districts, schools, sites and people
+    """
+    return {
+        'times': [ids_to_times[time_id]
+                  for time_id in range(len(ids_to_times))],
+        'districts': [district.name
+                      for district in names_to_districts.values()],
+        'schools': [(school.name, school.district.name)
+                    for school in names_to_schools.values()],
+        'sites': [(site.id, site.name, site.time, site.school.name)
+                  for site in ids_to_sites.values()],
+        'people': [(type(person).__name__, person.name, person.drives,
+                    list(person.availabilities),
+                    None if person.assigned_site is None
+                    else person.assigned_site.id)
+                   for person in names_to_people.values()]
+    }
+
+@typechecked
+def import_records(records: Dict[str, list]) -> None:
+    """
+    Replaces every record with the districts, schools, sites and people from
+    export_records. Time slots and sites keep their IDs and people are added
+    back to the sites that they were assigned to.
+
+    Args:
+        records (Dict[str, list]): output of export_records
+    """
+    clear_all_records()
+
+    # Keep the original time slot IDs so that availability bitmasks mean the
+    # same thing as before
+    for time in records.get('times', []):
+        get_time_id(time)
+    person_classes = {person_class.__name__: person_class for person_class
+                      in [DecalMember, StaffMember, SiteLeader]}
+
+    for district_name in records['districts']:
+        District(district_name)
+
+    for school_name, district_name in records['schools']:
+        names_to_districts[district_name].add_school(school_name)
+
+    for site_id, site_name, site_time, school_name in records['sites']:
+        site = names_to_schools[school_name].add_site(site_name, site_time)
+
+        # Keep the original ID so that SiteArrangement instances still refer
+        # to the right site
+        ids_to_sites.pop(site.id)
+        site.id = site_id
+        ids_to_sites[site_id] = site
+
+    for class_name, name, drives, availabilities, site_id in records['people']:
+        person = person_classes[class_name](name, drives, availabilities)
+        if site_id is not None:
+            ids_to_sites[site_id].add_member(person)
+
 def eliminate_all_districts() -> None:
     """
     Eliminates all districts and their schools/sites from any dictionary or
@@ -808,6 +1337,47 @@ def eliminate_all_districts() -> None:
 
 
 
+@typechecked
+def score_pairing(person: DecalMember,
+                  others: List[DecalMember]) -> int:
+    """
+    Scores how well a person fits in with the other members of a site. Refer
+    to Site.score_person for the rules. Only needs the members, so frozen
+    arrangements can be scored without adding anyone to a site.
+
+    Args:
+        person (DecalMember): person to score
+        others (List[DecalMember]): the other members of the site
+
+    Returns:
+        int: score of the pairing
+    """
+    num_drivers = len([other for other in others if other.drives])
+    num_staff = len([other for other in others if other.in_staff])
+    num_nonstaff = len(others) - num_staff
+    score = 0
+
+    # 1. Driver redundancy
+    if person.drives and num_drivers == 1:
+        score += 1
+    elif person.drives and num_drivers >= 2:
+        score -= 1
+
+    # 2. Staff/nonstaff balance
+    imbalance_before = abs(IDEAL_NONSTAFF_PER_STAFF * num_staff -
+                           num_nonstaff)
+    imbalance_after = abs(
+        IDEAL_NONSTAFF_PER_STAFF * (num_staff + person.in_staff) -
+        (num_nonstaff + (not person.in_staff)))
+    score += imbalance_before - imbalance_after
+
+    # 3. Busyness
+    if len(person.availabilities) <= BUSY_THRESHOLD:
+        score -= len([other for other in others
+                      if len(other.availabilities) <= BUSY_THRESHOLD])
+
+    return score
+
 @typechecked
 def order_by_availabilities(people:List[DecalMember]) -> List[DecalMember]:
     """
@@ -820,10 +1390,11 @@ def order_by_availabilities(people:List[DecalMember]) -> List[DecalMember]:
         List[DecalMember]: people ordered by increasing number of
                             availabilities
     """
-    return sorted(people, key=lambda x: x.availabilities)
+    return sorted(people, key=lambda x: len(x.availabilities))
 
 @typechecked
-def create_priority_list(people:List[DecalMember]) -> List[DecalMember]:
+def create_priority_list(people:List[DecalMember],
+                         drivers_first: bool = False) -> List[DecalMember]:
     """
     Creates a list of people who are sorted based on their priority to be
     added into sites. This is done to minimize the amount of time creating
@@ -835,6 +1406,8 @@ def create_priority_list(people:List[DecalMember]) -> List[DecalMember]:
 
     Args:
         people (_type_): _description_
+        drivers_first (bool): if True, drivers come before busy people
+            within each class instead of after them
 
     Returns:
         List[DecalMember]: _description_
@@ -842,7 +1415,7 @@ def create_priority_list(people:List[DecalMember]) -> List[DecalMember]:
 
     @typechecked
     def order_group(group:List[DecalMember],
-                    busy_threshold:int = 3) -> List[DecalMember]:
+                    busy_threshold:int = BUSY_THRESHOLD) -> List[DecalMember]:
         """
         Orders the group based on the following priority:
 
@@ -858,6 +1431,21 @@ def create_priority_list(people:List[DecalMember]) -> List[DecalMember]:
                 that would consider a person as 'busy' to be assigned to a
                 site first. Initialized to 2
         """
+        if drivers_first:
+            drives = order_by_availabilities(
+                [person for person in group if person.drives])
+            remaining = [person for person in group if person not in drives]
+
+            least_availabilities = order_by_availabilities(
+                [person for person in remaining if len(
+                    person.availabilities) <= busy_threshold])
+
+            remaining = order_by_availabilities(
+                [person for person in remaining if person not in
+                 least_availabilities])
+
+            return drives + least_availabilities + remaining
+
         least_availabilities = order_by_availabilities(
             [person for person in group if len(
                 person.availabilities) <= busy_threshold])
@@ -868,7 +1456,7 @@ def create_priority_list(people:List[DecalMember]) -> List[DecalMember]:
             [person for person in remaining if person.drives])
 
         remaining = order_by_availabilities(
-            [person for person in group if person not in drives])
+            [person for person in remaining if person not in drives])
 
         return least_availabilities + drives + remaining
 
@@ -905,16 +1493,18 @@ def order_potential_sites(person: DecalMember,
         sites (List[Site]): _description_
     """
 
+    # The running counts are read directly since this is called at every
+    # node of the search
     if person.drives:
         return sorted(sites,
                       key = lambda site: (
-                          site.get_num_drivers(),
-                          MAX_PEOPLE_PER_SITE-site.get_num_people()))
+                          site.num_drivers,
+                          MAX_PEOPLE_PER_SITE-len(site.members)))
     else:
         return sorted(sites,
                       key = lambda site: (
-                          MAX_PEOPLE_PER_SITE-site.get_num_drivers(),
-                          site.get_num_people()))
+                          MAX_PEOPLE_PER_SITE-site.num_drivers,
+                          len(site.members)))
 
 @typechecked
 def check_all_sites_are_clear() -> bool:
@@ -934,6 +1524,8 @@ def check_all_sites_are_clear() -> bool:
         if person.assigned_site is not None:
             return False
 
+    return True
+
 @typechecked
 def check_all_sites_are_valid() -> bool:
     """
@@ -955,22 +1547,22 @@ def check_all_sites_are_valid() -> bool:
     for site in all_sites:
 
         # Check number of SLs
-        if site.get_num_site_leaders() > 1:
+        if site.num_site_leaders > 1:
             raise Exception(f"Site {site.name}[ID: {site.id}] is not valid.")
             # return False
 
         # Check number of non-SL staff people
-        if site.get_num_staff() > MAX_STAFF_PER_SITE:
+        if site.num_staff > MAX_STAFF_PER_SITE:
             raise Exception(f"Site {site.name}[ID: {site.id}] is not valid.")
             # return False
 
         # Check number of nonstaff people
-        if site.get_num_nonstaff() > MAX_NONSTAFF_PER_SITE:
+        if site.num_nonstaff > MAX_NONSTAFF_PER_SITE:
             raise Exception(f"Site {site.name}[ID: {site.id}] is not valid.")
             # return False
 
         # Check number of people
-        if site.get_num_people() > MAX_PEOPLE_PER_SITE:
+        if len(site.members) > MAX_PEOPLE_PER_SITE:
             raise Exception(f"Site {site.name}[ID: {site.id}] is not valid.")
             # return False
 
@@ -990,100 +1582,41 @@ def check_all_sites_are_full() -> bool:
     return True
 
 @typechecked
-def create_site_arrangements(
-    people: List[DecalMember],
-    mode: Literal['full', 'partial']) -> List[SiteArrangement]:
+def get_time_id(time: str) -> int:
     """
-    Creates a list of SiteArrangement objects.
+    Gets the integer ID of a time slot. Time slots that have not been seen
+    before are given the next unused ID.
 
-    Base Case(s)
-    1. Full
-        - not enough people/too many people -> []
-        - just enough -> [SiteArrangement instance]
-    2. Partial
-        - not enough people/just enough -> [SiteArrangement instance]
-        - too many people -> []
+    The times should be standardized beforehand so that the same time slot
+    is never given two different IDs.
 
     Args:
-        people (List[DecalMember]): _description_
-        mode (Literal['full', 'partial']): indicates one of the two modes
-            'full':    All sites must be having a driver and the appropriate
-                       number of each class that results in a total of 4-5
-                       people
-            'partial': All sites may have less than the max number per class
-                       of people
+        time (str): time slot e.g. 'Monday 3PM - 4PM'
 
     Returns:
-        List[SiteArrangement]: _description_
+        int: ID of the time slot
     """
+    return get_scenario().get_time_id(time)
 
-    assert all([person.assigned_site is None for person in people])
-
-    # Record start time
-    start_time = time.time()
-
-    # Initialize an empty list of working site arrangements
-    working_site_arrangements = []
-
-    # Create a priority list for everyone who's not been assigned
-    priority_list = create_priority_list(
-        [person for person in people if person.assigned_site is None])
-
-    # Base Case(s)
-
-    # First check that all sites are valid
-    if check_all_sites_are_valid():
-
-        # If mode is full, sites must all be full
-        if mode == 'full':
-            if check_all_sites_are_full():
-                new_site_arrangement = SiteArrangement()
-                new_site_arrangement.freeze()
-                return [new_site_arrangement]
-            else:
-                return []
-        else:
-            return [new_site_arrangement]
-
-
-    # Iterate through each person in the priority list
-    for person in priority_list:
-
-        # Get all the unassigned people
-        all_potential_sites = person.find_potential_sites()
-        priority_sites = order_potential_sites(person,
-                                                all_potential_sites)
-
-        # Iterate through each sites in order of priority
-        for site in priority_sites:
-
-            # Add the person
-            site.add_member(person)
-
-            # Recursive Case
-            # Create more site arrangements
-            # Add them to the list of working_site_arrangements
-            working_site_arrangements += create_site_arrangements(people)
-
-            # Remove the person from the site
-            # Continue onwards to the next site in the list of priority_sites
-            site.remove_member(person)
+@typechecked
+def get_availability_mask(availabilities: Sequence[str]) -> int:
+    """
+    Converts a list of time slots into a bitmask where bit i is set if the
+    time slot with ID i is in the list.
 
-    # Record the amount of time and how many working site arrangements
-    # are created
-    elapsed = time.time() - start_time
-    elapsed_mins = elapsed // 60
-    elapsed_sec = (elapsed % 60) // 1
-    print(f"Creating {len(working_site_arrangements)} site arrangements "
-          f"took {elapsed_mins} minutes and {elapsed_sec} seconds.")
+    Args:
+        availabilities (Sequence[str]): list of time slots
 
-    # In the case that there are no people left and the sites are not valid,
-    # an empty list will be returned.
-    return working_site_arrangements
+    Returns:
+        int: bitmask of the time slot IDs
+    """
+    return get_scenario().get_availability_mask(availabilities)
 
 @typechecked
 def add_to_times_to_sites(time: str,
                           site: Site):
+    site.scenario.sites_version += 1
+    times_to_sites = site.scenario.times_to_sites
     if time not in times_to_sites.keys():
         times_to_sites[time] = [site]
     else:
@@ -1092,6 +1625,8 @@ def add_to_times_to_sites(time: str,
 @typechecked
 def remove_from_times_to_sites(time: str,
                                site: Site):
+    site.scenario.sites_version += 1
+    times_to_sites = site.scenario.times_to_sites
     if time not in times_to_sites.keys():
         raise Exception(f"Time '{time}' is not in the "
                         "times_to_sites dictionary")
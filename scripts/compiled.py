@@ -0,0 +1,422 @@
+"""
+Array-backed copy of the problem for the hot loop of the search.
+
+ForwardCheckingSearch works on Site and DecalMember objects, so every check
+goes through attribute lookups and method calls. CompiledProblem copies
+everything the search needs into NumPy arrays once:
+
+    - in_staff, leads_site and drives: one entry per person
+    - compatible: person x site matrix of who is available when
+    - assignment: position of the site of every person (-1 if unassigned)
+    - num_staff, num_nonstaff, num_drivers and num_site_leaders: one entry
+      per site
+    - allowed: person x site matrix of the domains, along with the size of
+      every domain and the number of candidates of each kind at every site
+
+As in ForwardCheckingSearch, the domains are only changed where an
+assignment can affect them and every removal is recorded on a trail so
+that it can be undone when the search backs up. The rules of
+Site.validate_person and Site.update_booleans are applied to every site (or
+every person and site) at once. The Site objects are only touched when an
+arrangement is frozen.
+"""
+import time
+from typing import Iterator, List, Literal, Optional
+
+import numpy as np
+
+from classes import (DecalMember, SiteArrangement, ids_to_sites,
+                     MIN_STAFF_PER_SITE, MAX_STAFF_PER_SITE,
+                     MIN_NONSTAFF_PER_SITE, MAX_NONSTAFF_PER_SITE,
+                     MIN_PEOPLE_PER_SITE, MAX_PEOPLE_PER_SITE,
+                     create_priority_list)
+from settings import typechecked
+
+
+# Domain size of the people who are already assigned (refer to
+# CompiledProblem.__init__)
+ASSIGNED = np.iinfo(np.int64).max
+
+
+@typechecked
+class CompiledProblem:
+    def __init__(self,
+                 people: List[DecalMember]):
+        """
+        Compiles the people and every site in ids_to_sites into arrays.
+        People who are already in a site (e.g. confirmed SLs) are counted in
+        the per-site arrays but are not part of the problem.
+
+        People are referred to by their index in self.people, which is
+        ordered by create_priority_list, and sites by their position in
+        self.sites.
+
+        Args:
+            people (List[DecalMember]): people to assign. None of them should
+                                        be assigned to a site yet.
+        """
+        self.people = create_priority_list(people)
+        self.sites = list(ids_to_sites.values())
+
+        self.in_staff = np.array([person.in_staff for person in self.people],
+                                 dtype=bool)
+        self.leads_site = np.array([person.leads_site
+                                    for person in self.people], dtype=bool)
+        self.drives = np.array([person.drives for person in self.people],
+                               dtype=bool)
+
+        # The bitmasks can be wider than 64 bits, so this is done once in
+        # Python
+        self.compatible = np.array(
+            [[bool(person.availability_mask & site.time_bit)
+              for site in self.sites]
+             for person in self.people], dtype=bool).reshape(
+                 len(self.people), len(self.sites))
+
+        self.assignment = np.full(len(self.people), -1, dtype=np.int32)
+
+        self.num_staff = np.array([site.num_staff for site in self.sites],
+                                  dtype=np.int32)
+        self.num_nonstaff = np.array([site.num_nonstaff
+                                      for site in self.sites], dtype=np.int32)
+        self.num_drivers = np.array([site.num_drivers for site in self.sites],
+                                    dtype=np.int32)
+        self.num_site_leaders = np.array([site.num_site_leaders
+                                          for site in self.sites],
+                                         dtype=np.int32)
+
+        # allowed[i, j]: whether self.people[i] can still join self.sites[j].
+        # The domain sizes and the numbers of candidate SLs, drivers, staff
+        # and nonstaff of every site are kept in sync with it. The domain
+        # size of an assigned person is set to ASSIGNED, which is more than
+        # any real domain size, so that the unassigned person with the
+        # fewest sites is always the one with the smallest domain size.
+        self.num_unassigned = len(self.people)
+        self.allowed = self.get_allowed(np.arange(len(self.people)))
+        self.domain_sizes = self.allowed.sum(axis=1, dtype=np.int64)
+        self.num_candidate_site_leaders = self.allowed[self.leads_site].sum(
+            axis=0)
+        self.num_candidate_drivers = self.allowed[self.drives].sum(axis=0)
+        self.num_candidate_staff = self.allowed[self.in_staff].sum(axis=0)
+        self.num_candidate_nonstaff = self.allowed[~self.in_staff].sum(axis=0)
+
+        # Every removal from allowed is recorded so that it can be undone
+        # when the search backs up: (index, positions) when one person loses
+        # several sites and (indices, position) when one site loses several
+        # people
+        self.trail = []
+
+    def assign(self,
+               index: int,
+               position: int) -> None:
+        """
+        Adds self.people[index] to self.sites[position] and removes the site
+        from the domains of the people who can no longer join it.
+
+        The caller is responsible for calling self.unassign with the trail
+        length from before this call.
+        """
+        self.update_counts(index, position, 1)
+        self.assignment[index] = position
+        self.num_unassigned -= 1
+
+        # The person is no longer a candidate for any site
+        positions = self.allowed[index].nonzero()[0]
+        self.allowed[index, positions] = False
+        self.update_person_candidates(index, positions, -1)
+        self.trail.append((index, positions))
+        self.domain_sizes[index] = ASSIGNED
+
+        # Forward checking: only this site's counts changed, so only the
+        # people who could join it are checked again
+        removed = self.find_blocked(position)
+        if len(removed) > 0:
+            self.allowed[removed, position] = False
+            self.update_site_candidates(removed, position, -1)
+            self.trail.append((removed, position))
+
+    def unassign(self,
+                 index: int,
+                 trail_length: int) -> None:
+        """
+        Reverses self.assign.
+        """
+        self.domain_sizes[index] = 0
+        self.undo(trail_length)
+        self.update_counts(index, int(self.assignment[index]), -1)
+        self.assignment[index] = -1
+        self.num_unassigned += 1
+
+    def find_blocked(self,
+                     position: int) -> np.ndarray:
+        """
+        Applies Site.validate_person to every candidate of
+        self.sites[position], checking only the rules that the counts of the
+        site can break.
+
+        Returns:
+            np.ndarray: indices of the candidates who can no longer join
+        """
+        num_staff = self.num_staff[position]
+        num_nonstaff = self.num_nonstaff[position]
+        num_people = num_staff + num_nonstaff
+
+        # Situations 1-6 of Site.validate_person
+        has_site_leader = self.num_site_leaders[position] > 0
+        has_max_staff = num_staff >= MAX_STAFF_PER_SITE
+        has_max_people = num_people >= MAX_PEOPLE_PER_SITE
+        needs_driver = (num_people == MAX_PEOPLE_PER_SITE - 1 and
+                        self.num_drivers[position] == 0)
+        has_max_nonstaff = num_nonstaff >= MAX_NONSTAFF_PER_SITE
+        if not (has_site_leader or has_max_staff or has_max_people or
+                needs_driver or has_max_nonstaff):
+            return np.empty(0, dtype=np.intp)
+
+        candidates = self.allowed[:, position].nonzero()[0]
+        if has_max_people:
+            return candidates
+        blocked = np.zeros(len(candidates), dtype=bool)
+        if has_site_leader:
+            blocked |= self.leads_site[candidates]
+        if has_max_staff:
+            blocked |= self.in_staff[candidates]
+        if needs_driver:
+            blocked |= ~self.drives[candidates]
+        if has_max_nonstaff:
+            blocked |= ~self.in_staff[candidates]
+        return candidates[blocked]
+
+    def update_person_candidates(self,
+                                 index: int,
+                                 positions: np.ndarray,
+                                 change: int) -> None:
+        """
+        Updates the domain size of self.people[index] and the candidate
+        counts of the sites at positions after the person was added to
+        (change = 1) or removed from (change = -1) their domains.
+        """
+        self.domain_sizes[index] += change * len(positions)
+        if self.leads_site[index]:
+            self.num_candidate_site_leaders[positions] += change
+        if self.drives[index]:
+            self.num_candidate_drivers[positions] += change
+        if self.in_staff[index]:
+            self.num_candidate_staff[positions] += change
+        else:
+            self.num_candidate_nonstaff[positions] += change
+
+    def update_site_candidates(self,
+                               indices: np.ndarray,
+                               position: int,
+                               change: int) -> None:
+        """
+        Updates the domain sizes of the people at indices and the candidate
+        counts of self.sites[position] after the site was added to
+        (change = 1) or removed from (change = -1) their domains.
+        """
+        num_staff = np.count_nonzero(self.in_staff[indices])
+        self.domain_sizes[indices] += change
+        self.num_candidate_site_leaders[position] += change * np.count_nonzero(
+            self.leads_site[indices])
+        self.num_candidate_drivers[position] += change * np.count_nonzero(
+            self.drives[indices])
+        self.num_candidate_staff[position] += change * num_staff
+        self.num_candidate_nonstaff[position] += change * (len(indices) -
+                                                           num_staff)
+
+    def undo(self,
+             trail_length: int) -> None:
+        """
+        Puts back every removal made after the trail had trail_length
+        entries.
+        """
+        while len(self.trail) > trail_length:
+            people, sites = self.trail.pop()
+            self.allowed[people, sites] = True
+            if isinstance(people, int):
+                self.update_person_candidates(people, sites, 1)
+            else:
+                self.update_site_candidates(people, sites, 1)
+
+    def update_counts(self,
+                      index: int,
+                      position: int,
+                      change: int) -> None:
+        """
+        Same as Site.update_counts.
+        """
+        if self.in_staff[index]:
+            self.num_staff[position] += change
+        else:
+            self.num_nonstaff[position] += change
+        if self.drives[index]:
+            self.num_drivers[position] += change
+        if self.leads_site[index]:
+            self.num_site_leaders[position] += change
+
+    def get_allowed(self,
+                    indices: np.ndarray,
+                    positions: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Applies Site.validate_person to every pair of person and site.
+
+        Args:
+            indices (np.ndarray): indices of the people to check
+            positions (Optional[np.ndarray]): positions of the sites to
+                                              check. None means every site.
+
+        Returns:
+            np.ndarray: len(indices) x len(positions) boolean matrix
+        """
+        if positions is None:
+            positions = np.arange(len(self.sites))
+        num_staff = self.num_staff[positions]
+        num_nonstaff = self.num_nonstaff[positions]
+        num_people = num_staff + num_nonstaff
+        leads_site = self.leads_site[indices, None]
+        in_staff = self.in_staff[indices, None]
+        drives = self.drives[indices, None]
+
+        # Situations 1-6 of Site.validate_person
+        return (self.compatible[np.ix_(indices, positions)] &
+                ~(leads_site & (self.num_site_leaders[positions] > 0)) &
+                ~(in_staff & (num_staff >= MAX_STAFF_PER_SITE)) &
+                (num_people < MAX_PEOPLE_PER_SITE) &
+                ~(~drives & (num_people == MAX_PEOPLE_PER_SITE - 1) &
+                  (self.num_drivers[positions] == 0)) &
+                ~(~in_staff & (num_nonstaff >= MAX_NONSTAFF_PER_SITE)))
+
+    def get_full_sites(self) -> np.ndarray:
+        """
+        Returns:
+            np.ndarray: whether each site is full (refer to
+                        Site.update_booleans)
+        """
+        num_people = self.num_staff + self.num_nonstaff
+        return ((self.num_site_leaders > 0) &
+                (self.num_drivers > 0) &
+                (self.num_staff >= MIN_STAFF_PER_SITE) &
+                (self.num_staff <= MAX_STAFF_PER_SITE) &
+                (self.num_nonstaff >= MIN_NONSTAFF_PER_SITE) &
+                (self.num_nonstaff <= MAX_NONSTAFF_PER_SITE) &
+                (num_people >= MIN_PEOPLE_PER_SITE) &
+                (num_people <= MAX_PEOPLE_PER_SITE))
+
+    def get_valid_sites(self) -> np.ndarray:
+        """
+        Returns:
+            np.ndarray: whether each site passes check_all_sites_are_valid
+        """
+        return ((self.num_site_leaders <= 1) &
+                (self.num_staff <= MAX_STAFF_PER_SITE) &
+                (self.num_nonstaff <= MAX_NONSTAFF_PER_SITE) &
+                (self.num_staff + self.num_nonstaff <= MAX_PEOPLE_PER_SITE))
+
+    def can_become_full(self) -> np.ndarray:
+        """
+        Checks which sites could still become full if every unassigned
+        person who can join them did so (refer to
+        ForwardCheckingSearch.can_become_full).
+
+        Returns:
+            np.ndarray: one boolean per site
+        """
+        num_staff = self.num_staff + self.num_candidate_staff
+        num_nonstaff = self.num_nonstaff + self.num_candidate_nonstaff
+        return (((self.num_site_leaders > 0) |
+                 (self.num_candidate_site_leaders > 0)) &
+                ((self.num_drivers > 0) |
+                 (self.num_candidate_drivers > 0)) &
+                (num_staff >= MIN_STAFF_PER_SITE) &
+                (num_nonstaff >= MIN_NONSTAFF_PER_SITE) &
+                (num_staff + num_nonstaff >= MIN_PEOPLE_PER_SITE))
+
+    def freeze(self) -> SiteArrangement:
+        """
+        Adds everyone to their Site, freezes the sites into a
+        SiteArrangement and takes everyone out again.
+
+        Returns:
+            SiteArrangement
+        """
+        assigned = [(self.people[index], self.sites[position])
+                    for index, position in enumerate(self.assignment)
+                    if position >= 0]
+        for person, site in assigned:
+            site.add_member(person)
+        try:
+            arrangement = SiteArrangement()
+            arrangement.freeze()
+        finally:
+            for person, site in assigned:
+                site.remove_member(person)
+        return arrangement
+
+
+@typechecked
+def iter_compiled_arrangements(
+    people: List[DecalMember],
+    mode: Literal['full', 'partial'],
+    max_results: Optional[int] = None,
+    deadline_seconds: Optional[float] = None) -> Iterator[SiteArrangement]:
+    """
+    Searches a CompiledProblem with forward checking and yields every
+    working arrangement. Finds the same arrangements as
+    iter_site_arrangements with break_symmetry=False, but every check is an
+    array operation and the sites are left clear between arrangements.
+
+    Args:
+        people (List[DecalMember]): people to assign
+        mode (Literal['full', 'partial']): refer to create_site_arrangements
+        max_results (Optional[int]): refer to iter_site_arrangements
+        deadline_seconds (Optional[float]): refer to iter_site_arrangements
+
+    Yields:
+        SiteArrangement
+    """
+    assert all([person.assigned_site is None for person in people])
+
+    deadline = None
+    if deadline_seconds is not None:
+        deadline = time.perf_counter() + deadline_seconds
+
+    problem = CompiledProblem(people)
+    num_results = 0
+
+    def expand() -> Iterator[SiteArrangement]:
+        nonlocal num_results
+
+        # Base Case: everyone has been assigned
+        if problem.num_unassigned == 0:
+            if problem.get_valid_sites().all() and (
+                    mode == 'partial' or problem.get_full_sites().all()):
+                num_results += 1
+                yield problem.freeze()
+            return
+
+        if deadline is not None and time.perf_counter() > deadline:
+            return
+
+        # Fewest sites first, ties go to the priority list
+        index = int(np.argmin(problem.domain_sizes))
+
+        # Forward checking: back up if someone has nowhere to go or, in
+        # 'full' mode, if a site can no longer become full
+        if problem.domain_sizes[index] == 0:
+            return
+        if mode == 'full' and not problem.can_become_full().all():
+            return
+
+        for position in problem.allowed[index].nonzero()[0].tolist():
+            trail_length = len(problem.trail)
+            problem.assign(index, position)
+            try:
+                yield from expand()
+            finally:
+                problem.unassign(index, trail_length)
+            if max_results is not None and num_results >= max_results:
+                return
+
+    if max_results is not None and max_results <= 0:
+        return
+    yield from expand()
@@ -0,0 +1,231 @@
+"""
+Made-up cohorts for measuring and testing the search.
+
+generate_cohort creates a district with the given number of schools, sites
+and time slots, along with SLs, non-SL staff and decal members whose
+availabilities and driving are drawn at random. The districts, schools,
+sites and people are created in the active scenario, so the result can be
+passed straight to create_site_arrangements:
+
+    with Scenario():
+        people = generate_cohort(num_site_leaders=4, num_staff=2,
+                                 num_nonstaff=12, num_sites=4)
+        arrangements = create_site_arrangements(people, 'full')
+
+generate_planted_cohort builds every site as a full site first and only then
+adds extra availabilities, so at least one working arrangement is known in
+advance. Any search should find it.
+"""
+import random
+from typing import Dict, List, Optional, Tuple
+
+from classes import (DecalMember, District, Site, SiteLeader, StaffMember,
+                     MAX_PEOPLE_PER_SITE, MIN_NONSTAFF_PER_SITE,
+                     names_to_people)
+from settings import typechecked
+
+
+DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"]
+
+# Time slots start at 8AM and last an hour
+FIRST_HOUR = 8
+
+
+@typechecked
+def get_time_slots(num_time_slots: int) -> List[str]:
+    """
+    Gets the first num_time_slots time slots of the week, going through
+    every day before moving on to the next hour, e.g. 'Monday 8AM - 9AM',
+    'Tuesday 8AM - 9AM', etc.
+
+    Args:
+        num_time_slots (int): number of time slots
+
+    Returns:
+        List[str]: time slots in the standardized format
+    """
+    def format_hour(hour: int) -> str:
+        return f"{(hour - 1) % 12 + 1}{'AM' if hour % 24 < 12 else 'PM'}"
+
+    time_slots = []
+    for i in range(num_time_slots):
+        day = DAYS[i % len(DAYS)]
+        hour = FIRST_HOUR + i // len(DAYS)
+        time_slots.append(f"{day} {format_hour(hour)} - "
+                          f"{format_hour(hour + 1)}")
+    return time_slots
+
+
+@typechecked
+def create_sites(num_sites: int,
+                 num_schools: int,
+                 num_time_slots: int) -> List[Site]:
+    """
+    Creates a district with num_schools schools and deals num_sites sites
+    out to the schools and the first num_time_slots time slots in turn.
+
+    Returns:
+        List[Site]: the new sites
+    """
+    assert num_sites >= 0, "The number of sites cannot be negative"
+    assert num_schools >= 1 and num_time_slots >= 1, (
+        "There must be at least 1 school and 1 time slot")
+    assert not names_to_people, (
+        "Generate the cohort in a new Scenario or after clear_all_records")
+
+    time_slots = get_time_slots(num_time_slots)
+    district = District("Synthetic District")
+    schools = [district.add_school(f"School {i}") for i in range(num_schools)]
+    return [schools[i % num_schools].add_site(f"Site {i}",
+                                              time_slots[i % num_time_slots])
+            for i in range(num_sites)]
+
+
+@typechecked
+def generate_cohort(num_site_leaders: int,
+                    num_staff: int,
+                    num_nonstaff: int,
+                    num_sites: int,
+                    num_schools: int = 1,
+                    num_time_slots: Optional[int] = None,
+                    availability_density: float = 0.3,
+                    driver_fraction: float = 0.4,
+                    seed: int = 0) -> List[DecalMember]:
+    """
+    Creates a district with num_schools schools and num_sites sites spread
+    over num_time_slots time slots, plus the people of a made-up cohort.
+
+    The sites are dealt out to the schools and time slots in turn. Each
+    person is available at each time slot with probability
+    availability_density, and at least at one time slot that has a site so
+    that no one is left with nowhere to go. Whether a person drives is drawn
+    the same way with probability driver_fraction.
+
+    The instance is not guaranteed to have a working arrangement.
+
+    Args:
+        num_site_leaders (int): number of SLs
+        num_staff (int): number of non-SL staff members
+        num_nonstaff (int): number of decal members who are not in staff
+        num_sites (int): number of sites
+        num_schools (int): number of schools
+        num_time_slots (Optional[int]): number of time slots. None means one
+                                        per site, up to a week of 8AM - 6PM.
+        availability_density (float): probability of being available at a
+                                       time slot, from 0 to 1
+        driver_fraction (float): probability of being able to drive, from 0
+                                 to 1
+        seed (int): seed for the random number generator
+
+    Returns:
+        List[DecalMember]: SLs, then staff, then decal members
+    """
+    if num_time_slots is None:
+        num_time_slots = max(1, min(num_sites, len(DAYS) * 10))
+    assert min(num_site_leaders, num_staff, num_nonstaff) >= 0, (
+        "The number of people cannot be negative")
+    assert 0 <= availability_density <= 1 and 0 <= driver_fraction <= 1, (
+        "The availability density and driver fraction must be from 0 to 1")
+
+    rng = random.Random(seed)
+    time_slots = get_time_slots(num_time_slots)
+    site_times = [site.time for site in create_sites(num_sites, num_schools,
+                                                     num_time_slots)]
+
+    def availabilities() -> List[str]:
+        chosen = [time_slot for time_slot in time_slots
+                  if rng.random() < availability_density]
+        if site_times and not set(chosen) & set(site_times):
+            chosen.append(rng.choice(site_times))
+        return chosen
+
+    people = []
+    for person_class, prefix, count in [(SiteLeader, "SL", num_site_leaders),
+                                        (StaffMember, "Staff", num_staff),
+                                        (DecalMember, "Decal", num_nonstaff)]:
+        for i in range(count):
+            drives = rng.random() < driver_fraction
+            people.append(person_class(f"{prefix} {i}", drives,
+                                       availabilities()))
+    return people
+
+
+@typechecked
+def generate_planted_cohort(
+    num_sites: int,
+    num_schools: int = 1,
+    num_time_slots: Optional[int] = None,
+    staff_fraction: float = 0.5,
+    extra_nonstaff_fraction: float = 0.25,
+    availability_density: float = 0.1,
+    driver_fraction: float = 0.4,
+    seed: int = 0) -> Tuple[List[DecalMember], Dict[int, List[str]]]:
+    """
+    Creates the sites like generate_cohort, then fills each one with people
+    who make it full: 1 SL, a non-SL staff member with probability
+    staff_fraction, MIN_NONSTAFF_PER_SITE decal members and, if there is
+    room, one more with probability extra_nonstaff_fraction. If none of them
+    drives, one of them is made a driver.
+
+    Everyone is available at the time of their own site. Each other time
+    slot is added to their availabilities with probability
+    availability_density, which gives the search other (possibly dead-end)
+    options to explore.
+
+    Args:
+        num_sites (int): number of sites
+        num_schools (int): number of schools
+        num_time_slots (Optional[int]): refer to generate_cohort
+        staff_fraction (float): probability that a site has a non-SL staff
+                                member
+        extra_nonstaff_fraction (float): probability that a site has one
+                                         more decal member than needed
+        availability_density (float): probability of being available at
+                                      each of the other time slots
+        driver_fraction (float): probability of being able to drive
+        seed (int): seed for the random number generator
+
+    Returns:
+        Tuple[List[DecalMember], Dict[int, List[str]]]: the people, and the
+            planted arrangement in the same format as
+            SiteArrangement.site_assignments
+    """
+    if num_time_slots is None:
+        num_time_slots = max(1, min(num_sites, len(DAYS) * 10))
+    assert 0 <= availability_density <= 1 and 0 <= driver_fraction <= 1, (
+        "The availability density and driver fraction must be from 0 to 1")
+
+    rng = random.Random(seed)
+    time_slots = get_time_slots(num_time_slots)
+    sites = create_sites(num_sites, num_schools, num_time_slots)
+
+    people = []
+    planted = {}
+    for site in sites:
+        # (class, name prefix) of each member of the site, SL first
+        members = [(SiteLeader, "SL")]
+        if rng.random() < staff_fraction:
+            members.append((StaffMember, "Staff"))
+        members += [(DecalMember, "Decal")] * MIN_NONSTAFF_PER_SITE
+        if (len(members) < MAX_PEOPLE_PER_SITE and
+                rng.random() < extra_nonstaff_fraction):
+            members.append((DecalMember, "Decal"))
+
+        drives = [rng.random() < driver_fraction for _ in members]
+        if not any(drives):
+            drives[rng.randrange(len(drives))] = True
+
+        planted[site.id] = []
+        for j, (person_class, prefix) in enumerate(members):
+            availabilities = [site.time] + [
+                time_slot for time_slot in time_slots
+                if time_slot != site.time and
+                rng.random() < availability_density]
+            person = person_class(f"{prefix} {site.id}-{j}", drives[j],
+                                  availabilities)
+            people.append(person)
+            planted[site.id].append(person.name)
+
+    # Shuffle so that the planted sites cannot be read off the order
+    rng.shuffle(people)
+    return people, planted
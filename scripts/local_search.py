@@ -0,0 +1,331 @@
+"""
+Simulated annealing for cohorts that are too large for the exact search in
+solver.py.
+
+Starting from any arrangement (even an empty one), the search keeps making
+small random changes ("moves") to the sites:
+
+    1. relocate: move one person to another site at one of their
+       availabilities
+    2. swap: exchange two people between two sites, or between a site and
+       the people who are not assigned yet
+
+Every move is checked with Site.validate_person, so the sites are valid at
+all times. Only the one or two sites touched by a move are rescored. Moves
+that make the arrangement better are always kept. Moves that make it worse
+are kept with a probability that shrinks as the search goes on, which lets
+the search climb out of dead ends early on.
+"""
+import math
+import random
+import time
+from typing import List, Optional, Tuple
+
+from classes import (DecalMember, Site, SiteArrangement,
+                     check_all_sites_are_clear, create_priority_list,
+                     get_scenario)
+from settings import typechecked
+
+
+# Weights of the objective. A full site is worth more than any number of
+# assigned people, and an assigned person is worth more than any difference
+# in score (refer to Site.score_person).
+FULL_SITE_WEIGHT = 10000
+ASSIGNED_PERSON_WEIGHT = 100
+
+# Temperatures at the start and at the end of the search
+INITIAL_TEMPERATURE = 200.0
+FINAL_TEMPERATURE = 1.0
+
+# Probability that a move is a swap rather than a relocation
+SWAP_PROBABILITY = 0.5
+
+
+@typechecked
+def get_site_value(site: Optional[Site]) -> int:
+    """
+    Gets how much a site adds to the objective of the local search.
+
+    Args:
+        site (Optional[Site]): None stands for the unassigned people
+
+    Returns:
+        int: value of the site
+    """
+    if site is None:
+        return 0
+    return (FULL_SITE_WEIGHT * site.is_full +
+            ASSIGNED_PERSON_WEIGHT * len(site.members) +
+            site.get_score())
+
+
+@typechecked
+def can_join(person: DecalMember,
+             site: Optional[Site]) -> bool:
+    """
+    Checks that a person is available at the time of the site and passes
+    Site.validate_person. Anyone can become unassigned (site is None).
+    """
+    if site is None:
+        return True
+    return (bool(person.availability_mask & site.time_bit) and
+            site.validate_person(person))
+
+
+@typechecked
+class LocalSearch:
+    def __init__(self,
+                 people: List[DecalMember],
+                 seed: Optional[int] = None,
+                 verbose: bool = True):
+        """
+        Sets up a simulated annealing search over the sites in ids_to_sites.
+
+        Args:
+            people (List[DecalMember]): people to assign
+            seed (Optional[int]): seed for the random number generator
+            verbose (bool): if True, a line is printed every time a better
+                            arrangement is found
+        """
+        self.people = create_priority_list(people)
+        self.random = random.Random(seed)
+        self.verbose = verbose
+        self.value = 0
+        self.best_value = None
+        self.best_arrangement = None
+        self.num_moves = 0
+        self.num_accepted_moves = 0
+
+        # The active scenario's dictionary itself, so that lookups do not
+        # go through the ScenarioRecord proxy every time
+        self.ids_to_sites = get_scenario().ids_to_sites
+
+    def get_num_full_sites(self) -> int:
+        """
+        Returns:
+            int: number of full sites in the current arrangement
+        """
+        return sum(site.is_full for site in self.ids_to_sites.values())
+
+    def install(self,
+                start: Optional[SiteArrangement]) -> None:
+        """
+        Puts the people in start into the sites, then adds everyone who is
+        still unassigned to the first site in their priority order that
+        takes them.
+
+        Args:
+            start (Optional[SiteArrangement]): None means starting with every
+                                               site empty
+        """
+        if start is not None:
+            start.unfreeze()
+
+        for person in self.people:
+            if person.assigned_site is not None:
+                continue
+            for site in person.find_potential_sites():
+                if can_join(person, site):
+                    site.add_member(person)
+                    break
+
+        self.value = sum(get_site_value(site)
+                         for site in self.ids_to_sites.values())
+
+    def move_person(self,
+                    person: DecalMember,
+                    site: Optional[Site]) -> None:
+        """
+        Moves a person to a site, or out of their site if site is None.
+        """
+        if person.assigned_site is not None:
+            person.assigned_site.remove_member(person)
+        if site is not None:
+            site.add_member(person)
+
+    def try_relocate(self) -> Optional[Tuple[int, List[tuple]]]:
+        """
+        Moves a random person to a random site at one of their
+        availabilities.
+
+        Returns:
+            Optional[Tuple[int, List[tuple]]]: change in the objective and
+                (person, previous site) of everyone who moved. None if the
+                move breaks a rule, in which case nothing was changed.
+        """
+        person = self.random.choice(self.people)
+        sites = person.find_potential_sites()
+        if not sites:
+            return None
+        old_site = person.assigned_site
+        new_site = self.random.choice(sites)
+        if new_site is old_site:
+            return None
+
+        before = get_site_value(old_site) + get_site_value(new_site)
+        self.move_person(person, None)
+        if not can_join(person, new_site):
+            self.move_person(person, old_site)
+            return None
+        self.move_person(person, new_site)
+        delta = get_site_value(old_site) + get_site_value(new_site) - before
+        return delta, [(person, old_site)]
+
+    def try_swap(self) -> Optional[Tuple[int, List[tuple]]]:
+        """
+        Swaps a random person with a random member of one of the sites at
+        their availabilities.
+
+        Returns:
+            Optional[Tuple[int, List[tuple]]]: refer to self.try_relocate
+        """
+        person = self.random.choice(self.people)
+        sites = person.find_potential_sites()
+        if not sites:
+            return None
+        site = self.random.choice(sites)
+        if site is person.assigned_site or not site.members:
+            return None
+        other = self.random.choice(site.members)
+        old_site = person.assigned_site
+
+        before = get_site_value(old_site) + get_site_value(site)
+        self.move_person(person, None)
+        self.move_person(other, None)
+        if can_join(person, site):
+            self.move_person(person, site)
+            if can_join(other, old_site):
+                self.move_person(other, old_site)
+                delta = (get_site_value(old_site) + get_site_value(site) -
+                         before)
+                return delta, [(person, old_site), (other, site)]
+
+        self.move_person(person, old_site)
+        self.move_person(other, site)
+        return None
+
+    def undo_move(self,
+                  moved: List[tuple]) -> None:
+        """
+        Puts people back into the sites they were in before a move.
+
+        Args:
+            moved (List[tuple]): (person, site) of everyone who moved
+        """
+        for person, _ in moved:
+            self.move_person(person, None)
+        for person, site in moved:
+            self.move_person(person, site)
+
+    def run(self,
+            time_budget: float,
+            start: Optional[SiteArrangement] = None,
+            max_moves: Optional[int] = None) -> SiteArrangement:
+        """
+        Runs the simulated annealing. The sites must be clear before the
+        search and are cleared again afterwards.
+
+        Args:
+            time_budget (float): number of seconds to search for
+            start (Optional[SiteArrangement]): arrangement to start from
+            max_moves (Optional[int]): stop after this many moves. The
+                temperature then follows the number of moves instead of the
+                time, so together with a seed the result is reproducible as
+                long as time_budget is long enough for max_moves moves.
+
+        Returns:
+            SiteArrangement: best arrangement found
+        """
+        assert check_all_sites_are_clear(), (
+            "The local search cannot start until all sites are clear")
+
+        start_time = time.perf_counter()
+        try:
+            self.install(start)
+            self.record_best(start_time)
+
+            while max_moves is None or self.num_moves < max_moves:
+                elapsed = time.perf_counter() - start_time
+                if elapsed >= time_budget:
+                    break
+
+                # Geometric cooling from INITIAL_TEMPERATURE to
+                # FINAL_TEMPERATURE over max_moves moves, or over the time
+                # budget if there is no max_moves. Counting moves keeps the
+                # timing of the machine out of which moves are kept.
+                if max_moves is not None:
+                    progress = self.num_moves / max_moves
+                else:
+                    progress = elapsed / time_budget
+                temperature = (INITIAL_TEMPERATURE *
+                               (FINAL_TEMPERATURE / INITIAL_TEMPERATURE) **
+                               progress)
+
+                self.num_moves += 1
+                if self.random.random() < SWAP_PROBABILITY:
+                    move = self.try_swap()
+                else:
+                    move = self.try_relocate()
+                if move is None:
+                    continue
+
+                delta, moved = move
+                if (delta >= 0 or
+                        self.random.random() < math.exp(delta / temperature)):
+                    self.value += delta
+                    self.num_accepted_moves += 1
+                    if self.value > self.best_value:
+                        self.record_best(start_time)
+                else:
+                    self.undo_move(moved)
+        finally:
+            for site in self.ids_to_sites.values():
+                site.clear()
+
+        return self.best_arrangement
+
+    def record_best(self,
+                    start_time: float) -> None:
+        """
+        Freezes the current arrangement as the best one so far.
+        """
+        self.best_value = self.value
+        self.best_arrangement = SiteArrangement()
+        self.best_arrangement.freeze()
+        if self.verbose:
+            num_assigned = sum(person.assigned_site is not None
+                               for person in self.people)
+            print(f"Found an arrangement with {self.get_num_full_sites()} "
+                  f"of {len(self.ids_to_sites)} sites full, {num_assigned} of "
+                  f"{len(self.people)} people assigned and a score of "
+                  f"{self.best_arrangement.score} after "
+                  f"{time.perf_counter() - start_time:.2f} seconds.")
+
+
+@typechecked
+def improve_site_arrangement(
+    people: List[DecalMember],
+    time_budget: float,
+    start: Optional[SiteArrangement] = None,
+    seed: Optional[int] = None,
+    max_moves: Optional[int] = None,
+    verbose: bool = True) -> SiteArrangement:
+    """
+    Improves an arrangement with simulated annealing (refer to LocalSearch).
+    The result has as many full sites as the search could find, then as
+    many assigned people, then the highest score.
+
+    Args:
+        people (List[DecalMember]): people to assign
+        time_budget (float): number of seconds to search for
+        start (Optional[SiteArrangement]): complete or partial arrangement
+            to start from. None means starting with every site empty.
+        seed (Optional[int]): seed for the random number generator
+        max_moves (Optional[int]): refer to LocalSearch.run
+        verbose (bool): refer to LocalSearch
+
+    Returns:
+        SiteArrangement: best arrangement found
+    """
+    search = LocalSearch(people, seed, verbose)
+    return search.run(time_budget, start, max_moves)
@@ -1,4 +1,11 @@
-from archived.site_assignments import *
+import os
+
+# Runtime type checks are only needed while developing (refer to settings.py)
+os.environ.setdefault("SITE_COORDINATION_PRODUCTION", "1")
+
+from classes import clear_all_sites, names_to_people, names_to_site_leaders
+from solver import iter_site_arrangements
+from snapshot import DEFAULT_SNAPSHOT_PATH, load_snapshot, save_snapshot
 #Reused
 complete_this_stage_later = lambda x: \
     "If you need more time to complete these instructions before proceeding, press Ctrl-C and then the 'Enter' button to exit. The next time you run this program, you need to start from Stage {}\n".format(x)
@@ -31,6 +38,8 @@ stage1b = "Excellent! Now, we need to collect responses from site leaders to get
 #Stage 2
 stage2 = "We are now on Stage 2. A script is going to show you the various sites and the site leaders who are assigned." + site_assignments_context + complete_this_stage_later(2)
 no_approval = "Oof. Let's try again."
+no_more_arrangements = "There are no other site assignments that work. Check the availabilities in the data subfolder."
+nobody_to_assign = "There is no one to assign to sites yet. Check the spreadsheets in the data subfolder."
 does_this_work = "Do these site assignments work? Type either 'yes' or 'no'.\n\n"
 
 #Stage 3
@@ -56,21 +65,50 @@ def get_input_from_user(text, error_message, accepted_values, return_type = str)
         user_input = input(error_message).lower()
     return return_type(user_input)
 
-def get_site_assignments_approval(text):
+def get_site_assignments_approval(text, arrangements = ()):
+    #arrangements can be the generator returned by iter_site_arrangements
+    #The next arrangement is only searched for once the current one is rejected
+    #Returns None once every arrangement has been rejected
     print(text)
-    #run code
-    user_approval = get_input_from_user(does_this_work, yes_no_error, ['yes', 'no'])
-    #run code
-    while user_approval != 'yes':
-        print(no_approval + "\n\n")
-        #run code
-        user_approval = get_input_from_user(does_this_work, yes_no_error, ['yes', 'no'])
+    arrangements = iter(arrangements)
+    try:
+        for arrangement in arrangements:
+            print(arrangement)
+            user_approval = get_input_from_user(does_this_work, yes_no_error, ['yes', 'no'])
+            if user_approval == 'yes':
+                return arrangement
+            print(no_approval + "\n\n")
+        print(no_more_arrangements)
+        return None
+    finally:
+        #Stops the search so that the sites are clear again
+        if hasattr(arrangements, 'close'):
+            arrangements.close()
+
+def search_site_assignments(text, people, mode):
+    #Shows the arrangements of people one at a time and exits if none of them is approved
+    if not people:
+        print(text)
+        raise SystemExit(nobody_to_assign)
+    arrangement = get_site_assignments_approval(text, iter_site_arrangements(people, mode))
+    if arrangement is None:
+        raise SystemExit(1)
+    return arrangement
 
 def separate_stages():
     print("\n\n-----------------------------------------------------------\n\n")
 
+def resume_from_snapshot(stage_number):
+    #Loads what was saved at the end of the previous stages instead of reading the spreadsheets again
+    if stage_number == 1 or not os.path.exists(DEFAULT_SNAPSHOT_PATH):
+        return []
+    snapshot = load_snapshot()
+    print("Loaded the {}.".format(snapshot))
+    return snapshot.arrangements
+
 if __name__ == "__main__":
     stage_number = get_input_from_user(intro_text, stage_number_error, ['1', '2', '3', '4'], int)
+    saved_arrangements = resume_from_snapshot(stage_number)
     separate_stages()
     if stage_number == 1:
         finished = get_input_from_user(stage1a, done_error, ['done'])
@@ -79,7 +117,14 @@ if __name__ == "__main__":
         stage_number += 1
         separate_stages()
     if stage_number == 2:
-        get_site_assignments_approval(stage2)
+        #SLs confirmed by an earlier run of Stage 2 are searched again
+        clear_all_sites()
+        site_leaders = list(names_to_site_leaders.values())
+        arrangement = search_site_assignments(stage2, site_leaders, 'partial')
+        #Confirms the SLs at their sites so that the snapshot keeps them there and Stage 4 only searches for everyone else
+        arrangement.unfreeze()
+        saved_arrangements = [arrangement]
+        save_snapshot(2, saved_arrangements)
         stage_number += 1
         separate_stages()
     if stage_number == 3:
@@ -87,7 +132,11 @@ if __name__ == "__main__":
         stage_number += 1
         separate_stages()
     if stage_number == 4:
-        get_site_assignments_approval(stage4)
+        people = [person for person in names_to_people.values() if person.assigned_site is None]
+        arrangement = search_site_assignments(stage4, people, 'full')
+        #Keeps the Stage 2 arrangement and replaces the one from an earlier run of Stage 4
+        saved_arrangements = saved_arrangements[:1] + [arrangement]
+        save_snapshot(4, saved_arrangements)
         print(end_text)
 
 
@@ -0,0 +1,152 @@
+"""
+Brute-force reference for checking the search engines.
+
+brute_force_site_arrangements tries every way of putting every person into
+a site at one of their availabilities, without any pruning, and keeps the
+ones that follow the rules. It is only usable for tiny cohorts, but since it
+shares no code with the engines, comparing an engine against it on many
+small random cohorts shows whether the engine
+
+    1. is complete: it finds every working arrangement, and
+    2. is sound: everything it finds is a working arrangement.
+
+For cohorts too large to brute-force, generate_planted_cohort in
+generator.py gives an arrangement that every complete engine must find.
+"""
+import itertools
+from typing import (Dict, FrozenSet, Iterable, List, Literal, Set, Tuple,
+                    Union)
+
+from classes import (DecalMember, SiteArrangement, ids_to_sites,
+                     MIN_STAFF_PER_SITE, MAX_STAFF_PER_SITE,
+                     MIN_NONSTAFF_PER_SITE, MAX_NONSTAFF_PER_SITE,
+                     MIN_PEOPLE_PER_SITE, MAX_PEOPLE_PER_SITE)
+from settings import typechecked
+
+
+# Arrangements are compared by the names of the members of every non-empty
+# site, so the order of the sites and of the people does not matter
+ArrangementKey = FrozenSet[Tuple[int, FrozenSet[str]]]
+
+
+@typechecked
+def get_arrangement_key(
+    arrangement: Union[SiteArrangement, Dict[int, List[str]]]
+    ) -> ArrangementKey:
+    """
+    Args:
+        arrangement (Union[SiteArrangement, Dict[int, List[str]]]): an
+            arrangement or its site_assignments
+
+    Returns:
+        ArrangementKey: (site ID, names) of every site with members
+    """
+    if isinstance(arrangement, SiteArrangement):
+        arrangement = arrangement.site_assignments
+    return frozenset((site_id, frozenset(names))
+                     for site_id, names in arrangement.items() if names)
+
+
+@typechecked
+def follows_rules(members: List[DecalMember],
+                  mode: Literal['full', 'partial']) -> bool:
+    """
+    Checks one site against the rules of check_all_sites_are_valid and, in
+    'full' mode, check_all_sites_are_full. As with Site.validate_person, a
+    site with MAX_PEOPLE_PER_SITE people also needs a driver.
+
+    Args:
+        members (List[DecalMember]): everyone in the site
+        mode (Literal['full', 'partial']): refer to create_site_arrangements
+
+    Returns:
+        bool: whether the site follows the rules
+    """
+    num_site_leaders = sum(person.leads_site for person in members)
+    num_staff = sum(person.in_staff for person in members)
+    num_nonstaff = len(members) - num_staff
+    has_driver = any(person.drives for person in members)
+
+    if (num_site_leaders > 1 or
+            num_staff > MAX_STAFF_PER_SITE or
+            num_nonstaff > MAX_NONSTAFF_PER_SITE or
+            len(members) > MAX_PEOPLE_PER_SITE or
+            (len(members) == MAX_PEOPLE_PER_SITE and not has_driver)):
+        return False
+
+    if mode == 'full':
+        return (num_site_leaders == 1 and has_driver and
+                num_staff >= MIN_STAFF_PER_SITE and
+                num_nonstaff >= MIN_NONSTAFF_PER_SITE and
+                len(members) >= MIN_PEOPLE_PER_SITE)
+    return True
+
+
+@typechecked
+def brute_force_site_arrangements(
+    people: List[DecalMember],
+    mode: Literal['full', 'partial']) -> Set[ArrangementKey]:
+    """
+    Finds every working arrangement by trying every combination of sites.
+    People who are already in a site stay there. Every site in ids_to_sites
+    is checked, including the ones that nobody joins.
+
+    Only use this for a handful of people: the number of combinations is
+    the product of the number of sites at each person's availabilities.
+
+    Args:
+        people (List[DecalMember]): people to assign
+        mode (Literal['full', 'partial']): refer to create_site_arrangements
+
+    Returns:
+        Set[ArrangementKey]: keys of every working arrangement (refer to
+                             get_arrangement_key)
+    """
+    assert all([person.assigned_site is None for person in people])
+
+    sites = list(ids_to_sites.values())
+    options = [[site for site in sites
+                if person.availability_mask & site.time_bit]
+               for person in people]
+
+    arrangements = set()
+    for choice in itertools.product(*options):
+        members = {site.id: list(site.members) for site in sites}
+        for person, site in zip(people, choice):
+            members[site.id].append(person)
+        if all(follows_rules(site_members, mode)
+               for site_members in members.values()):
+            arrangements.add(frozenset(
+                (site_id, frozenset(person.name for person in site_members))
+                for site_id, site_members in members.items()
+                if site_members))
+    return arrangements
+
+
+@typechecked
+def compare_with_brute_force(
+    arrangements: Iterable[SiteArrangement],
+    people: List[DecalMember],
+    mode: Literal['full', 'partial']
+    ) -> Tuple[Set[ArrangementKey], Set[ArrangementKey], int]:
+    """
+    Compares the arrangements found by an engine with
+    brute_force_site_arrangements. The engine has to be run without symmetry
+    breaking, since otherwise it leaves out arrangements on purpose.
+
+    Args:
+        arrangements (Iterable[SiteArrangement]): everything the engine found
+        people (List[DecalMember]): people that the engine assigned
+        mode (Literal['full', 'partial']): mode that the engine ran in
+
+    Returns:
+        Tuple[Set[ArrangementKey], Set[ArrangementKey], int]: arrangements
+            that the engine missed, arrangements that the engine found but
+            break the rules, and the number of arrangements that the engine
+            found more than once. All three are empty or 0 for a correct
+            engine.
+    """
+    found = [get_arrangement_key(arrangement) for arrangement in arrangements]
+    expected = brute_force_site_arrangements(people, mode)
+    return (expected - set(found), set(found) - expected,
+            len(found) - len(set(found)))
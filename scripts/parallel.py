@@ -0,0 +1,560 @@
+"""
+Runs the search in solver.py on several processes at once.
+
+The first few decisions of the search (usually where the most constrained
+SLs go) are made in the main process. Every way of making them is a separate
+subtree that is searched by one of the worker processes. Each worker rebuilds
+its own copy of the districts, schools, sites and people from export_records,
+so no state is shared between processes. Together the subtrees cover exactly
+the arrangements that iter_site_arrangements finds. Workers send their
+arrangements back in small chunks as they find them, so the first ones
+arrive long before a large subtree is finished.
+
+iter_components_parallel instead gives each group of people and sites that
+do not affect each other (refer to find_components) to its own worker and
+combines the arrangements of the groups.
+"""
+import multiprocessing
+import multiprocessing.queues
+import os
+import queue
+import time
+from array import array
+from functools import partial
+from typing import Dict, Iterator, List, Literal, Optional, Tuple
+
+from classes import (DecalMember, SiteArrangement, export_records,
+                     get_scenario, ids_to_sites, import_records,
+                     names_to_people)
+from presolve import (bound_availabilities, explain_infeasibility,
+                      find_components, format_reasons)
+from settings import typechecked
+from solver import ForwardCheckingSearch, iter_product
+
+
+# When split_depth is not given, the tree is split until there are at least
+# this many subtrees per worker so that the work can be spread evenly
+SUBTREES_PER_WORKER = 4
+
+# Number of arrangements a worker sends to the main process at once, and
+# number of chunks per worker that can wait to be read. A worker that gets
+# this far ahead of the main process waits instead of keeping more results
+# in memory.
+RESULTS_PER_CHUNK = 16
+CHUNKS_PER_WORKER = 4
+
+# Strategies raced by solve_portfolio by default. Each one is a set of
+# keyword arguments of ForwardCheckingSearch.
+DEFAULT_PORTFOLIO = [
+    {'variable_ordering': 'busy_first', 'value_ordering': 'drivers'},
+    {'variable_ordering': 'drivers_first', 'value_ordering': 'drivers'},
+    {'variable_ordering': 'busy_first', 'value_ordering': 'fewest_candidates'},
+    {'variable_ordering': 'drivers_first',
+     'value_ordering': 'fewest_candidates'},
+    {'variable_ordering': 'busy_first', 'value_ordering': 'drivers', 'seed': 1},
+    {'variable_ordering': 'drivers_first', 'value_ordering': 'drivers',
+     'seed': 2}
+]
+
+# People, search options and result queue of a worker process, set by
+# initialize_worker
+worker_people = []
+worker_options = {}
+worker_results = None
+
+
+def initialize_worker(records: Dict[str, list],
+                      people_names: List[str],
+                      options: dict,
+                      results: Optional[multiprocessing.queues.Queue] = None
+                      ) -> None:
+    """
+    Runs once in every worker process before any subtree is searched.
+
+    Args:
+        records (Dict[str, list]): output of export_records
+        people_names (List[str]): names of the people to assign
+        options (dict): keyword arguments of ForwardCheckingSearch
+        results (Optional[multiprocessing.queues.Queue]): where
+            search_subtree sends its arrangements
+    """
+    global worker_results
+
+    import_records(records)
+    worker_people[:] = [names_to_people[name] for name in people_names]
+    worker_options.update(options)
+    worker_results = results
+
+
+def iter_subtree(prefix: List[Tuple[str, int]],
+                 max_results: Optional[int],
+                 deadline_time: Optional[float]
+                 ) -> Iterator[Dict[int, List[str]]]:
+    """
+    Finds every arrangement that starts with the assignments in prefix.
+    Runs in a worker process.
+
+    Args:
+        prefix (List[Tuple[str, int]]): (name, site ID) of the first
+                                        assignments
+        max_results (Optional[int]): stop after this many arrangements
+        deadline_time (Optional[float]): time.time() value after which the
+                                         search stops. Subtrees that wait
+                                         for a free worker share the same
+                                         deadline as the others.
+
+    Yields:
+        Dict[int, List[str]]: site_assignments of each arrangement
+    """
+    deadline = None
+    if deadline_time is not None:
+        deadline = time.perf_counter() + deadline_time - time.time()
+
+    search = ForwardCheckingSearch(worker_people, **worker_options)
+    indices = {person.name: i for i, person in enumerate(search.people)}
+
+    arrangements = search.search(deadline, [(indices[name], site_id)
+                                            for name, site_id in prefix])
+    try:
+        for num_results, arrangement in enumerate(arrangements, 1):
+            yield arrangement.site_assignments
+            if max_results is not None and num_results >= max_results:
+                break
+    finally:
+        arrangements.close()
+
+
+def search_subtree(prefix: List[Tuple[str, int]],
+                   max_results: Optional[int],
+                   deadline_time: Optional[float]) -> None:
+    """
+    Sends the arrangements of iter_subtree to worker_results in lists of up
+    to RESULTS_PER_CHUNK as they are found, then None once the subtree is
+    done. Runs in a worker process.
+
+    Args:
+        prefix (List[Tuple[str, int]]): refer to iter_subtree
+        max_results (Optional[int]): refer to iter_subtree
+        deadline_time (Optional[float]): refer to iter_subtree
+    """
+    chunk = []
+    try:
+        for site_assignments in iter_subtree(prefix, max_results,
+                                             deadline_time):
+            chunk.append(site_assignments)
+            if len(chunk) >= RESULTS_PER_CHUNK:
+                worker_results.put(chunk)
+                chunk = []
+        if chunk:
+            worker_results.put(chunk)
+    finally:
+        # Sent even if the search fails so that the main process does not
+        # wait for this subtree forever
+        worker_results.put(None)
+
+
+def search_component(people_names: List[str],
+                     site_ids: List[int],
+                     max_results: Optional[int],
+                     deadline_time: Optional[float]) -> List[List[int]]:
+    """
+    Finds every arrangement of one group of find_components. Runs in a
+    worker process.
+
+    Args:
+        people_names (List[str]): names of the people of the group
+        site_ids (List[int]): IDs of the sites of the group
+        max_results (Optional[int]): stop after this many arrangements
+        deadline_time (Optional[float]): refer to iter_subtree
+
+    Returns:
+        List[List[int]]: for every arrangement, the ID of the site of each
+                         person in people_names
+    """
+    deadline = None
+    if deadline_time is not None:
+        deadline = time.perf_counter() + deadline_time - time.time()
+
+    people = [names_to_people[name] for name in people_names]
+    search = ForwardCheckingSearch(
+        people, sites=[ids_to_sites[site_id] for site_id in site_ids],
+        **worker_options)
+
+    results = []
+    arrangements = search.search(deadline)
+    try:
+        for arrangement in arrangements:
+            results.append([arrangement.sites[person.index]
+                            for person in people])
+            if max_results is not None and len(results) >= max_results:
+                break
+    finally:
+        arrangements.close()
+    return results
+
+
+@typechecked
+def split_search(search: ForwardCheckingSearch,
+                 num_subtrees: int,
+                 split_depth: Optional[int] = None
+                 ) -> List[List[Tuple[str, int]]]:
+    """
+    Splits the search tree into subtrees at the first split_depth decisions.
+
+    Args:
+        search (ForwardCheckingSearch): search to split
+        num_subtrees (int): if split_depth is None, the tree is split deeper
+                            and deeper until there are this many subtrees
+        split_depth (Optional[int]): number of decisions made before
+                                     splitting
+
+    Returns:
+        List[List[Tuple[str, int]]]: (name, site ID) of the decisions that
+                                     lead to each subtree
+    """
+    def get_prefixes(depth):
+        return [[(search.people[index].name, site_id)
+                 for index, site_id in prefix]
+                for prefix in search.iter_prefixes(depth)]
+
+    if split_depth is not None:
+        return get_prefixes(split_depth)
+
+    depth = 1
+    prefixes = get_prefixes(depth)
+    while len(prefixes) < num_subtrees and depth < len(search.people):
+        depth += 1
+        deeper_prefixes = get_prefixes(depth)
+
+        # Every branch ended before reaching this depth
+        if len(deeper_prefixes) == len(prefixes):
+            break
+        prefixes = deeper_prefixes
+    return prefixes
+
+
+@typechecked
+def iter_site_arrangements_parallel(
+    people: List[DecalMember],
+    mode: Literal['full', 'partial'],
+    num_workers: Optional[int] = None,
+    split_depth: Optional[int] = None,
+    max_results: Optional[int] = None,
+    deadline_seconds: Optional[float] = None,
+    break_symmetry: bool = True,
+    transposition_table_size: int = 100000) -> Iterator[SiteArrangement]:
+    """
+    Same as iter_site_arrangements, but the search is spread over
+    num_workers processes. The arrangements are yielded as soon as a worker
+    sends them (refer to search_subtree), so they come in a different order
+    than with iter_site_arrangements. Unlike iter_site_arrangements, the
+    sites are never changed in this process; unfreeze an arrangement to
+    apply it.
+
+    Args:
+        people (List[DecalMember]): people to assign
+        mode (Literal['full', 'partial']): refer to create_site_arrangements
+        num_workers (Optional[int]): number of processes. None means one per
+                                     CPU.
+        split_depth (Optional[int]): number of decisions made before
+            splitting the tree. None means as deep as needed to get
+            SUBTREES_PER_WORKER subtrees per worker.
+        max_results (Optional[int]): refer to iter_site_arrangements
+        deadline_seconds (Optional[float]): refer to iter_site_arrangements
+        break_symmetry (bool): refer to create_site_arrangements
+        transposition_table_size (int): refer to create_site_arrangements
+
+    Yields:
+        SiteArrangement
+    """
+    assert all([person.assigned_site is None for person in people])
+
+    deadline_time = None
+    if deadline_seconds is not None:
+        deadline_time = time.time() + deadline_seconds
+
+    if num_workers is None:
+        num_workers = os.cpu_count() or 1
+
+    if max_results is not None and max_results <= 0:
+        return
+
+    # Don't bother searching if a quick check proves there is no arrangement,
+    # and leave out the availabilities that no arrangement can use
+    reasons = explain_infeasibility(people, mode)
+    if not reasons:
+        bounds = bound_availabilities(people, mode)
+        reasons = bounds.reasons
+    if reasons:
+        print(format_reasons(reasons))
+        return
+
+    search = ForwardCheckingSearch(people, mode, break_symmetry,
+                                   transposition_table_size,
+                                   availability_masks=bounds.masks)
+    prefixes = split_search(search, num_workers * SUBTREES_PER_WORKER,
+                            split_depth)
+    if not prefixes:
+        return
+
+    options = {'mode': mode,
+               'break_symmetry': break_symmetry,
+               'transposition_table_size': transposition_table_size,
+               'availability_masks': bounds.masks}
+    results = multiprocessing.Queue(maxsize=num_workers * CHUNKS_PER_WORKER)
+    pool = multiprocessing.Pool(
+        processes=num_workers,
+        initializer=initialize_worker,
+        initargs=(export_records(), [person.name for person in people],
+                  options, results))
+    try:
+        tasks = pool.map_async(
+            partial(search_subtree, max_results=max_results,
+                    deadline_time=deadline_time),
+            prefixes, chunksize=1)
+
+        # The subtrees should never overlap, but make sure that no
+        # arrangement is yielded twice
+        seen = set()
+        num_finished = 0
+        while num_finished < len(prefixes):
+            chunk = results.get()
+            if chunk is None:
+                num_finished += 1
+                continue
+
+            for site_assignments in chunk:
+                key = tuple(sorted((site_id, tuple(names)) for site_id, names
+                                   in site_assignments.items()))
+                if key in seen:
+                    continue
+                seen.add(key)
+
+                arrangement = SiteArrangement()
+                arrangement.site_assignments = site_assignments
+                yield arrangement
+                if max_results is not None and len(seen) >= max_results:
+                    return
+
+        # Raise the error of any subtree that failed
+        tasks.get()
+    finally:
+        # Stop the subtrees that are still being searched instead of letting
+        # them run until they finish or reach the deadline
+        pool.terminate()
+        pool.join()
+
+
+@typechecked
+def iter_components_parallel(
+    people: List[DecalMember],
+    mode: Literal['full', 'partial'],
+    num_workers: Optional[int] = None,
+    max_results: Optional[int] = None,
+    deadline_seconds: Optional[float] = None,
+    break_symmetry: bool = True,
+    transposition_table_size: int = 100000) -> Iterator[SiteArrangement]:
+    """
+    Same as iter_site_arrangements, but each group of find_components is
+    searched by its own worker process. The arrangements of the groups are
+    combined in the main process as soon as every group has one, so it only
+    helps when there are several groups of similar size. As with
+    iter_site_arrangements_parallel, the sites are never changed in this
+    process.
+
+    Args:
+        people (List[DecalMember]): people to assign
+        mode (Literal['full', 'partial']): refer to create_site_arrangements
+        num_workers (Optional[int]): number of processes. None means one per
+                                     CPU.
+        max_results (Optional[int]): refer to iter_site_arrangements. Each
+                                     group stops after this many as well.
+        deadline_seconds (Optional[float]): refer to iter_site_arrangements
+        break_symmetry (bool): refer to create_site_arrangements
+        transposition_table_size (int): refer to create_site_arrangements
+
+    Yields:
+        SiteArrangement
+    """
+    assert all([person.assigned_site is None for person in people])
+
+    deadline_time = None
+    if deadline_seconds is not None:
+        deadline_time = time.time() + deadline_seconds
+
+    if num_workers is None:
+        num_workers = os.cpu_count() or 1
+
+    if max_results is not None and max_results <= 0:
+        return
+
+    # Don't bother searching if a quick check proves there is no arrangement,
+    # and leave out the availabilities that no arrangement can use
+    reasons = explain_infeasibility(people, mode)
+    if not reasons:
+        bounds = bound_availabilities(people, mode)
+        reasons = bounds.reasons
+    if reasons:
+        print(format_reasons(reasons))
+        return
+
+    options = {'mode': mode,
+               'break_symmetry': break_symmetry,
+               'transposition_table_size': transposition_table_size,
+               'availability_masks': bounds.masks}
+    pool = multiprocessing.Pool(
+        processes=num_workers,
+        initializer=initialize_worker,
+        initargs=(export_records(), [person.name for person in people],
+                  options))
+
+    def iter_results(result):
+        yield from result.get()
+
+    # Where everyone outside of the groups is (e.g. confirmed SLs at sites
+    # that no group has), as in combine_searches
+    base = get_scenario().person_sites[:]
+    try:
+        components = find_components(people, bounds.masks)
+        results = [pool.apply_async(search_component,
+                                    ([person.name for person in group_people],
+                                     [site.id for site in group_sites],
+                                     max_results, deadline_time))
+                   for group_people, group_sites in components]
+
+        num_results = 0
+        for combination in iter_product([iter_results(result)
+                                         for result in results]):
+            sites = array('i', base)
+            for (group_people, _), group_sites in zip(components,
+                                                      combination):
+                for person, site_id in zip(group_people, group_sites):
+                    sites[person.index] = site_id
+
+            arrangement = SiteArrangement()
+            arrangement.sites = sites
+            yield arrangement
+            num_results += 1
+            if max_results is not None and num_results >= max_results:
+                return
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def race_strategy(records: Dict[str, list],
+                  people_names: List[str],
+                  options: dict,
+                  deadline_time: Optional[float],
+                  results: multiprocessing.queues.Queue,
+                  position: int) -> None:
+    """
+    Runs one strategy of solve_portfolio in its own process and puts
+    (position, site_assignments of the first arrangement or None) in results.
+
+    Args:
+        records (Dict[str, list]): output of export_records
+        people_names (List[str]): names of the people to assign
+        options (dict): keyword arguments of ForwardCheckingSearch
+        deadline_time (Optional[float]): time.time() value after which the
+                                         search stops
+        results (multiprocessing.queues.Queue): where the result is sent
+        position (int): position of the strategy in the portfolio
+    """
+    initialize_worker(records, people_names, options)
+    results.put((position, next(iter_subtree([], 1, deadline_time), None)))
+
+
+@typechecked
+def solve_portfolio(
+    people: List[DecalMember],
+    mode: Literal['full', 'partial'] = 'full',
+    strategies: Optional[List[dict]] = None,
+    deadline_seconds: Optional[float] = None,
+    break_symmetry: bool = True,
+    transposition_table_size: int = 100000) -> Optional[SiteArrangement]:
+    """
+    Runs several search strategies at the same time, each in its own
+    process, and returns the first arrangement that any of them finds. The
+    other processes are stopped as soon as one strategy succeeds.
+
+    Args:
+        people (List[DecalMember]): people to assign
+        mode (Literal['full', 'partial']): refer to create_site_arrangements
+        strategies (Optional[List[dict]]): keyword arguments of
+            ForwardCheckingSearch (variable_ordering, value_ordering and
+            seed) for each strategy. None means DEFAULT_PORTFOLIO.
+        deadline_seconds (Optional[float]): give up after this many seconds.
+                                            None means no limit.
+        break_symmetry (bool): refer to create_site_arrangements
+        transposition_table_size (int): refer to create_site_arrangements
+
+    Returns:
+        Optional[SiteArrangement]: None if no strategy found an arrangement
+                                   in time
+    """
+    assert all([person.assigned_site is None for person in people])
+
+    start_time = time.time()
+    deadline_time = None
+    if deadline_seconds is not None:
+        deadline_time = start_time + deadline_seconds
+
+    if strategies is None:
+        strategies = DEFAULT_PORTFOLIO
+
+    # Don't bother searching if a quick check proves there is no arrangement,
+    # and leave out the availabilities that no arrangement can use
+    reasons = explain_infeasibility(people, mode)
+    if not reasons:
+        bounds = bound_availabilities(people, mode)
+        reasons = bounds.reasons
+    if reasons:
+        print(format_reasons(reasons))
+        return None
+
+    records = export_records()
+    people_names = [person.name for person in people]
+    results = multiprocessing.Queue()
+    processes = []
+    for position, strategy in enumerate(strategies):
+        options = {'mode': mode,
+                   'break_symmetry': break_symmetry,
+                   'transposition_table_size': transposition_table_size,
+                   'availability_masks': bounds.masks,
+                   **strategy}
+        process = multiprocessing.Process(
+            target=race_strategy,
+            args=(records, people_names, options, deadline_time, results,
+                  position),
+            daemon=True)
+        process.start()
+        processes.append(process)
+
+    try:
+        num_finished = 0
+        while num_finished < len(strategies):
+            try:
+                position, site_assignments = results.get(timeout=1.0)
+            except queue.Empty:
+                # Stop waiting once time is up or every process has crashed
+                if (deadline_time is not None and time.time() > deadline_time
+                        or not any(process.is_alive()
+                                   for process in processes)):
+                    break
+                continue
+
+            num_finished += 1
+            if site_assignments is not None:
+                print(f"Strategy {strategies[position]} found an arrangement "
+                      f"in {time.time() - start_time:.2f} seconds.")
+                arrangement = SiteArrangement()
+                arrangement.site_assignments = site_assignments
+                return arrangement
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.join()
+
+    return None
@@ -0,0 +1,606 @@
+"""
+Checks that can be run in milliseconds before the search in solver.py.
+
+The search can spend minutes proving that no arrangement exists. A lot of
+the time the reason is simple enough to be found without any search at all:
+
+    1. counting: e.g. the sites at a time slot need more people than are
+       available then, or more people can only go to those sites than fit
+    2. matching: every site needs a SL and a driver of its own, so a group
+       of sites with fewer SLs (or drivers) available than sites can never
+       all be filled (Hall's theorem)
+
+explain_infeasibility turns every such problem into a sentence that a
+coordinator can act on.
+"""
+import time
+from collections import deque
+from typing import Callable, Dict, Hashable, List, Literal, Optional, Tuple
+
+from classes import (DecalMember, Site, ids_to_sites, times_to_sites,
+                     MIN_STAFF_PER_SITE, MAX_STAFF_PER_SITE,
+                     MIN_NONSTAFF_PER_SITE, MAX_NONSTAFF_PER_SITE,
+                     MIN_PEOPLE_PER_SITE, MAX_PEOPLE_PER_SITE)
+from settings import typechecked
+
+
+@typechecked
+def find_maximum_matching(
+    edges: List[List[Hashable]]) -> List[Optional[Hashable]]:
+    """
+    Finds a maximum matching of a bipartite graph with the Hopcroft-Karp
+    algorithm.
+
+    Args:
+        edges (List[List[Hashable]]): edges[i] lists the right vertices that
+                                      left vertex i can be matched to
+
+    Returns:
+        List[Optional[Hashable]]: right vertex matched to each left vertex,
+                                  or None
+    """
+    # right_matches[right] = left vertex matched to it
+    # left_matches[i] = right vertex matched to left vertex i
+    right_matches = {}
+    left_matches = [None] * len(edges)
+
+    def build_layers() -> Optional[Dict[int, int]]:
+        """
+        Breadth-first search from every unmatched left vertex. Returns the
+        distance of every reachable left vertex or None if there is no
+        augmenting path left.
+        """
+        distances = {}
+        queue = deque()
+        for i, right in enumerate(left_matches):
+            if right is None:
+                distances[i] = 0
+                queue.append(i)
+
+        found_augmenting_path = False
+        while queue:
+            i = queue.popleft()
+            for right in edges[i]:
+                j = right_matches.get(right)
+                if j is None:
+                    found_augmenting_path = True
+                elif j not in distances:
+                    distances[j] = distances[i] + 1
+                    queue.append(j)
+        return distances if found_augmenting_path else None
+
+    def augment(i: int,
+                distances: Dict[int, int]) -> bool:
+        """
+        Depth-first search along the layers for an augmenting path from left
+        vertex i.
+        """
+        for right in edges[i]:
+            j = right_matches.get(right)
+            if j is None or (distances.get(j) == distances[i] + 1 and
+                             augment(j, distances)):
+                right_matches[right] = i
+                left_matches[i] = right
+                return True
+
+        # No augmenting path goes through left vertex i during this phase
+        distances.pop(i)
+        return False
+
+    distances = build_layers()
+    while distances is not None:
+        for i, right in enumerate(left_matches):
+            if right is None and i in distances:
+                augment(i, distances)
+        distances = build_layers()
+
+    return left_matches
+
+
+@typechecked
+def find_hall_violators(edges: List[List[Hashable]],
+                        left_matches: List[Optional[Hashable]]
+                        ) -> List[Tuple[List[int], List[Hashable]]]:
+    """
+    Finds groups of left vertices with fewer neighbours than vertices, which
+    prove that a maximum matching cannot match every left vertex (Hall's
+    theorem). Each group is the set of left vertices reachable by
+    alternating paths from one or more unmatched left vertices. Groups that
+    share a neighbour are merged.
+
+    Args:
+        edges (List[List[Hashable]]): refer to find_maximum_matching
+        left_matches (List[Optional[Hashable]]): output of
+                                                 find_maximum_matching
+
+    Returns:
+        List[Tuple[List[int], List[Hashable]]]: the left vertices and the
+            neighbours of each group. Each group has as many more left
+            vertices than neighbours as it has unmatched left vertices.
+    """
+    right_matches = {right: i for i, right in enumerate(left_matches)
+                     if right is not None}
+    groups = []
+    for start, match in enumerate(left_matches):
+        if match is not None:
+            continue
+        lefts, rights = find_alternating_tree(edges, right_matches, start)
+        for other in [group for group in groups
+                      if set(group[0]) & set(lefts) or
+                      set(group[1]) & set(rights)]:
+            groups.remove(other)
+            lefts = other[0] + [i for i in lefts if i not in other[0]]
+            rights = other[1] + [right for right in rights
+                                 if right not in other[1]]
+        groups.append((lefts, rights))
+    return groups
+
+
+def find_alternating_tree(edges: List[List[Hashable]],
+                          right_matches: Dict[Hashable, int],
+                          start: int) -> Tuple[List[int], List[Hashable]]:
+    """
+    Breadth-first search along alternating paths (any edge from a left
+    vertex, matched edges from a right vertex) of find_hall_violators.
+    """
+    lefts = [start]
+    rights = []
+    seen_lefts = {start}
+    seen_rights = set()
+    queue = deque([start])
+    while queue:
+        i = queue.popleft()
+        for right in edges[i]:
+            if right in seen_rights:
+                continue
+            seen_rights.add(right)
+            rights.append(right)
+
+            # Every neighbour is matched, otherwise the matching could grow
+            j = right_matches[right]
+            if j not in seen_lefts:
+                seen_lefts.add(j)
+                lefts.append(j)
+                queue.append(j)
+    return lefts, rights
+
+
+# (singular, plural, who counts, how many more a site needs, how many more
+# a site can take) for every kind of person that explain_infeasibility
+# counts. SLs and drivers are handled with matchings instead.
+COUNTED_KINDS = [
+    ("staff member", "staff members",
+     lambda person: person.in_staff,
+     lambda site: max(0, MIN_STAFF_PER_SITE - site.num_staff),
+     lambda site: MAX_STAFF_PER_SITE - site.num_staff),
+    ("decal member", "decal members",
+     lambda person: not person.in_staff,
+     lambda site: max(0, MIN_NONSTAFF_PER_SITE - site.num_nonstaff),
+     lambda site: MAX_NONSTAFF_PER_SITE - site.num_nonstaff),
+    ("person", "people",
+     lambda person: True,
+     lambda site: max(0, MIN_PEOPLE_PER_SITE - len(site.members)),
+     lambda site: MAX_PEOPLE_PER_SITE - len(site.members))
+]
+
+
+def count(number: int,
+          singular: str,
+          plural: str) -> str:
+    """
+    e.g. count(1, "site", "sites") = "1 site"
+    """
+    return f"{number} {singular if number == 1 else plural}"
+
+
+def join_names(names: List[str]) -> str:
+    """
+    e.g. join_names(["A", "B", "C"]) = "A, B and C"
+    """
+    if len(names) <= 1:
+        return "".join(names)
+    return ", ".join(names[:-1]) + " and " + names[-1]
+
+
+def describe_sites(sites: List[Site]) -> str:
+    """
+    e.g. "Harding A (Monday 3PM - 4PM) and Harding B (Tuesday 3PM - 4PM)",
+    in the order the sites were created
+    """
+    return join_names([f"{site.name} ({site.time})"
+                       for site in sorted(sites, key=lambda site: site.id)])
+
+
+@typechecked
+def explain_unmatched_sites(people: List[DecalMember],
+                            sites: List[Site],
+                            is_helper: Callable,
+                            singular: str,
+                            plural: str) -> List[str]:
+    """
+    Matches every site to a different person who can fill one of its needs
+    (a SL or a driver) and explains every group of sites that cannot all be
+    matched.
+
+    Args:
+        people (List[DecalMember]): people who are not in a site yet
+        sites (List[Site]): sites that still need a SL or a driver
+        is_helper (Callable): whether a person can fill the need
+        singular (str): e.g. "driver"
+        plural (str): e.g. "drivers"
+
+    Returns:
+        List[str]: one sentence per group of sites
+    """
+    helpers = [person for person in people if is_helper(person)]
+    edges = [[i for i, person in enumerate(helpers)
+              if person.availability_mask & site.time_bit]
+             for site in sites]
+    matches = find_maximum_matching(edges)
+
+    reasons = []
+    for site_positions, helper_positions in find_hall_violators(edges,
+                                                                matches):
+        group = [sites[i] for i in site_positions]
+        names = [helpers[i].name for i in helper_positions]
+        times = {site.time for site in group}
+        if len(times) == 1:
+            if names:
+                available = (f"only {count(len(names), singular, plural)} "
+                             f"available ({join_names(names)})")
+            else:
+                available = f"no {plural} available"
+            reasons.append(
+                f"{times.pop()} has {count(len(group), 'site', 'sites')} "
+                f"without a {singular} but {available}")
+        elif len(names) == 0:
+            reasons.append(f"No {singular} is available for "
+                           f"{describe_sites(group)}")
+        elif len(names) == 1:
+            reasons.append(f"{names[0]} is the only {singular} available "
+                           f"for {describe_sites(group)}")
+        else:
+            reasons.append(f"Only {join_names(names)} are available as "
+                           f"{plural} for {describe_sites(group)}")
+    return reasons
+
+
+@typechecked
+def explain_infeasibility(
+    people: List[DecalMember],
+    mode: Literal['full', 'partial'] = 'full') -> List[str]:
+    """
+    Looks for reasons why no arrangement can exist without searching.
+    Everything found is a proof: if this returns anything, the search would
+    not find an arrangement either. The opposite is not true, since some
+    problems can only be found by searching.
+
+    The checks are:
+        1. everyone is available at the time of at least one site
+        2. every SL can be given a different site (matching)
+        3. in 'full' mode, every site can be given a different SL and a
+           different driver (matching)
+        4. at every time slot and over all sites, in 'full' mode, there are
+           enough staff, decal members and people available to reach the
+           minimum of every site (counting)
+        5. at every time slot and over all sites, the people who can only
+           go to those sites fit in them (counting)
+
+    Args:
+        people (List[DecalMember]): people to assign. People who are already
+                                    in a site count towards that site.
+        mode (Literal['full', 'partial']): refer to create_site_arrangements
+
+    Returns:
+        List[str]: plain sentences, e.g. "Monday 3PM - 4PM has 3 sites
+                   without a driver but only 1 driver available (Bob)".
+                   Empty if nothing was found.
+    """
+    reasons = []
+    people = [person for person in people if person.assigned_site is None]
+    sites = list(ids_to_sites.values())
+
+    # 1. Nowhere to go
+    for person in people:
+        if not person.find_potential_sites():
+            reasons.append(f"{person.name} is not available at the time of "
+                           f"any site")
+
+    # 2. Too many SLs for the sites they can lead
+    site_leaders = [person for person in people if person.leads_site]
+    edges = [[site.id for site in sl.find_potential_sites()
+              if not site.has_site_leader]
+             for sl in site_leaders]
+    matches = find_maximum_matching(edges)
+    for sl_positions, site_ids in find_hall_violators(edges, matches):
+        names = [site_leaders[i].name for i in sl_positions]
+        if site_ids:
+            reasons.append(
+                f"{count(len(names), 'site leader', 'site leaders')} "
+                f"({join_names(names)}) can only lead "
+                f"{count(len(site_ids), 'site', 'sites')}: "
+                f"{describe_sites([ids_to_sites[i] for i in site_ids])}")
+        elif site_leaders[sl_positions[0]].find_potential_sites():
+            reasons.append(f"{names[0]} is only available at the time of "
+                           f"sites that already have a site leader")
+
+    # 3. Sites without a SL or a driver
+    if mode == 'full':
+        reasons += explain_unmatched_sites(
+            people, [site for site in sites if not site.has_site_leader],
+            lambda person: person.leads_site, "site leader", "site leaders")
+        reasons += explain_unmatched_sites(
+            people, [site for site in sites if not site.has_driver],
+            lambda person: person.drives, "driver", "drivers")
+
+    # 4 and 5. Counting, first at each time slot and then over all sites
+    slot_masks = {site_time: times_to_sites[site_time][0].time_bit
+                  for site_time in times_to_sites}
+    groups = [(f"{site_time} has", slot_sites, slot_masks[site_time])
+              for site_time, slot_sites in times_to_sites.items()]
+    all_sites_mask = 0
+    for mask in slot_masks.values():
+        all_sites_mask |= mask
+    groups.append(("There are", sites, all_sites_mask))
+
+    for prefix, group_sites, mask in groups:
+        if not group_sites:
+            continue
+        available = [person for person in people
+                     if person.availability_mask & mask]
+        only_here = [person for person in available
+                     if not person.availability_mask & all_sites_mask & ~mask]
+        sites_text = count(len(group_sites), 'site', 'sites')
+        for singular, plural, counts, get_need, get_room in COUNTED_KINDS:
+            need = sum(get_need(site) for site in group_sites)
+            num_available = len([person for person in available
+                                 if counts(person)])
+            if mode == 'full' and need > num_available:
+                if num_available:
+                    available_text = (
+                        f"only {count(num_available, singular, plural)}")
+                else:
+                    available_text = f"no {plural}"
+                reasons.append(
+                    f"{prefix} {sites_text} needing {need} more {plural} "
+                    f"but {available_text} available")
+
+            room = sum(get_room(site) for site in group_sites)
+            num_only_here = len([person for person in only_here
+                                 if counts(person)])
+            if num_only_here > room:
+                reasons.append(
+                    f"{prefix} {sites_text} with room for {room} more "
+                    f"{singular if room == 1 else plural} but "
+                    f"{count(num_only_here, singular, plural)} cannot go "
+                    f"anywhere else")
+    return reasons
+
+
+# COUNTED_KINDS plus SLs and drivers, for bound_availabilities. Sites can
+# take any number of drivers, so their room is None.
+BOUNDED_KINDS = COUNTED_KINDS + [
+    ("site leader", "site leaders",
+     lambda person: person.leads_site,
+     lambda site: 0 if site.has_site_leader else 1,
+     lambda site: 0 if site.has_site_leader else 1),
+    ("driver", "drivers",
+     lambda person: person.drives,
+     lambda site: 0 if site.has_driver else 1,
+     lambda site: None)
+]
+
+
+@typechecked
+class AvailabilityBounds:
+    def __init__(self,
+                 masks: Dict[str, int],
+                 dropped: Dict[str, List[str]],
+                 unusable_sites: List[Site],
+                 reasons: List[str],
+                 elapsed: float):
+        """
+        Result of bound_availabilities.
+
+        Args:
+            masks (Dict[str, int]): maps the name of every person to the
+                availability bitmask of the time slots they can still go to
+            dropped (Dict[str, List[str]]): maps the name of every person
+                who lost availabilities to the time slots that were dropped
+            unusable_sites (List[Site]): sites that nobody can join anymore
+            reasons (List[str]): why no arrangement can exist, if the bounds
+                proved it
+            elapsed (float): number of seconds the bounds took
+        """
+        self.masks = masks
+        self.dropped = dropped
+        self.unusable_sites = unusable_sites
+        self.reasons = reasons
+        self.elapsed = elapsed
+
+    def is_feasible(self) -> bool:
+        """
+        Returns:
+            bool: False if no arrangement can exist
+        """
+        return not self.reasons
+
+    def __str__(self):
+        num_dropped = sum(len(times) for times in self.dropped.values())
+        lines = [f"Dropped {num_dropped} availabilities of "
+                 f"{len(self.dropped)} people in "
+                 f"{self.elapsed * 1000:.1f} ms."]
+        if self.unusable_sites:
+            lines.append(f"Sites that nobody can join: "
+                         f"{describe_sites(self.unusable_sites)}")
+        if self.reasons:
+            lines.append(format_reasons(self.reasons))
+        return "\n".join(lines)
+
+
+@typechecked
+def bound_availabilities(
+    people: List[DecalMember],
+    mode: Literal['full', 'partial'] = 'full') -> AvailabilityBounds:
+    """
+    Drops the availabilities that no arrangement can use, by comparing for
+    every kind of person (refer to BOUNDED_KINDS) and every time slot how
+    many of them are available with how many the sites need and can take:
+
+        1. if as many people of a kind can only go to the time slot as its
+           sites can take, nobody else of that kind can go there
+        2. in 'full' mode, if only as many people of a kind are available
+           at the time slot as its sites need, all of them have to go there
+
+    Every dropped availability can change the counts at other time slots, so
+    this is repeated until nothing changes. If the counts show that no
+    arrangement can exist along the way, the reasons are returned instead.
+
+    Everyone has to be assigned, so the bounds do not apply to
+    find_best_site_arrangement, which may leave people out.
+
+    Args:
+        people (List[DecalMember]): people to assign. None of them should be
+                                    assigned to a site yet.
+        mode (Literal['full', 'partial']): refer to create_site_arrangements
+
+    Returns:
+        AvailabilityBounds: the availabilities that can still be used
+    """
+    start_time = time.perf_counter()
+    sites = list(ids_to_sites.values())
+    slot_times = {slot_sites[0].time_bit: site_time
+                  for site_time, slot_sites in times_to_sites.items()}
+    all_sites_mask = 0
+    for bit in slot_times:
+        all_sites_mask |= bit
+    masks = {person.name: person.availability_mask & all_sites_mask
+             for person in people}
+    dropped_masks = dict.fromkeys(masks, 0)
+
+    def drop(person: DecalMember, mask: int) -> bool:
+        mask &= masks[person.name]
+        masks[person.name] ^= mask
+        dropped_masks[person.name] |= mask
+        return mask != 0
+
+    reasons = []
+    changed = True
+    while changed and not reasons:
+        changed = False
+        for bit, site_time in slot_times.items():
+            slot_sites = times_to_sites[site_time]
+            for singular, plural, counts, get_need, get_room in BOUNDED_KINDS:
+                available = [person for person in people
+                             if counts(person) and masks[person.name] & bit]
+                only_here = [person for person in available
+                             if masks[person.name] == bit]
+                need = 0
+                if mode == 'full':
+                    need = sum(get_need(site) for site in slot_sites)
+                room = None
+                if get_room(slot_sites[0]) is not None:
+                    room = sum(get_room(site) for site in slot_sites)
+
+                if room is not None and len(only_here) > room:
+                    reasons.append(
+                        f"{site_time} has room for {room} more "
+                        f"{singular if room == 1 else plural} but "
+                        f"{count(len(only_here), singular, plural)} can "
+                        f"only go there")
+                elif len(available) < need:
+                    reasons.append(
+                        f"{site_time} needs {need} more {plural} but only "
+                        f"{count(len(available), singular, plural)} can "
+                        f"still go there")
+                elif need and len(available) == need:
+                    for person in available:
+                        changed |= drop(person, ~bit)
+                elif room is not None and len(only_here) == room:
+                    for person in available:
+                        if masks[person.name] != bit:
+                            changed |= drop(person, bit)
+
+        for person in people:
+            if not masks[person.name] and person.find_potential_sites():
+                reasons.append(f"{person.name} has no time slot left that "
+                               f"they can go to")
+                break
+
+    dropped = {name: [slot_times[bit] for bit in slot_times if mask & bit]
+               for name, mask in dropped_masks.items() if mask}
+    used_mask = 0
+    for mask in masks.values():
+        used_mask |= mask
+    unusable_sites = [site for site in sites
+                      if not site.time_bit & used_mask]
+    return AvailabilityBounds(masks, dropped, unusable_sites, reasons,
+                              time.perf_counter() - start_time)
+
+
+@typechecked
+def find_components(
+    people: List[DecalMember],
+    masks: Optional[Dict[str, int]] = None
+    ) -> List[Tuple[List[DecalMember], List[Site]]]:
+    """
+    Splits the people and the sites into groups that do not affect each
+    other. People only meet at the sites of the time slots they are
+    available at, so two time slots are in the same group if someone is
+    available at both of them. Each group can be searched on its own, and
+    the arrangements of the whole cohort are every combination of one
+    arrangement of each group.
+
+    Sites at time slots that nobody is available at are left out.
+
+    Args:
+        people (List[DecalMember]): people to assign
+        masks (Optional[Dict[str, int]]): availability bitmask of each person
+            by name (refer to bound_availabilities). None means
+            person.availability_mask.
+
+    Returns:
+        List[Tuple[List[DecalMember], List[Site]]]: the people and sites of
+            each group, in the order of their first site
+    """
+    # Union-find over the bits of the time slots that have sites
+    parents = {site.time_bit: site.time_bit for site in ids_to_sites.values()}
+
+    def find_root(bit: int) -> int:
+        while parents[bit] != bit:
+            parents[bit] = parents[parents[bit]]
+            bit = parents[bit]
+        return bit
+
+    person_bits = []
+    for person in people:
+        mask = person.availability_mask if masks is None else masks[
+            person.name]
+        bits = [bit for bit in parents if mask & bit]
+        for bit in bits[1:]:
+            parents[find_root(bit)] = find_root(bits[0])
+        person_bits.append(bits)
+
+    components = {}
+    used_roots = {find_root(bits[0]) for bits in person_bits if bits}
+    for site in sorted(ids_to_sites.values(), key=lambda site: site.id):
+        root = find_root(site.time_bit)
+        if root in used_roots:
+            components.setdefault(root, ([], []))[1].append(site)
+    for person, bits in zip(people, person_bits):
+        if bits:
+            components[find_root(bits[0])][0].append(person)
+    return list(components.values())
+
+
+@typechecked
+def format_reasons(reasons: List[str]) -> str:
+    """
+    Args:
+        reasons (List[str]): output of explain_infeasibility
+
+    Returns:
+        str: the reasons as a list that can be printed
+    """
+    return "\n".join(["No arrangement is possible:"] +
+                     [f"  - {reason}" for reason in reasons])
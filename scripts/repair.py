@@ -0,0 +1,234 @@
+"""
+Fixes an existing arrangement after a late change instead of searching for a
+new one from scratch.
+
+After the arrangements are made, late form responses come in, people drop
+out and availabilities change. repair_site_arrangement keeps everyone who is
+not affected where they are and only searches again around the change:
+
+    1. People who dropped out are taken out of their site, people who are no
+       longer available at the time of their site are taken out too, and new
+       people have no site yet.
+    2. Only the time slots of the sites that lost someone and of the people
+       without a site are searched again, together with everyone in the
+       sites at those time slots.
+    3. If that is not enough, the time slots that the people being searched
+       are available at are added, and so on, until it works or every
+       connected time slot has been tried.
+
+The search tries everyone's old site first, and among the first
+MAX_CANDIDATES arrangements found for the time slots being searched, the one
+that moves the fewest people who were already placed is kept.
+
+    people = [names_to_people["New Person"]]
+    names_to_people["Bob"].remove_availability("Tuesday 3PM - 4PM")
+    repaired = repair_site_arrangement(arrangement, added=people,
+                                       changed=[names_to_people["Bob"]])
+"""
+import time
+from array import array
+from typing import List, Literal, Optional, Sequence, Set, Tuple
+
+from classes import (DecalMember, SiteArrangement, check_all_sites_are_clear,
+                     get_scenario, ids_to_sites, times_to_sites)
+from settings import typechecked
+from solver import ForwardCheckingSearch
+
+
+# Number of arrangements of the time slots being searched that are compared
+# to find the one that moves the fewest people
+MAX_CANDIDATES = 100
+
+
+@typechecked
+def count_moved_people(old_sites: array,
+                       new_sites: array,
+                       people: Sequence[DecalMember]) -> int:
+    """
+    Args:
+        old_sites (array): SiteArrangement.sites before the change
+        new_sites (array): SiteArrangement.sites after the change
+        people (Sequence[DecalMember]): people to compare
+
+    Returns:
+        int: number of people in people who had a site before and are in a
+             different site now
+    """
+    return len([person for person in people
+                if person.index < len(old_sites) and
+                old_sites[person.index] >= 0 and
+                old_sites[person.index] != new_sites[person.index]])
+
+
+@typechecked
+def repair_site_arrangement(
+    arrangement: SiteArrangement,
+    added: Sequence[DecalMember] = (),
+    removed: Sequence[DecalMember] = (),
+    changed: Sequence[DecalMember] = (),
+    mode: Literal['full', 'partial'] = 'full',
+    deadline_seconds: Optional[float] = None,
+    verbose: bool = True) -> Optional[SiteArrangement]:
+    """
+    Finds an arrangement close to arrangement that takes a change into
+    account. The sites must be clear, as with SiteArrangement.unfreeze, and
+    are left clear.
+
+    Args:
+        arrangement (SiteArrangement): arrangement made before the change
+        added (Sequence[DecalMember]): people who were not in arrangement
+                                       and need a site
+        removed (Sequence[DecalMember]): people who no longer need a site
+        changed (Sequence[DecalMember]): people whose availabilities changed
+            (e.g. with DecalMember.remove_availability). They only move if
+            they are no longer available at the time of their site.
+        mode (Literal['full', 'partial']): refer to create_site_arrangements
+        deadline_seconds (Optional[float]): give up after this many seconds.
+                                            None means no limit.
+        verbose (bool): if True, prints how many people were moved
+
+    Returns:
+        Optional[SiteArrangement]: the repaired arrangement, or None if no
+                                   arrangement was found
+    """
+    assert check_all_sites_are_clear(), (
+        "The sites must be clear before an arrangement can be repaired")
+
+    start_time = time.perf_counter()
+    deadline = None
+    if deadline_seconds is not None:
+        deadline = start_time + deadline_seconds
+
+    # Where everyone is before searching, with room for people created after
+    # the arrangement was made
+    old_sites = arrangement.sites
+    sites = array('i', old_sites)
+    sites.extend([-1] * (len(get_scenario().indexed_people) - len(sites)))
+
+    removed_indices = {person.index for person in removed}
+    for index in removed_indices:
+        sites[index] = -1
+
+    # People without a site and the sites they were taken out of
+    unplaced = [person for person in added if person.index not in
+                removed_indices]
+    affected_site_ids = {old_sites[person.index] for person in removed
+                         if person.index < len(old_sites) and
+                         old_sites[person.index] >= 0}
+    for person in changed:
+        site_id = sites[person.index]
+        if (person.index not in removed_indices and site_id >= 0 and
+                not person.availability_mask &
+                ids_to_sites[site_id].time_bit):
+            sites[person.index] = -1
+            affected_site_ids.add(site_id)
+            unplaced.append(person)
+
+    # Time slots to search again, as a bitmask
+    slots_mask = 0
+    for site_id in affected_site_ids:
+        slots_mask |= ids_to_sites[site_id].time_bit
+    for person in unplaced:
+        slots_mask |= person.availability_mask
+
+    searched_masks: Set[int] = set()
+    while slots_mask not in searched_masks:
+        searched_masks.add(slots_mask)
+        repaired, movable = search_time_slots(sites, unplaced, slots_mask,
+                                              mode, deadline)
+        if repaired is not None:
+            if verbose:
+                num_moved = count_moved_people(old_sites, repaired.sites,
+                                               movable)
+                print(f"Repaired the arrangement by searching "
+                      f"{len(movable)} people again and moving {num_moved} "
+                      f"of them in "
+                      f"{(time.perf_counter() - start_time) * 1000:.1f} ms.")
+            return repaired
+        if deadline is not None and time.perf_counter() > deadline:
+            break
+
+        # Let the people being searched go to any time slot they are
+        # available at
+        for person in movable:
+            slots_mask |= person.availability_mask
+
+    if verbose:
+        print("No arrangement could be found around the change.")
+    return None
+
+
+@typechecked
+def search_time_slots(sites: array,
+                      unplaced: List[DecalMember],
+                      slots_mask: int,
+                      mode: Literal['full', 'partial'],
+                      deadline: Optional[float]
+                      ) -> Tuple[Optional[SiteArrangement], List[DecalMember]]:
+    """
+    Keeps everyone outside of the sites at the time slots in slots_mask
+    where they are and searches again for everyone inside of them.
+
+    Args:
+        sites (array): site of every person before searching, as in
+                       SiteArrangement.sites
+        unplaced (List[DecalMember]): people who need a site
+        slots_mask (int): bitmask of the time slots to search again
+        mode (Literal['full', 'partial']): refer to create_site_arrangements
+        deadline (Optional[float]): time.perf_counter() value after which
+                                    the search stops
+
+    Returns:
+        Tuple[Optional[SiteArrangement], List[DecalMember]]: the arrangement
+            that moves the fewest people (or None if there is none) and the
+            people that were searched again
+    """
+    searched_sites = [site for time_sites in times_to_sites.values()
+                      for site in time_sites if site.time_bit & slots_mask]
+    searched_site_ids = {site.id for site in searched_sites}
+
+    indexed_people = get_scenario().indexed_people
+    movable = list(unplaced)
+    fixed = {}
+    for index, site_id in enumerate(sites):
+        if site_id < 0:
+            continue
+        if site_id in searched_site_ids:
+            movable.append(indexed_people[index])
+        else:
+            fixed.setdefault(site_id, []).append(indexed_people[index])
+
+    # People can only be searched into the sites being searched
+    masks = {person.name: person.availability_mask & slots_mask
+             for person in movable}
+    if any(not mask for mask in masks.values()):
+        return None, movable
+
+    for site_id, members in fixed.items():
+        ids_to_sites[site_id].add_members(members)
+    try:
+        # Symmetry breaking would move whole sites between interchangeable
+        # sites, which counts as moving everyone in them
+        search = ForwardCheckingSearch(
+            movable, mode, break_symmetry=False, availability_masks=masks,
+            sites=searched_sites,
+            preferred_sites={person.name: sites[person.index]
+                             for person in movable
+                             if sites[person.index] >= 0})
+        best = None
+        best_key = None
+        arrangements = search.search(deadline)
+        try:
+            for i, candidate in enumerate(arrangements):
+                key = (count_moved_people(sites, candidate.sites, movable),
+                       -candidate.score)
+                if best_key is None or key < best_key:
+                    best, best_key = candidate, key
+                if best_key[0] == 0 or i + 1 >= MAX_CANDIDATES:
+                    break
+        finally:
+            arrangements.close()
+    finally:
+        for site_id in fixed:
+            ids_to_sites[site_id].clear()
+    return best, movable
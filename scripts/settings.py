@@ -0,0 +1,30 @@
+"""
+Settings shared by every script.
+
+Every class and function in the scripts is decorated with @typechecked so
+that mistakes show up as soon as a wrong type is passed around. The checks
+run on every call, which makes the search several times slower. Setting the
+environment variable below to 1 turns them off ("production mode"):
+
+    SITE_COORDINATION_PRODUCTION=1 python main.py
+
+main.py turns production mode on by default. The tests always run with the
+checks on.
+"""
+import os
+
+from typeguard import typechecked as typeguard_typechecked
+
+
+PRODUCTION_VARIABLE = "SITE_COORDINATION_PRODUCTION"
+PRODUCTION = os.environ.get(PRODUCTION_VARIABLE, "0") == "1"
+
+
+def typechecked(target):
+    """
+    Same as typeguard.typechecked, except that the target is returned as it
+    is in production mode.
+    """
+    if PRODUCTION:
+        return target
+    return typeguard_typechecked(target)
@@ -0,0 +1,124 @@
+"""
+Saves everything between the stages of main.py.
+
+The stages of main.py can be days apart. Instead of reading every
+spreadsheet again at the start of each stage, save_snapshot writes the
+districts, schools, sites, people (with their availabilities and the sites
+that confirmed SLs were assigned to) and any saved arrangements to a single
+file at the end of a stage, and load_snapshot puts them back at the start of
+the next one:
+
+    save_snapshot(2, [arrangement])
+    ...
+    snapshot = load_snapshot()
+    arrangement = snapshot.arrangements[0]
+
+Time slots keep their IDs and sites keep their IDs, so availability bitmasks
+and arrangements mean the same thing after loading. Every snapshot records
+SNAPSHOT_VERSION. Snapshots from another version are refused rather than
+loaded into objects they no longer match.
+"""
+import os
+import pickle
+import time
+from typing import List, Sequence
+
+from classes import SiteArrangement, export_records, import_records
+from settings import typechecked
+
+
+# Increase whenever the contents of a snapshot change
+SNAPSHOT_VERSION = 1
+
+# Where main.py keeps its snapshot
+DEFAULT_SNAPSHOT_PATH = os.path.join("data", "snapshot.pickle")
+
+
+@typechecked
+class Snapshot:
+    def __init__(self,
+                 stage: int,
+                 arrangements: List[SiteArrangement],
+                 saved_at: float):
+        """
+        Result of load_snapshot. The districts, schools, sites and people are
+        loaded into the active scenario.
+
+        Args:
+            stage (int): stage of main.py that was finished when the
+                         snapshot was saved
+            arrangements (List[SiteArrangement]): saved arrangements
+            saved_at (float): time.time() value when the snapshot was saved
+        """
+        self.stage = stage
+        self.arrangements = arrangements
+        self.saved_at = saved_at
+
+    def __str__(self):
+        return (f"Stage {self.stage} snapshot with "
+                f"{len(self.arrangements)} arrangements, saved "
+                f"{time.ctime(self.saved_at)}")
+
+
+@typechecked
+def save_snapshot(stage: int,
+                  arrangements: Sequence[SiteArrangement] = (),
+                  path: str = DEFAULT_SNAPSHOT_PATH) -> None:
+    """
+    Writes every record of the active scenario and the arrangements to path.
+    The file is replaced in one step, so a snapshot is never left half
+    written.
+
+    Args:
+        stage (int): stage of main.py that was just finished
+        arrangements (Sequence[SiteArrangement]): arrangements to keep
+        path (str): where to write the snapshot
+    """
+    snapshot = {
+        'version': SNAPSHOT_VERSION,
+        'stage': stage,
+        'saved_at': time.time(),
+        'records': export_records(),
+        'arrangements': [arrangement.site_assignments
+                         for arrangement in arrangements]
+    }
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temporary_path = path + ".tmp"
+    with open(temporary_path, "wb") as file:
+        pickle.dump(snapshot, file, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temporary_path, path)
+
+
+@typechecked
+def load_snapshot(path: str = DEFAULT_SNAPSHOT_PATH) -> Snapshot:
+    """
+    Replaces every record of the active scenario with the ones saved in
+    path (refer to import_records).
+
+    Args:
+        path (str): snapshot written by save_snapshot
+
+    Raises:
+        Exception: if the snapshot was written by another SNAPSHOT_VERSION
+
+    Returns:
+        Snapshot: the stage and the saved arrangements
+    """
+    with open(path, "rb") as file:
+        snapshot = pickle.load(file)
+
+    if snapshot.get('version') != SNAPSHOT_VERSION:
+        raise Exception(f"The snapshot at {path} has version "
+                        f"{snapshot.get('version')} but version "
+                        f"{SNAPSHOT_VERSION} is needed. Start again from the "
+                        f"spreadsheets.")
+
+    import_records(snapshot['records'])
+    arrangements = []
+    for site_assignments in snapshot['arrangements']:
+        arrangement = SiteArrangement()
+        arrangement.site_assignments = site_assignments
+        arrangements.append(arrangement)
+    return Snapshot(snapshot['stage'], arrangements, snapshot['saved_at'])
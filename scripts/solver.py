@@ -0,0 +1,1232 @@
+"""
+Search engine that creates SiteArrangement instances.
+
+If we imagine each arrangement as a tree, each branch represents a decision
+(assigning a person to a site). Rather than finding out at the very end of a
+branch that the sites are not valid or not full, the search keeps a "domain"
+for every person who has not been assigned yet: the sites that the person can
+still be added to. Every time someone is added to a site, the people who can
+no longer join that site lose it from their domain (forward checking). The
+search backs up as soon as
+
+    1. someone has no sites left in their domain, or
+    2. (in 'full' mode) a site can no longer become full with the people
+       who can still join it.
+
+Different branches often reach the same situation, e.g. when two decal
+members who don't drive are swapped between two sites. What happens next only
+depends on who is left and on how many staff, nonstaff, drivers and SLs each
+site has, so the outcome of every branch is stored in a TranspositionTable and
+reused the next time the same situation comes up.
+"""
+import heapq
+import itertools
+import random
+import time
+from array import array
+from collections import OrderedDict
+from typing import Dict, Iterator, List, Literal, Optional, Sequence, Tuple
+
+from classes import (DecalMember, Site, SiteArrangement,
+                     MIN_STAFF_PER_SITE, MIN_NONSTAFF_PER_SITE,
+                     MIN_PEOPLE_PER_SITE, check_all_sites_are_valid,
+                     create_priority_list, get_scenario,
+                     order_potential_sites)
+from presolve import (bound_availabilities, explain_infeasibility,
+                      find_components, format_reasons)
+from settings import typechecked
+from stats import SearchStats
+
+
+# Number of bits used to store the signature of each site in a state key
+SITE_SIGNATURE_BITS = 10
+
+# Branches with more working arrangements than this are not stored in the
+# transposition table
+MAX_STORED_COMPLETIONS = 64
+
+
+@typechecked
+def get_site_signature(site: Site) -> int:
+    """
+    Packs the counts that decide who else can join a site and whether the site
+    is full into a single integer.
+
+    Args:
+        site (Site)
+
+    Returns:
+        int: signature that fits into SITE_SIGNATURE_BITS bits
+    """
+    return (site.num_staff |
+            site.num_nonstaff << 2 |
+            site.num_drivers << 5 |
+            site.num_site_leaders << 8)
+
+
+@typechecked
+class TranspositionTable:
+    def __init__(self,
+                 max_entries: int):
+        """
+        Remembers how branches of the search ended. Each entry maps a state
+        key (refer to ForwardCheckingSearch.get_state_key) to every way of
+        assigning the people who were left, as a tuple of completions. An
+        empty tuple means that the branch is a dead end.
+
+        Once there are max_entries entries, the least recently used entry is
+        thrown away.
+
+        Args:
+            max_entries (int): maximum number of entries
+        """
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.num_hits = 0
+        self.num_misses = 0
+
+    def get(self,
+            key: Tuple[int, int]) -> Optional[tuple]:
+        """
+        Returns:
+            Optional[tuple]: the stored completions or None if the state has
+                             not been stored
+        """
+        completions = self.entries.get(key)
+        if completions is None:
+            self.num_misses += 1
+        else:
+            self.num_hits += 1
+            self.entries.move_to_end(key)
+        return completions
+
+    def put(self,
+            key: Tuple[int, int],
+            completions: tuple) -> None:
+        """
+        Stores the completions of a state.
+        """
+        self.entries[key] = completions
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self.entries)
+
+
+@typechecked
+class ForwardCheckingSearch:
+    def __init__(self,
+                 people: List[DecalMember],
+                 mode: Literal['full', 'partial'],
+                 break_symmetry: bool = True,
+                 transposition_table_size: int = 100000,
+                 variable_ordering: Literal['busy_first',
+                                            'drivers_first'] = 'busy_first',
+                 value_ordering: Literal['drivers',
+                                         'fewest_candidates'] = 'drivers',
+                 seed: Optional[int] = None,
+                 stats: Optional[SearchStats] = None,
+                 availability_masks: Optional[Dict[str, int]] = None,
+                 sites: Optional[List[Site]] = None,
+                 preferred_sites: Optional[Dict[str, int]] = None):
+        """
+        Sets up the domains of every person in people.
+
+        People are referred to by their index in self.people, which is
+        ordered by create_priority_list, and sites are referred to by their
+        ID.
+
+        The ordering options only change the order in which arrangements are
+        found, never which arrangements are found.
+
+        Args:
+            people (List[DecalMember]): people to assign. None of them should
+                                        be assigned to a site yet.
+            mode (Literal['full', 'partial']): refer to
+                                               create_site_arrangements
+            break_symmetry (bool): if True, arrangements that only differ by
+                swapping the people of interchangeable sites (refer to
+                group_equivalent_sites) are only found once
+            transposition_table_size (int): maximum number of entries in the
+                transposition table. 0 turns the table off.
+            variable_ordering (Literal['busy_first', 'drivers_first']):
+                whether busy people or drivers come first in the priority
+                list used to break ties between people (refer to
+                create_priority_list)
+            value_ordering (Literal['drivers', 'fewest_candidates']): the
+                sites in a person's domain are tried in the order given by
+                order_potential_sites ('drivers') or starting with the sites
+                that the fewest people can still join ('fewest_candidates')
+            seed (Optional[int]): if given, ties in both orderings are broken
+                randomly with this seed
+            stats (Optional[SearchStats]): where to count nodes, prunes,
+                backtracks and arrangements. None means a new SearchStats.
+            availability_masks (Optional[Dict[str, int]]): maps the name of
+                every person to the availability bitmask of the time slots
+                they may go to (refer to bound_availabilities). None means
+                every availability.
+            sites (Optional[List[Site]]): sites to fill, e.g. the sites of
+                one group of find_components. Everyone in people must only
+                be able to go to these sites. None means every site.
+            preferred_sites (Optional[Dict[str, int]]): maps the names of
+                some people to the ID of a site that is tried first for
+                them, before value_ordering applies (e.g. where they were
+                in an earlier arrangement)
+        """
+        self.stats = stats if stats is not None else SearchStats()
+        self.random = None
+        if seed is not None:
+            self.random = random.Random(seed)
+            people = self.random.sample(people, len(people))
+
+        self.people = create_priority_list(
+            people, drivers_first=(variable_ordering == 'drivers_first'))
+        self.mode = mode
+        self.value_ordering = value_ordering
+        self.preferred_sites = preferred_sites or {}
+        # The active scenario's dictionary itself, so that lookups in the
+        # search do not go through the ScenarioRecord proxy every time
+        self.ids_to_sites = get_scenario().ids_to_sites
+        self.sites = (list(self.ids_to_sites.values()) if sites is None
+                      else sites)
+        self.unassigned = set(range(len(self.people)))
+
+        # (index, site ID) of every assignment made so far, in order
+        self.assignments = []
+
+        # Together, these two integers describe everything that decides how
+        # the rest of the search goes: who is left and the signature of every
+        # site (refer to get_site_signature)
+        self.unassigned_mask = (1 << len(self.people)) - 1
+        self.site_positions = {site.id: i for i, site in enumerate(self.sites)}
+        self.site_states = 0
+        for site in self.sites:
+            self.update_site_state(site, 1)
+
+        self.transposition_table = None
+        if transposition_table_size > 0:
+            self.transposition_table = TranspositionTable(
+                transposition_table_size)
+
+        # [depth, completions] for each branch being searched whose
+        # completions are still being collected for the transposition table.
+        # completions is set to None once there are too many to store.
+        self.collectors = []
+
+        # earlier_equivalent_sites[site_id]: IDs of the interchangeable sites
+        # that come before the site
+        self.earlier_equivalent_sites = {site.id: [] for site in self.sites}
+        if break_symmetry:
+            for group in group_equivalent_sites(self.sites):
+                for i, site in enumerate(group):
+                    self.earlier_equivalent_sites[site.id] = [
+                        earlier.id for earlier in group[:i]]
+
+        # domains[i]: IDs of the sites that self.people[i] can still join
+        self.domains = [set() for _ in self.people]
+
+        # candidates[site_id]: indices of the unassigned people who can still
+        # join the site. The counts below are kept in sync with it so that
+        # checking whether a site can still become full takes constant time.
+        self.candidates = {site.id: set() for site in self.sites}
+        self.num_candidate_site_leaders = {site.id: 0 for site in self.sites}
+        self.num_candidate_drivers = {site.id: 0 for site in self.sites}
+        self.num_candidate_staff = {site.id: 0 for site in self.sites}
+        self.num_candidate_nonstaff = {site.id: 0 for site in self.sites}
+
+        # Every removal from a domain is recorded so that it can be undone
+        # when the search backs up
+        self.trail = []
+
+        # Whether people may be left without a site (refer to AnytimeSearch)
+        self.can_skip_people = False
+
+        # Totals over every site of what is still missing for the site to be
+        # full (SLs, drivers, staff, nonstaff and people), and totals over
+        # every unassigned person of what they can provide. In 'full' mode
+        # the search backs up once any shortfall exceeds what is left.
+        self.shortfalls = [0, 0, 0, 0, 0]
+        self.supplies = [0, 0, 0, 0, 0]
+        for site in self.sites:
+            self.update_shortfalls(site, 1)
+        for person in self.people:
+            self.update_supplies(person, 1)
+
+        for index, person in enumerate(self.people):
+            usable_mask = person.availability_mask
+            if availability_masks is not None:
+                usable_mask = availability_masks[person.name]
+            for site in person.find_potential_sites():
+                if not site.time_bit & usable_mask:
+                    continue
+                rule = site.get_violated_rule(person)
+                if rule is None:
+                    self.add_candidate(index, site.id)
+                else:
+                    self.stats.prunes_by_rule[rule] += 1
+
+    def add_candidate(self,
+                      index: int,
+                      site_id: int) -> None:
+        """
+        Adds a site to a person's domain.
+        """
+        person = self.people[index]
+        self.domains[index].add(site_id)
+        self.candidates[site_id].add(index)
+        self.update_candidate_counts(person, site_id, 1)
+
+    def remove_candidate(self,
+                         index: int,
+                         site_id: int) -> None:
+        """
+        Removes a site from a person's domain and records the removal on the
+        trail.
+        """
+        person = self.people[index]
+        self.domains[index].discard(site_id)
+        self.candidates[site_id].discard(index)
+        self.update_candidate_counts(person, site_id, -1)
+        self.trail.append((index, site_id))
+
+    def update_candidate_counts(self,
+                                person: DecalMember,
+                                site_id: int,
+                                change: int) -> None:
+        """
+        Updates the number of candidate SLs, drivers, staff and nonstaff of a
+        site.
+
+        Args:
+            person (DecalMember): the person who was added or removed
+            site_id (int): ID of the site
+            change (int): 1 if the person was added, -1 if the person was
+                          removed
+        """
+        if person.leads_site:
+            self.num_candidate_site_leaders[site_id] += change
+        if person.drives:
+            self.num_candidate_drivers[site_id] += change
+        if person.in_staff:
+            self.num_candidate_staff[site_id] += change
+        else:
+            self.num_candidate_nonstaff[site_id] += change
+
+    def undo(self,
+             trail_length: int) -> None:
+        """
+        Puts back every removal made after the trail had trail_length
+        entries.
+        """
+        while len(self.trail) > trail_length:
+            index, site_id = self.trail.pop()
+            self.domains[index].add(site_id)
+            self.candidates[site_id].add(index)
+            self.update_candidate_counts(self.people[index], site_id, 1)
+
+    def can_become_full(self,
+                        site: Site) -> bool:
+        """
+        Checks whether a site could still become full if every unassigned
+        person who can join it did so. Since validate_person already stops a
+        site from going over any maximum, only the minimums are checked.
+
+        Args:
+            site (Site)
+
+        Returns:
+            bool: False if the site can never become full from here
+        """
+        site_id = site.id
+        num_staff = site.num_staff + self.num_candidate_staff[site_id]
+        num_nonstaff = site.num_nonstaff + self.num_candidate_nonstaff[site_id]
+        return ((site.has_site_leader or
+                 self.num_candidate_site_leaders[site_id] > 0) and
+                (site.has_driver or
+                 self.num_candidate_drivers[site_id] > 0) and
+                num_staff >= MIN_STAFF_PER_SITE and
+                num_nonstaff >= MIN_NONSTAFF_PER_SITE and
+                num_staff + num_nonstaff >= MIN_PEOPLE_PER_SITE)
+
+    def update_shortfalls(self,
+                          site: Site,
+                          change: int) -> None:
+        """
+        Adds (change = 1) or subtracts (change = -1) what a site is still
+        missing to be full to/from self.shortfalls.
+        """
+        self.shortfalls[0] += change * (not site.has_site_leader)
+        self.shortfalls[1] += change * (not site.has_driver)
+        self.shortfalls[2] += change * max(0, MIN_STAFF_PER_SITE -
+                                              site.num_staff)
+        self.shortfalls[3] += change * max(0, MIN_NONSTAFF_PER_SITE -
+                                              site.num_nonstaff)
+        self.shortfalls[4] += change * max(0, MIN_PEOPLE_PER_SITE -
+                                              len(site.members))
+
+    def update_supplies(self,
+                        person: DecalMember,
+                        change: int) -> None:
+        """
+        Adds (change = 1) or subtracts (change = -1) what an unassigned person
+        can provide to/from self.supplies.
+        """
+        self.supplies[0] += change * person.leads_site
+        self.supplies[1] += change * person.drives
+        self.supplies[2] += change * person.in_staff
+        self.supplies[3] += change * (not person.in_staff)
+        self.supplies[4] += change
+
+    def has_enough_supplies(self) -> bool:
+        """
+        Checks that the unassigned people could cover what every site is
+        still missing, ignoring who can go where.
+        """
+        return all(shortfall <= supply for shortfall, supply
+                   in zip(self.shortfalls, self.supplies))
+
+    def update_site_state(self,
+                          site: Site,
+                          change: int) -> None:
+        """
+        Adds (change = 1) or subtracts (change = -1) the signature of a site
+        to/from self.site_states.
+        """
+        shift = self.site_positions[site.id] * SITE_SIGNATURE_BITS
+        self.site_states += change * get_site_signature(site) << shift
+
+    def get_state_key(self) -> Tuple[int, int]:
+        """
+        Returns:
+            Tuple[int, int]: hashable key of the current state for the
+                             transposition table
+        """
+        return (self.unassigned_mask, self.site_states)
+
+    def check_initial_domains(self) -> bool:
+        """
+        Checks that everyone has at least one site to go to and, in 'full'
+        mode, that every site can become full.
+
+        Returns:
+            bool: False if no arrangement can exist
+        """
+        if any(len(domain) == 0 for domain in self.domains):
+            return False
+        if self.mode == 'full':
+            return (self.has_enough_supplies() and
+                    all(self.can_become_full(site) for site in self.sites))
+        return True
+
+    def assign(self,
+               index: int,
+               site: Site) -> bool:
+        """
+        Adds a person to a site and removes the site from the domains of the
+        people who can no longer join it.
+
+        The caller is responsible for calling self.unassign with the same
+        arguments and the trail length from before this call, even if this
+        returns False.
+
+        Args:
+            index (int): index of the person in self.people
+            site (Site): site in the person's domain
+
+        Returns:
+            bool: False if the search should back up
+        """
+        person = self.people[index]
+        self.update_shortfalls(site, -1)
+        self.update_site_state(site, -1)
+        site.add_member(person)
+        self.update_shortfalls(site, 1)
+        self.update_site_state(site, 1)
+        self.update_supplies(person, -1)
+        self.unassigned.discard(index)
+        self.unassigned_mask ^= 1 << index
+        self.assignments.append((index, site.id))
+
+        # The person is no longer a candidate for any site
+        affected_site_ids = list(self.domains[index])
+        for site_id in affected_site_ids:
+            self.remove_candidate(index, site_id)
+
+        # Forward checking: only people who could join this site are affected
+        for other in list(self.candidates[site.id]):
+            rule = site.get_violated_rule(self.people[other])
+            if rule is not None:
+                self.stats.prunes_by_rule[rule] += 1
+                self.remove_candidate(other, site.id)
+                if not self.domains[other] and not self.can_skip_people:
+                    self.stats.record_backtrack('empty_domain',
+                                                len(self.assignments))
+                    return False
+
+        # Every site that lost a candidate might not be able to become full
+        if self.mode == 'full':
+            if not self.has_enough_supplies():
+                self.stats.record_backtrack('not_enough_people',
+                                            len(self.assignments))
+                return False
+            for site_id in affected_site_ids:
+                if not self.can_become_full(self.ids_to_sites[site_id]):
+                    self.stats.record_backtrack('site_cannot_become_full',
+                                                len(self.assignments))
+                    return False
+
+        return True
+
+    def unassign(self,
+                 index: int,
+                 site: Site,
+                 trail_length: int) -> None:
+        """
+        Reverses self.assign.
+        """
+        person = self.people[index]
+        self.undo(trail_length)
+        self.assignments.pop()
+        self.unassigned.add(index)
+        self.unassigned_mask ^= 1 << index
+        self.update_supplies(person, 1)
+        self.update_shortfalls(site, -1)
+        self.update_site_state(site, -1)
+        site.remove_member(person)
+        self.update_shortfalls(site, 1)
+        self.update_site_state(site, 1)
+
+    def select_person(self) -> int:
+        """
+        Picks the unassigned person with the fewest sites left in their
+        domain. Ties go to whoever comes first in the priority list.
+
+        Returns:
+            int: index of the person in self.people
+        """
+        return min(self.unassigned,
+                   key=lambda index: (len(self.domains[index]), index))
+
+    def is_redundant(self,
+                     site: Site) -> bool:
+        """
+        Checks whether adding someone to the site would only repeat a branch
+        that is already being searched. That is the case when the site is
+        empty and an interchangeable site before it is empty too.
+
+        Args:
+            site (Site)
+
+        Returns:
+            bool: True if the site can be skipped
+        """
+        if site.members:
+            return False
+        return any(not self.ids_to_sites[site_id].members
+                   for site_id in self.earlier_equivalent_sites[site.id])
+
+    def order_sites(self,
+                    index: int) -> List[Site]:
+        """
+        Orders the sites in a person's domain according to
+        self.value_ordering.
+        """
+        sites = [self.ids_to_sites[site_id]
+                 for site_id in sorted(self.domains[index])]
+        num_sites = len(sites)
+        sites = [site for site in sites if not self.is_redundant(site)]
+        self.stats.num_symmetric_branches_skipped += num_sites - len(sites)
+        if self.random is not None:
+            self.random.shuffle(sites)
+
+        if self.value_ordering == 'fewest_candidates':
+            sites = sorted(sites,
+                           key=lambda site: len(self.candidates[site.id]))
+        else:
+            sites = order_potential_sites(self.people[index], sites)
+
+        preferred_site_id = self.preferred_sites.get(self.people[index].name)
+        if preferred_site_id is not None:
+            sites = sorted(sites,
+                           key=lambda site: site.id != preferred_site_id)
+        return sites
+
+    def search(self,
+               deadline: Optional[float] = None,
+               prefix: Sequence[Tuple[int, int]] = ()
+               ) -> Iterator[SiteArrangement]:
+        """
+        Yields a SiteArrangement for every working arrangement as soon as it
+        is found. While the iterator is paused, the sites hold the
+        arrangement that was just yielded. The sites are left exactly as they
+        were before the search once the iterator is exhausted or closed.
+
+        Args:
+            deadline (Optional[float]): time.perf_counter() value after which
+                                        the search stops early
+            prefix (Sequence[Tuple[int, int]]): (index, site ID) of the first
+                assignments to make, as given by self.iter_prefixes. Only the
+                arrangements that start with these assignments are searched.
+
+        Yields:
+            SiteArrangement
+        """
+        self.deadline = deadline
+        self.timed_out = False
+        if not self.check_initial_domains():
+            return
+
+        applied = []
+        try:
+            for index, site_id in prefix:
+                site = self.ids_to_sites[site_id]
+                applied.append((index, site, len(self.trail)))
+                if not self.assign(index, site):
+                    return
+            yield from self.expand()
+        finally:
+            for index, site, trail_length in reversed(applied):
+                self.unassign(index, site, trail_length)
+
+    def iter_prefixes(self,
+                      depth: int) -> Iterator[List[Tuple[int, int]]]:
+        """
+        Yields every way of making the first depth assignments that the
+        search would try, in the same order. Searching from each of them with
+        self.search(prefix=...) finds exactly the arrangements of a full
+        search. Branches that end before reaching the given depth are
+        yielded as they are.
+
+        Args:
+            depth (int): number of assignments in each prefix
+
+        Yields:
+            List[Tuple[int, int]]: (index, site ID) of each assignment
+        """
+        if not self.check_initial_domains():
+            return
+
+        yield from self.expand_prefixes(depth)
+
+    def expand_prefixes(self,
+                        depth: int) -> Iterator[List[Tuple[int, int]]]:
+        """
+        Recursive step of self.iter_prefixes.
+        """
+        if not self.unassigned or len(self.assignments) == depth:
+            yield list(self.assignments)
+            return
+
+        index = self.select_person()
+        for site in self.order_sites(index):
+            trail_length = len(self.trail)
+            try:
+                if self.assign(index, site):
+                    yield from self.expand_prefixes(depth)
+            finally:
+                self.unassign(index, site, trail_length)
+
+    def expand(self) -> Iterator[SiteArrangement]:
+        """
+        Recursive step of self.search.
+        """
+        depth = len(self.assignments)
+        self.stats.record_node(depth)
+
+        # Base Case: everyone has been assigned
+        if not self.unassigned:
+            if check_all_sites_are_valid() and (
+                    self.mode == 'partial' or
+                    all(site.is_full for site in self.sites)):
+                yield self.freeze()
+            else:
+                self.stats.record_backtrack('not_full_at_end', depth)
+            return
+
+        # Out of time
+        if self.deadline is not None and time.perf_counter() > self.deadline:
+            self.timed_out = True
+            self.stats.record_backtrack('timeout', depth)
+            return
+
+        # The same situation has been searched before
+        key = self.get_state_key()
+        if self.transposition_table is not None:
+            completions = self.transposition_table.get(key)
+            if completions is not None:
+                self.stats.num_transposition_hits += 1
+                yield from self.replay(completions)
+                return
+
+        collector = [len(self.assignments), []]
+        self.collectors.append(collector)
+        finished = False
+
+        # Recursive Case
+        # The try/finally blocks put everything back even if the caller stops
+        # iterating in the middle of the branch
+        try:
+            index = self.select_person()
+            for site in self.order_sites(index):
+                trail_length = len(self.trail)
+                try:
+                    if self.assign(index, site):
+                        yield from self.expand()
+                finally:
+                    self.unassign(index, site, trail_length)
+            finished = not self.timed_out
+        finally:
+            self.collectors.pop()
+
+        # Only store branches that were searched all the way through
+        if (finished and collector[1] is not None and
+                self.transposition_table is not None):
+            self.transposition_table.put(key, tuple(collector[1]))
+
+    def freeze(self) -> SiteArrangement:
+        """
+        Freezes the current arrangement and hands the new completion to every
+        branch that is collecting completions.
+
+        Returns:
+            SiteArrangement
+        """
+        # The deeper the branch, the fewer completions it has, so once a
+        # branch has too many, so do all the branches above it
+        for collector in reversed(self.collectors):
+            depth, completions = collector
+            if completions is None:
+                break
+            if len(completions) == MAX_STORED_COMPLETIONS:
+                collector[1] = None
+                continue
+            completions.append(tuple(self.assignments[depth:]))
+
+        self.stats.num_solutions += 1
+        new_site_arrangement = SiteArrangement()
+        new_site_arrangement.freeze()
+        return new_site_arrangement
+
+    def replay(self,
+               completions: tuple) -> Iterator[SiteArrangement]:
+        """
+        Yields the arrangements made by each of the stored completions of a
+        branch on top of the current arrangement.
+
+        Args:
+            completions (tuple): completions from the transposition table
+        """
+        for completion in completions:
+            for index, site_id in completion:
+                self.ids_to_sites[site_id].add_member(self.people[index])
+            self.assignments.extend(completion)
+            try:
+                yield self.freeze()
+            finally:
+                del self.assignments[len(self.assignments) - len(completion):]
+                for index, site_id in completion:
+                    self.ids_to_sites[site_id].remove_member(
+                        self.people[index])
+
+
+@typechecked
+class AnytimeSearch(ForwardCheckingSearch):
+    def __init__(self,
+                 people: List[DecalMember],
+                 break_symmetry: bool = True,
+                 verbose: bool = True,
+                 stats: Optional[SearchStats] = None):
+        """
+        Branch and bound search for the best arrangement when there might not
+        be one where every site is full and everyone is assigned. People can
+        be left without a site and sites do not have to be full, but every
+        site still has to pass Site.validate_person.
+
+        Arrangements are ranked by their number of full sites and then by
+        their number of assigned people. The best one found so far is always
+        kept, so the search can be stopped at any time.
+
+        Args:
+            people (List[DecalMember]): people to assign. None of them should
+                                        be assigned to a site yet.
+            break_symmetry (bool): refer to ForwardCheckingSearch
+            verbose (bool): if True, a line is printed every time a better
+                            arrangement is found
+            stats (Optional[SearchStats]): refer to ForwardCheckingSearch
+        """
+        super().__init__(people, 'partial', break_symmetry,
+                         transposition_table_size=0, stats=stats)
+        self.can_skip_people = True
+        self.verbose = verbose
+        self.num_full_sites = sum(site.is_full for site in self.sites)
+        self.best_score = None
+        self.best_arrangement = None
+        self.start_time = time.perf_counter()
+
+    def get_score(self) -> Tuple[int, int]:
+        """
+        Returns:
+            Tuple[int, int]: number of full sites and number of assigned
+                             people in the current arrangement
+        """
+        return (self.num_full_sites, len(self.assignments))
+
+    def get_upper_bound(self) -> Tuple[int, int]:
+        """
+        Returns:
+            Tuple[int, int]: highest score that any arrangement in the
+                             current branch could have
+        """
+        num_full_sites = self.num_full_sites + sum(
+            not site.is_full and self.can_become_full(site)
+            for site in self.sites)
+        num_people = len(self.assignments) + sum(
+            len(self.domains[index]) > 0 for index in self.unassigned)
+        return (num_full_sites, num_people)
+
+    def assign(self,
+               index: int,
+               site: Site) -> bool:
+        """
+        Same as ForwardCheckingSearch.assign but keeps count of the full
+        sites.
+        """
+        was_full = site.is_full
+        result = super().assign(index, site)
+        self.num_full_sites += site.is_full - was_full
+        return result
+
+    def unassign(self,
+                 index: int,
+                 site: Site,
+                 trail_length: int) -> None:
+        """
+        Same as ForwardCheckingSearch.unassign but keeps count of the full
+        sites.
+        """
+        was_full = site.is_full
+        super().unassign(index, site, trail_length)
+        self.num_full_sites += site.is_full - was_full
+
+    def skip(self,
+             index: int) -> None:
+        """
+        Leaves a person without a site for the rest of the branch.
+        """
+        self.unassigned.discard(index)
+        self.unassigned_mask ^= 1 << index
+        self.update_supplies(self.people[index], -1)
+        for site_id in list(self.domains[index]):
+            self.remove_candidate(index, site_id)
+
+    def unskip(self,
+               index: int,
+               trail_length: int) -> None:
+        """
+        Reverses self.skip.
+        """
+        self.undo(trail_length)
+        self.update_supplies(self.people[index], 1)
+        self.unassigned_mask ^= 1 << index
+        self.unassigned.add(index)
+
+    def run(self,
+            deadline: Optional[float] = None) -> SiteArrangement:
+        """
+        Searches until the best arrangement is proven or the deadline
+        passes. The sites are left as they were before the search.
+
+        Args:
+            deadline (Optional[float]): time.perf_counter() value after which
+                                        the search stops
+
+        Returns:
+            SiteArrangement: best arrangement found
+        """
+        self.deadline = deadline
+        self.timed_out = False
+        self.improve()
+        return self.best_arrangement
+
+    def improve(self) -> None:
+        """
+        Recursive step of self.run.
+        """
+        self.stats.record_node(len(self.assignments))
+
+        # Out of time
+        if self.deadline is not None and time.perf_counter() > self.deadline:
+            self.timed_out = True
+
+        # Base Case: everyone has been assigned or skipped. Once out of time,
+        # the current arrangement is kept as well if it is the best so far.
+        if not self.unassigned or self.timed_out:
+            score = self.get_score()
+            if self.best_score is None or score > self.best_score:
+                self.best_score = score
+                self.best_arrangement = self.freeze()
+                if self.verbose:
+                    elapsed = time.perf_counter() - self.start_time
+                    print(f"Found an arrangement with {score[0]} of "
+                          f"{len(self.sites)} sites full and {score[1]} of "
+                          f"{len(self.people)} people assigned after "
+                          f"{elapsed:.2f} seconds.")
+            return
+
+        # Nothing in this branch can beat the best arrangement
+        if (self.best_score is not None and
+                self.get_upper_bound() <= self.best_score):
+            return
+
+        index = self.select_person()
+        for site in self.order_sites(index):
+            trail_length = len(self.trail)
+            try:
+                self.assign(index, site)
+                self.improve()
+            finally:
+                self.unassign(index, site, trail_length)
+
+        trail_length = len(self.trail)
+        try:
+            self.skip(index)
+            self.improve()
+        finally:
+            self.unskip(index, trail_length)
+
+
+@typechecked
+def find_best_site_arrangement(
+    people: List[DecalMember],
+    deadline_seconds: Optional[float] = None,
+    break_symmetry: bool = True,
+    verbose: bool = True,
+    stats: Optional[SearchStats] = None) -> SiteArrangement:
+    """
+    Finds the arrangement with the most full sites, and then the most
+    assigned people, that can be found within deadline_seconds. Unlike
+    create_site_arrangements, this always returns something useful when no
+    arrangement fills every site.
+
+    The first half of the time is spent looking for an arrangement where
+    every site is full and everyone is assigned. If there is none, the rest
+    goes to an AnytimeSearch.
+
+    Args:
+        people (List[DecalMember]): people to assign
+        deadline_seconds (Optional[float]): stop after this many seconds and
+            return the best arrangement so far. None means search until the
+            best arrangement is proven.
+        break_symmetry (bool): refer to create_site_arrangements
+        verbose (bool): if True, progress is printed every time a better
+                        arrangement is found
+        stats (Optional[SearchStats]): counters for both searches (refer to
+                                       SearchStats)
+
+    Returns:
+        SiteArrangement: best arrangement found
+    """
+    assert all([person.assigned_site is None for person in people])
+
+    deadline = None
+    if deadline_seconds is not None:
+        deadline = time.perf_counter() + deadline_seconds
+
+    # A perfect arrangement cannot be beaten and the pruning of 'full' mode
+    # finds one much faster, so spend the first half of the time looking
+    # for one
+    perfect = list(iter_site_arrangements(
+        people, 'full', max_results=1,
+        deadline_seconds=None if deadline_seconds is None
+        else deadline_seconds / 2,
+        break_symmetry=break_symmetry, stats=stats))
+    if perfect:
+        if verbose:
+            print("Found an arrangement where every site is full.")
+        return perfect[0]
+
+    search = AnytimeSearch(people, break_symmetry, verbose, stats)
+    if stats is None:
+        arrangement = search.run(deadline)
+    else:
+        with stats.time_phase('search'):
+            arrangement = search.run(deadline)
+    if verbose and not search.timed_out:
+        print("No better arrangement exists.")
+    return arrangement
+
+
+@typechecked
+def group_equivalent_sites(sites: List[Site]) -> List[List[Site]]:
+    """
+    Groups the sites that are interchangeable, i.e. that take place at the
+    same school at the same time (e.g. Harding A and Harding B). Swapping
+    the people of two interchangeable sites that have no one assigned yet
+    leads to an arrangement that works just as well.
+
+    Args:
+        sites (List[Site])
+
+    Returns:
+        List[List[Site]]: groups of 2 or more sites, ordered by site ID
+    """
+    groups = {}
+    for site in sorted(sites, key=lambda site: site.id):
+        key = (site.school.name, site.time_id)
+        groups.setdefault(key, []).append(site)
+    return [group for group in groups.values() if len(group) > 1]
+
+
+def iter_product(iterators: List[Iterator]) -> Iterator[tuple]:
+    """
+    Same as itertools.product, but the iterators are only read as far as
+    needed. One item is taken from each iterator in turn and combined with
+    the items already taken from the others, so every combination is
+    yielded once, as soon as its last item is taken.
+
+    Args:
+        iterators (List[Iterator]): iterators to combine
+
+    Yields:
+        tuple: one item of each iterator, in the same order
+    """
+    if not iterators:
+        yield ()
+        return
+
+    taken = [[] for _ in iterators]
+    active = list(range(len(iterators)))
+    while active:
+        for position in list(active):
+            item = next(iterators[position], None)
+            if item is None:
+                # Nothing can be combined with an empty iterator
+                if not taken[position]:
+                    return
+                active.remove(position)
+                continue
+            yield from itertools.product(*taken[:position], [item],
+                                         *taken[position + 1:])
+            taken[position].append(item)
+
+
+def combine_searches(searches: List[ForwardCheckingSearch],
+                     deadline: Optional[float] = None
+                     ) -> Iterator[SiteArrangement]:
+    """
+    Searches groups of people and sites that do not affect each other
+    (refer to find_components) side by side and yields every combination of
+    their arrangements. Unlike ForwardCheckingSearch.search, the sites do
+    not hold the arrangement that was just yielded.
+
+    Args:
+        searches (List[ForwardCheckingSearch]): one search per group
+        deadline (Optional[float]): refer to ForwardCheckingSearch.search
+
+    Yields:
+        SiteArrangement
+    """
+    # Where everyone outside of the searches is
+    base = get_scenario().person_sites[:]
+    iterators = [search.search(deadline) for search in searches]
+    try:
+        for combination in iter_product(iterators):
+            sites = array('i', base)
+            for search, arrangement in zip(searches, combination):
+                for person in search.people:
+                    sites[person.index] = arrangement.sites[person.index]
+            new_site_arrangement = SiteArrangement()
+            new_site_arrangement.sites = sites
+            yield new_site_arrangement
+    finally:
+        for iterator in reversed(iterators):
+            iterator.close()
+
+
+@typechecked
+def iter_site_arrangements(
+    people: List[DecalMember],
+    mode: Literal['full', 'partial'],
+    max_results: Optional[int] = None,
+    deadline_seconds: Optional[float] = None,
+    break_symmetry: bool = True,
+    transposition_table_size: int = 100000,
+    stats: Optional[SearchStats] = None) -> Iterator[SiteArrangement]:
+    """
+    Yields SiteArrangement objects one at a time, each as soon as it is
+    found. Nothing is searched for until the next arrangement is asked for,
+    so the first arrangement only takes as long as it takes to find one.
+
+    While the iterator is paused, the sites hold the arrangement that was
+    just yielded. Exhaust or close the iterator (e.g. by breaking out of a
+    for loop) before unfreezing any arrangement.
+
+    If the people split into groups that do not affect each other (refer to
+    find_components), each group is searched on its own and the
+    arrangements are combined with combine_searches. The sites then hold
+    the last arrangement found in each group instead.
+
+    Args:
+        people (List[DecalMember]): people to assign
+        mode (Literal['full', 'partial']): refer to create_site_arrangements
+        max_results (Optional[int]): stop after this many arrangements.
+                                     None means no limit.
+        deadline_seconds (Optional[float]): stop after this many seconds.
+                                            None means no limit.
+        break_symmetry (bool): refer to create_site_arrangements
+        transposition_table_size (int): refer to create_site_arrangements
+        stats (Optional[SearchStats]): refer to create_site_arrangements
+
+    Yields:
+        SiteArrangement
+    """
+    assert all([person.assigned_site is None for person in people])
+
+    deadline = None
+    if deadline_seconds is not None:
+        deadline = time.perf_counter() + deadline_seconds
+
+    if max_results is not None and max_results <= 0:
+        return
+
+    if stats is None:
+        stats = SearchStats()
+
+    # Don't bother searching if a quick check proves there is no arrangement,
+    # and leave out the availabilities that no arrangement can use
+    with stats.time_phase('presolve'):
+        reasons = explain_infeasibility(people, mode)
+        if not reasons:
+            bounds = bound_availabilities(people, mode)
+            reasons = bounds.reasons
+    if reasons:
+        print(format_reasons(reasons))
+        return
+
+    with stats.time_phase('setup'):
+        searches = [ForwardCheckingSearch(
+                        component_people, mode, break_symmetry,
+                        transposition_table_size, stats=stats,
+                        availability_masks=bounds.masks,
+                        sites=component_sites)
+                    for component_people, component_sites
+                    in find_components(people, bounds.masks)]
+    if len(searches) == 1:
+        arrangements = searches[0].search(deadline)
+    else:
+        arrangements = combine_searches(searches, deadline)
+    try:
+        num_results = 0
+        while max_results is None or num_results < max_results:
+            # Only the time spent searching counts, not the time the caller
+            # spends with each arrangement
+            with stats.time_phase('search'):
+                arrangement = next(arrangements, None)
+            if arrangement is None:
+                break
+            num_results += 1
+            yield arrangement
+    finally:
+        arrangements.close()
+
+
+@typechecked
+def keep_top_site_arrangements(arrangements: Iterator[SiteArrangement],
+                               k: int) -> List[SiteArrangement]:
+    """
+    Keeps the k arrangements with the highest scores (refer to
+    Site.score_person) in a heap, so that no more than k arrangements are
+    ever held in memory.
+
+    Args:
+        arrangements (Iterator[SiteArrangement]): e.g. iter_site_arrangements
+        k (int): number of arrangements to keep
+
+    Returns:
+        List[SiteArrangement]: best arrangement first. Ties keep the order
+                               in which the arrangements were found.
+    """
+    # Entries are (score, -position, arrangement) so that the root of the
+    # heap is always the arrangement that would be dropped first
+    heap = []
+    for position, arrangement in enumerate(arrangements):
+        entry = (arrangement.score, -position, arrangement)
+        if len(heap) < k:
+            heapq.heappush(heap, entry)
+        elif entry[:2] > heap[0][:2]:
+            heapq.heapreplace(heap, entry)
+
+    return [arrangement for _, _, arrangement in sorted(
+        heap, key=lambda entry: entry[:2], reverse=True)]
+
+
+@typechecked
+def create_site_arrangements(
+    people: List[DecalMember],
+    mode: Literal['full', 'partial'],
+    break_symmetry: bool = True,
+    transposition_table_size: int = 100000,
+    max_results: Optional[int] = None,
+    deadline_seconds: Optional[float] = None,
+    top_k: Optional[int] = None,
+    stats: Optional[SearchStats] = None) -> List[SiteArrangement]:
+    """
+    Creates a list of SiteArrangement objects.
+
+    Every person in people has to be assigned to a site that passes
+    Site.validate_person. People who were already assigned to a site before
+    calling this function (e.g. confirmed site leaders) stay where they are.
+
+    The search only starts if explain_infeasibility and
+    bound_availabilities find no reason why no arrangement can exist.
+    Otherwise the reasons are printed.
+
+    Args:
+        people (List[DecalMember]): people to assign
+        mode (Literal['full', 'partial']): indicates one of the two modes
+            'full':    All sites must be having a driver and the appropriate
+                       number of each class that results in a total of 4-5
+                       people
+            'partial': All sites may have less than the max number per class
+                       of people
+        break_symmetry (bool): if True, arrangements that only differ by
+            swapping the people of interchangeable sites (refer to
+            group_equivalent_sites) are only returned once
+        transposition_table_size (int): maximum number of entries in the
+            transposition table (refer to TranspositionTable). 0 turns the
+            table off.
+        max_results (Optional[int]): refer to iter_site_arrangements
+        deadline_seconds (Optional[float]): refer to iter_site_arrangements
+        top_k (Optional[int]): if given, only the top_k arrangements with the
+            highest scores are kept, best first (refer to
+            keep_top_site_arrangements)
+        stats (Optional[SearchStats]): if given, filled in with the number
+            of nodes, prunes, backtracks and arrangements, the depths
+            reached and the time of each phase (refer to SearchStats)
+
+    Returns:
+        List[SiteArrangement]: every working arrangement
+    """
+    # Record start time
+    start_time = time.time()
+
+    arrangements = iter_site_arrangements(
+        people, mode, max_results, deadline_seconds, break_symmetry,
+        transposition_table_size, stats)
+    if top_k is None:
+        working_site_arrangements = list(arrangements)
+    else:
+        working_site_arrangements = keep_top_site_arrangements(arrangements,
+                                                               top_k)
+
+    # Record the amount of time and how many working site arrangements
+    # are created
+    elapsed = time.time() - start_time
+    elapsed_mins = elapsed // 60
+    elapsed_sec = (elapsed % 60) // 1
+    print(f"Creating {len(working_site_arrangements)} site arrangements "
+          f"took {elapsed_mins} minutes and {elapsed_sec} seconds.")
+
+    return working_site_arrangements
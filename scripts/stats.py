@@ -0,0 +1,154 @@
+"""
+Counters that show where the search spends its time.
+
+Pass a SearchStats to create_site_arrangements (or iter_site_arrangements,
+find_best_site_arrangement, ForwardCheckingSearch) and it is filled in as
+the search goes:
+
+    - num_nodes: number of nodes of the search tree
+    - num_solutions: number of arrangements found
+    - prunes_by_rule: how many times each rule of Site.validate_person took
+      a site out of someone's domain
+    - backtracks_by_reason: how many times the search backed up, and why
+    - depth_histogram[d]: number of nodes with d people assigned
+    - dead_end_histogram[d]: number of branches that ended with d people
+      assigned and no arrangement
+    - phase_times: seconds spent in each phase (presolve, setup, search)
+
+    stats = SearchStats(progress_callback=print, progress_interval=5.0)
+    create_site_arrangements(people, 'full', stats=stats)
+    stats.to_json("search_stats.json")
+"""
+import json
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, Optional
+
+from classes import VALIDATION_RULES
+from settings import typechecked
+
+
+# Why the search backs up (refer to ForwardCheckingSearch.assign and
+# ForwardCheckingSearch.expand)
+BACKTRACK_REASONS = [
+    'empty_domain',             # someone has no site left to go to
+    'not_enough_people',        # the people left cannot cover every site
+    'site_cannot_become_full',  # a site lost a candidate it needed
+    'not_full_at_end',          # everyone is assigned but a site isn't full
+    'timeout'                   # the deadline was reached
+]
+
+
+@typechecked
+class SearchStats:
+    def __init__(self,
+                 progress_callback: Optional[Callable] = None,
+                 progress_interval: float = 1.0):
+        """
+        Args:
+            progress_callback (Optional[Callable]): called with this object
+                every progress_interval seconds while the search runs
+            progress_interval (float): number of seconds between calls to
+                                       progress_callback
+        """
+        self.num_nodes = 0
+        self.num_solutions = 0
+        self.num_transposition_hits = 0
+        self.num_symmetric_branches_skipped = 0
+        self.prunes_by_rule = dict.fromkeys(VALIDATION_RULES, 0)
+        self.backtracks_by_reason = dict.fromkeys(BACKTRACK_REASONS, 0)
+        self.depth_histogram = []
+        self.dead_end_histogram = []
+        self.phase_times = {}
+
+        self.progress_callback = progress_callback
+        self.progress_interval = progress_interval
+        self.start_time = time.perf_counter()
+        self.next_progress_time = self.start_time + progress_interval
+
+    def record_node(self,
+                    depth: int) -> None:
+        """
+        Counts a node with depth people assigned and calls the progress
+        callback if it is time to.
+        """
+        self.num_nodes += 1
+        if depth >= len(self.depth_histogram):
+            self.depth_histogram.extend(
+                [0] * (depth + 1 - len(self.depth_histogram)))
+        self.depth_histogram[depth] += 1
+
+        if self.progress_callback is not None:
+            now = time.perf_counter()
+            if now >= self.next_progress_time:
+                self.next_progress_time = now + self.progress_interval
+                self.progress_callback(self)
+
+    def record_backtrack(self,
+                         reason: str,
+                         depth: int) -> None:
+        """
+        Counts a branch that ended with depth people assigned without an
+        arrangement.
+
+        Args:
+            reason (str): one of BACKTRACK_REASONS
+            depth (int): number of people assigned
+        """
+        self.backtracks_by_reason[reason] += 1
+        if depth >= len(self.dead_end_histogram):
+            self.dead_end_histogram.extend(
+                [0] * (depth + 1 - len(self.dead_end_histogram)))
+        self.dead_end_histogram[depth] += 1
+
+    @contextmanager
+    def time_phase(self,
+                   phase: str) -> Iterator[None]:
+        """
+        Adds the time spent in the with block to phase_times[phase].
+        """
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phase_times[phase] = (self.phase_times.get(phase, 0.0) +
+                                       time.perf_counter() - start_time)
+
+    def to_dict(self) -> Dict[str, object]:
+        """
+        Returns:
+            Dict[str, object]: every counter, plus the number of seconds
+                               since this object was created
+        """
+        return {'num_nodes': self.num_nodes,
+                'num_solutions': self.num_solutions,
+                'num_transposition_hits': self.num_transposition_hits,
+                'num_symmetric_branches_skipped':
+                    self.num_symmetric_branches_skipped,
+                'prunes_by_rule': dict(self.prunes_by_rule),
+                'backtracks_by_reason': dict(self.backtracks_by_reason),
+                'depth_histogram': list(self.depth_histogram),
+                'dead_end_histogram': list(self.dead_end_histogram),
+                'phase_times': dict(self.phase_times),
+                'elapsed': time.perf_counter() - self.start_time}
+
+    def to_json(self,
+                path: Optional[str] = None) -> str:
+        """
+        Args:
+            path (Optional[str]): if given, the JSON is also written to this
+                                  file
+
+        Returns:
+            str: self.to_dict() as JSON
+        """
+        text = json.dumps(self.to_dict(), indent=2)
+        if path is not None:
+            with open(path, "w") as file:
+                file.write(text)
+        return text
+
+    def __str__(self):
+        return (f"{self.num_nodes:,} nodes, {self.num_solutions:,} "
+                f"arrangements after "
+                f"{time.perf_counter() - self.start_time:.1f} seconds")
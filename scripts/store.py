@@ -0,0 +1,369 @@
+"""
+Optional SQLite storage for the records and for arrangements.
+
+Everything else keeps the districts, schools, sites and people in the
+dictionaries of classes.py, which are gone once the program exits.
+SQLiteStore writes them, along with any number of arrangements, to a SQLite
+database (sqlite3 is part of the standard library) so that they can be
+queried across runs without rebuilding anything:
+
+    with SQLiteStore("data/site_coordination.db") as store:
+        store.save_records()
+        store.save_arrangements(arrangements, label="Fall 2024")
+        store.find_arrangements_with("Bob", "Harding Elementary")
+        store.find_sites_with_num_drivers(1)
+
+Time slots, people and sites are indexed, so these queries only look at the
+rows they need.
+
+Every scenario numbers its sites from 0, so sites have their own IDs in the
+database and are matched by school, name and time slot (refer to
+get_site_ids). Sites of different semesters can then be kept in the same
+database.
+"""
+import sqlite3
+import time
+from typing import Iterable, List, Optional, Tuple
+
+from classes import (SiteArrangement, export_records, ids_to_sites,
+                     import_records)
+from settings import typechecked
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS time_slots (
+    id INTEGER PRIMARY KEY,
+    time TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS districts (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS schools (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    district_id INTEGER NOT NULL REFERENCES districts(id)
+);
+CREATE TABLE IF NOT EXISTS sites (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    school_id INTEGER NOT NULL REFERENCES schools(id),
+    time_slot_id INTEGER NOT NULL REFERENCES time_slots(id),
+    UNIQUE (school_id, name, time_slot_id)
+);
+CREATE TABLE IF NOT EXISTS people (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    class TEXT NOT NULL,
+    drives INTEGER NOT NULL,
+    site_id INTEGER REFERENCES sites(id)
+);
+CREATE TABLE IF NOT EXISTS availabilities (
+    person_id INTEGER NOT NULL REFERENCES people(id),
+    time_slot_id INTEGER NOT NULL REFERENCES time_slots(id),
+    PRIMARY KEY (person_id, time_slot_id)
+);
+CREATE TABLE IF NOT EXISTS arrangements (
+    id INTEGER PRIMARY KEY,
+    label TEXT,
+    score INTEGER NOT NULL,
+    saved_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS arrangement_members (
+    arrangement_id INTEGER NOT NULL REFERENCES arrangements(id),
+    person_id INTEGER NOT NULL REFERENCES people(id),
+    site_id INTEGER NOT NULL REFERENCES sites(id),
+    PRIMARY KEY (arrangement_id, person_id)
+);
+CREATE INDEX IF NOT EXISTS sites_by_time_slot ON sites (time_slot_id);
+CREATE INDEX IF NOT EXISTS availabilities_by_time_slot
+    ON availabilities (time_slot_id);
+CREATE INDEX IF NOT EXISTS members_by_person
+    ON arrangement_members (person_id, site_id);
+CREATE INDEX IF NOT EXISTS members_by_site
+    ON arrangement_members (arrangement_id, site_id);
+"""
+
+
+@typechecked
+class SQLiteStore:
+    def __init__(self,
+                 path: str = ":memory:"):
+        """
+        Opens (and creates if needed) the database at path.
+
+        Args:
+            path (str): database file. ":memory:" keeps the database in
+                        memory until the store is closed.
+        """
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA foreign_keys = ON")
+        self.connection.executescript(SCHEMA)
+
+    def __enter__(self) -> "SQLiteStore":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def save_records(self) -> None:
+        """
+        Writes every time slot, district, school, site and person of the
+        active scenario, including the sites that people are assigned to
+        (e.g. confirmed SLs). Rows are matched by name (by school, name and
+        time slot for sites) and updated, so saved arrangements keep
+        pointing to the right people and sites.
+        """
+        records = export_records()
+        with self.connection:
+            cursor = self.connection.cursor()
+            cursor.executemany(
+                "INSERT OR IGNORE INTO time_slots (time) VALUES (?)",
+                [(site_time,) for site_time in records['times']])
+            cursor.executemany(
+                "INSERT OR IGNORE INTO districts (name) VALUES (?)",
+                [(name,) for name in records['districts']])
+            cursor.executemany(
+                "INSERT INTO schools (name, district_id) "
+                "SELECT ?, id FROM districts WHERE name = ? "
+                "ON CONFLICT (name) DO UPDATE SET "
+                "district_id = excluded.district_id",
+                records['schools'])
+            time_slot_ids = dict(cursor.execute(
+                "SELECT time, id FROM time_slots"))
+            cursor.executemany(
+                "INSERT OR IGNORE INTO sites (name, school_id, time_slot_id) "
+                "SELECT ?, id, ? FROM schools WHERE name = ?",
+                [(name, time_slot_ids[site_time], school_name)
+                 for _, name, site_time, school_name in records['sites']])
+            site_ids = self.get_site_ids()
+            cursor.executemany(
+                "INSERT INTO people (name, class, drives, site_id) "
+                "VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (name) DO UPDATE SET class = excluded.class, "
+                "drives = excluded.drives, site_id = excluded.site_id",
+                [(name, class_name, drives,
+                  None if site_id is None else site_ids[site_id])
+                 for class_name, name, drives, availabilities, site_id
+                 in records['people']])
+
+            person_ids = self.get_person_ids()
+            cursor.executemany(
+                "DELETE FROM availabilities WHERE person_id = ?",
+                [(person_ids[name],)
+                 for _, name, _, _, _ in records['people']])
+            cursor.executemany(
+                "INSERT INTO availabilities (person_id, time_slot_id) "
+                "VALUES (?, ?)",
+                [(person_ids[name], time_slot_ids[availability])
+                 for _, name, _, availabilities, _ in records['people']
+                 for availability in set(availabilities)])
+
+    def load_records(self) -> None:
+        """
+        Replaces every record of the active scenario with the ones in the
+        database (refer to import_records). Sites take their IDs in the
+        database, so they can be used with find_sites_with_num_drivers.
+        """
+        cursor = self.connection.cursor()
+        availabilities = {}
+        for name, site_time in cursor.execute(
+                "SELECT people.name, time_slots.time FROM availabilities "
+                "JOIN people ON people.id = availabilities.person_id "
+                "JOIN time_slots "
+                "ON time_slots.id = availabilities.time_slot_id "
+                "ORDER BY availabilities.time_slot_id"):
+            availabilities.setdefault(name, []).append(site_time)
+
+        import_records({
+            'times': [site_time for site_time, in cursor.execute(
+                "SELECT time FROM time_slots ORDER BY id")],
+            'districts': [name for name, in cursor.execute(
+                "SELECT name FROM districts ORDER BY id")],
+            'schools': cursor.execute(
+                "SELECT schools.name, districts.name FROM schools "
+                "JOIN districts ON districts.id = schools.district_id "
+                "ORDER BY schools.id").fetchall(),
+            'sites': cursor.execute(
+                "SELECT sites.id, sites.name, time_slots.time, schools.name "
+                "FROM sites "
+                "JOIN schools ON schools.id = sites.school_id "
+                "JOIN time_slots ON time_slots.id = sites.time_slot_id "
+                "ORDER BY sites.id").fetchall(),
+            'people': [(class_name, name, bool(drives),
+                        availabilities.get(name, []), site_id)
+                       for class_name, name, drives, site_id
+                       in cursor.execute(
+                           "SELECT class, name, drives, site_id FROM people "
+                           "ORDER BY id")]
+        })
+
+    def get_person_ids(self) -> dict:
+        """
+        Returns:
+            dict: maps the name of every person in the database to their ID
+        """
+        return dict(self.connection.execute("SELECT name, id FROM people"))
+
+    def get_site_ids(self) -> dict:
+        """
+        Returns:
+            dict: maps the ID of every site of the active scenario that is in
+                  the database to its ID in the database. Sites are matched
+                  by school, name and time slot.
+        """
+        keys_to_ids = {}
+        for school_name, name, site_time, site_id in self.connection.execute(
+                "SELECT schools.name, sites.name, time_slots.time, sites.id "
+                "FROM sites "
+                "JOIN schools ON schools.id = sites.school_id "
+                "JOIN time_slots ON time_slots.id = sites.time_slot_id"):
+            keys_to_ids[(school_name, name, site_time)] = site_id
+
+        site_ids = {}
+        for site in ids_to_sites.values():
+            key = (site.school.name, site.name, site.time)
+            if key in keys_to_ids:
+                site_ids[site.id] = keys_to_ids[key]
+        return site_ids
+
+    def save_arrangements(self,
+                          arrangements: Iterable[SiteArrangement],
+                          label: Optional[str] = None) -> List[int]:
+        """
+        Saves arrangements of the people in the database. Run save_records
+        first so that every person and site is in the database.
+
+        Args:
+            arrangements (Iterable[SiteArrangement]): arrangements to save
+            label (Optional[str]): e.g. the semester
+
+        Returns:
+            List[int]: ID of each arrangement in the database
+        """
+        person_ids = self.get_person_ids()
+        site_ids = self.get_site_ids()
+        arrangement_ids = []
+        with self.connection:
+            cursor = self.connection.cursor()
+            for arrangement in arrangements:
+                cursor.execute(
+                    "INSERT INTO arrangements (label, score, saved_at) "
+                    "VALUES (?, ?, ?)",
+                    (label, arrangement.score, time.time()))
+                arrangement_id = cursor.lastrowid
+                cursor.executemany(
+                    "INSERT INTO arrangement_members "
+                    "(arrangement_id, person_id, site_id) VALUES (?, ?, ?)",
+                    [(arrangement_id, person_ids[person.name],
+                      site_ids[site_id])
+                     for site_id, people
+                     in arrangement.get_members().items()
+                     for person in people])
+                arrangement_ids.append(arrangement_id)
+        return arrangement_ids
+
+    def load_arrangement(self,
+                         arrangement_id: int) -> SiteArrangement:
+        """
+        Args:
+            arrangement_id (int): ID from save_arrangements
+
+        Returns:
+            SiteArrangement: the arrangement, for the people of the active
+                             scenario with the same names and the sites with
+                             the same school, name and time slot
+        """
+        database_ids_to_site_ids = {
+            database_id: site_id
+            for site_id, database_id in self.get_site_ids().items()}
+        site_assignments = {}
+        for site_id, name in self.connection.execute(
+                "SELECT arrangement_members.site_id, people.name "
+                "FROM arrangement_members "
+                "JOIN people ON people.id = arrangement_members.person_id "
+                "WHERE arrangement_members.arrangement_id = ?",
+                (arrangement_id,)):
+            site_assignments.setdefault(
+                database_ids_to_site_ids[site_id], []).append(name)
+
+        arrangement = SiteArrangement()
+        arrangement.site_assignments = site_assignments
+        return arrangement
+
+    def find_arrangements_with(self,
+                               person_name: str,
+                               school_name: Optional[str] = None
+                               ) -> List[int]:
+        """
+        e.g. every arrangement where Bob is at Harding Elementary
+
+        Args:
+            person_name (str): name of the person
+            school_name (Optional[str]): name of the school. None means any
+                                         school.
+
+        Returns:
+            List[int]: IDs of the arrangements
+        """
+        query = ("SELECT DISTINCT arrangement_members.arrangement_id "
+                 "FROM arrangement_members "
+                 "JOIN people ON people.id = arrangement_members.person_id "
+                 "JOIN sites ON sites.id = arrangement_members.site_id "
+                 "JOIN schools ON schools.id = sites.school_id "
+                 "WHERE people.name = ?")
+        parameters = [person_name]
+        if school_name is not None:
+            query += " AND schools.name = ?"
+            parameters.append(school_name)
+        query += " ORDER BY arrangement_members.arrangement_id"
+        return [arrangement_id for arrangement_id,
+                in self.connection.execute(query, parameters)]
+
+    def find_sites_with_num_drivers(self,
+                                    num_drivers: int,
+                                    arrangement_id: Optional[int] = None
+                                    ) -> List[Tuple[int, int]]:
+        """
+        e.g. every site that only has one driver
+
+        Args:
+            num_drivers (int): number of drivers
+            arrangement_id (Optional[int]): only look at this arrangement.
+                                            None means every arrangement.
+
+        Returns:
+            List[Tuple[int, int]]: (arrangement ID, site ID in the database)
+                                   of every site with exactly num_drivers
+                                   drivers
+        """
+        query = ("SELECT arrangement_members.arrangement_id, "
+                 "arrangement_members.site_id FROM arrangement_members "
+                 "JOIN people ON people.id = arrangement_members.person_id")
+        parameters = []
+        if arrangement_id is not None:
+            query += " WHERE arrangement_members.arrangement_id = ?"
+            parameters.append(arrangement_id)
+        query += (" GROUP BY arrangement_members.arrangement_id, "
+                  "arrangement_members.site_id "
+                  "HAVING SUM(people.drives) = ? ORDER BY 1, 2")
+        parameters.append(num_drivers)
+        return self.connection.execute(query, parameters).fetchall()
+
+    def find_people_available_at(self,
+                                 site_time: str) -> List[str]:
+        """
+        Args:
+            site_time (str): standardized time slot
+
+        Returns:
+            List[str]: names of everyone available at the time slot
+        """
+        return [name for name, in self.connection.execute(
+            "SELECT people.name FROM availabilities "
+            "JOIN people ON people.id = availabilities.person_id "
+            "JOIN time_slots ON time_slots.id = availabilities.time_slot_id "
+            "WHERE time_slots.time = ? ORDER BY people.id", (site_time,))]
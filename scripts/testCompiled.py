@@ -0,0 +1,114 @@
+import unittest
+import numpy as np
+from classes import (
+    DecalMember, StaffMember, SiteLeader, District,
+    check_all_sites_are_clear, clear_all_records
+)
+from compiled import CompiledProblem, iter_compiled_arrangements
+from solver import iter_site_arrangements
+
+
+MONDAY = "Monday 3PM - 4PM"
+TUESDAY = "Tuesday 3PM - 4PM"
+
+
+class TestCompiledProblem(unittest.TestCase):
+
+    def setUp(self):
+        clear_all_records()
+        school = District(name="EBAYC").add_school(name="Harding Elementary")
+        self.site_a = school.add_site(name="Harding A", time=MONDAY)
+        self.site_b = school.add_site(name="Harding B", time=TUESDAY)
+        self.people = [SiteLeader(f"SL {i}", i == 0, [MONDAY, TUESDAY])
+                       for i in range(2)]
+        self.people += [StaffMember("Staff", False, [TUESDAY])]
+        self.people += [DecalMember(f"Decal {i}", i < 2, [MONDAY, TUESDAY])
+                        for i in range(6)]
+
+    def test_get_allowed_matches_validate_person(self):
+        """
+        The array checks should agree with Site.validate_person in every
+        state that the search goes through
+        """
+        problem = CompiledProblem(self.people)
+        everyone = np.arange(len(problem.people))
+        for index, position in [(0, 0), (2, 1), (3, 0), (4, 0), (5, 0)]:
+            problem.assign(index, position)
+            site = problem.sites[position]
+            site.add_member(problem.people[index])
+
+            allowed = problem.get_allowed(everyone)
+            for i, person in enumerate(problem.people):
+                for j, site in enumerate(problem.sites):
+                    expected = bool(person.availability_mask &
+                                    site.time_bit) and (
+                                        site.validate_person(person))
+                    self.assertEqual(allowed[i, j], expected)
+            self.assertListEqual(list(problem.get_full_sites()),
+                                 [site.is_full for site in problem.sites])
+
+    def test_incremental_domains(self):
+        """
+        The domains and candidate counts kept by assign and unassign should
+        match recomputing them from scratch, and backing up should restore
+        them exactly
+        """
+        problem = CompiledProblem(self.people)
+        initial = [problem.allowed.copy(), problem.domain_sizes.copy(),
+                   problem.num_candidate_staff.copy(),
+                   problem.num_candidate_nonstaff.copy(),
+                   problem.num_candidate_drivers.copy(),
+                   problem.num_candidate_site_leaders.copy()]
+
+        trail_lengths = []
+        for index, position in [(0, 0), (2, 1), (3, 0), (4, 0), (5, 0)]:
+            trail_lengths.append((index, len(problem.trail)))
+            problem.assign(index, position)
+
+            unassigned = np.flatnonzero(problem.assignment < 0)
+            allowed = problem.get_allowed(unassigned)
+            np.testing.assert_array_equal(problem.allowed[unassigned],
+                                          allowed)
+            self.assertFalse(problem.allowed[problem.assignment >= 0].any())
+            np.testing.assert_array_equal(problem.domain_sizes[unassigned],
+                                          allowed.sum(axis=1))
+            np.testing.assert_array_equal(
+                problem.num_candidate_staff,
+                allowed[problem.in_staff[unassigned]].sum(axis=0))
+            np.testing.assert_array_equal(
+                problem.num_candidate_drivers,
+                allowed[problem.drives[unassigned]].sum(axis=0))
+
+        for index, trail_length in reversed(trail_lengths):
+            problem.unassign(index, trail_length)
+        for expected, actual in zip(initial, [
+                problem.allowed, problem.domain_sizes,
+                problem.num_candidate_staff, problem.num_candidate_nonstaff,
+                problem.num_candidate_drivers,
+                problem.num_candidate_site_leaders]):
+            np.testing.assert_array_equal(actual, expected)
+        self.assertListEqual(problem.trail, [])
+
+    def test_iter_compiled_arrangements(self):
+        """
+        Same arrangements as the object-based search in both modes
+        """
+        def get_keys(arrangements):
+            return sorted(str({site_id: sorted(names) for site_id, names
+                               in arrangement.site_assignments.items()})
+                          for arrangement in arrangements)
+
+        for mode in ['full', 'partial']:
+            expected = get_keys(iter_site_arrangements(self.people, mode,
+                                                       break_symmetry=False))
+            self.assertGreater(len(expected), 0)
+            self.assertListEqual(
+                get_keys(iter_compiled_arrangements(self.people, mode)),
+                expected)
+        self.assertTrue(check_all_sites_are_clear())
+        self.assertEqual(len(list(iter_compiled_arrangements(
+            self.people, 'full', max_results=2))), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+import unittest
+from classes import (
+    Scenario, check_all_sites_are_clear, ids_to_sites, names_to_schools,
+    times_to_sites
+)
+from generator import generate_cohort, get_time_slots
+from solver import create_site_arrangements
+
+
+class TestGenerateCohort(unittest.TestCase):
+
+    def test_generate_cohort(self):
+        """
+        1. Check the number of people of each class, schools and sites
+        2. Every person is available at the time of at least one site
+        3. The cohort can be searched straight away
+        """
+        with Scenario():
+            people = generate_cohort(num_site_leaders=4, num_staff=2,
+                                     num_nonstaff=10, num_sites=4,
+                                     num_schools=2, num_time_slots=3,
+                                     availability_density=0.5,
+                                     driver_fraction=0.5, seed=0)
+            self.assertEqual(len([p for p in people if p.leads_site]), 4)
+            self.assertEqual(len([p for p in people
+                                  if p.in_staff and not p.leads_site]), 2)
+            self.assertEqual(len([p for p in people if not p.in_staff]), 10)
+            self.assertEqual(len(names_to_schools), 2)
+            self.assertEqual(len(ids_to_sites), 4)
+            self.assertEqual(len(times_to_sites), 3)
+            for person in people:
+                self.assertTrue(set(person.availabilities) &
+                                set(times_to_sites))
+
+            arrangements = create_site_arrangements(people, 'partial',
+                                                    max_results=5)
+            self.assertEqual(len(arrangements), 5)
+            self.assertTrue(check_all_sites_are_clear())
+
+    def test_generate_cohort_extremes(self):
+        """
+        A density of 1 makes everyone available at every time slot and a
+        driver fraction of 0 means no one drives
+        """
+        with Scenario():
+            people = generate_cohort(num_site_leaders=2, num_staff=0,
+                                     num_nonstaff=6, num_sites=2,
+                                     num_time_slots=7,
+                                     availability_density=1.0,
+                                     driver_fraction=0.0)
+            for person in people:
+                self.assertTupleEqual(person.availabilities,
+                                      tuple(get_time_slots(7)))
+                self.assertFalse(person.drives)
+            self.assertListEqual(create_site_arrangements(people, 'full'), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
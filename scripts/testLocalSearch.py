@@ -0,0 +1,83 @@
+import itertools
+import unittest
+from unittest import mock
+from classes import (
+    DecalMember, StaffMember, SiteLeader, District, Scenario,
+    check_all_sites_are_clear, clear_all_records, ids_to_sites
+)
+from generator import generate_cohort
+from local_search import improve_site_arrangement
+from solver import create_site_arrangements
+
+
+MONDAY = "Monday 3PM - 4PM"
+TUESDAY = "Tuesday 3PM - 4PM"
+
+
+class TestLocalSearch(unittest.TestCase):
+
+    def setUp(self):
+        clear_all_records()
+        school = District(name="EBAYC").add_school(name="Harding Elementary")
+        school.add_site(name="Harding A", time=MONDAY)
+        school.add_site(name="Harding B", time=TUESDAY)
+        self.people = [SiteLeader("SL 0", True, [MONDAY, TUESDAY]),
+                       SiteLeader("SL 1", False, [MONDAY, TUESDAY]),
+                       StaffMember("Staff", False, [TUESDAY])]
+        self.people += [DecalMember(f"Decal {i}", i == 0, [MONDAY, TUESDAY])
+                        for i in range(6)]
+
+    def get_sizes(self, arrangement):
+        return sorted(len(names)
+                      for names in arrangement.site_assignments.values())
+
+    def test_improve_empty_arrangement(self):
+        """
+        Starting from nothing, the search should find an arrangement where
+        both sites are full and everyone is assigned
+        """
+        arrangement = improve_site_arrangement(self.people, 10.0, seed=0,
+                                               max_moves=2000, verbose=False)
+        self.assertListEqual(self.get_sizes(arrangement), [4, 5])
+        self.assertTrue(check_all_sites_are_clear())
+
+        # Installing the result passes every rule
+        arrangement.unfreeze()
+        self.assertTrue(all(site.is_full for site in ids_to_sites.values()))
+
+    def test_improve_keeps_best_exact_score(self):
+        """
+        Starting from the best arrangement of the exact search, the score can
+        only go up
+        """
+        best = create_site_arrangements(self.people, 'full', top_k=1)[0]
+        arrangement = improve_site_arrangement(self.people, 10.0, start=best,
+                                               seed=1, max_moves=500,
+                                               verbose=False)
+        self.assertListEqual(self.get_sizes(arrangement), [4, 5])
+        self.assertGreaterEqual(arrangement.score, best.score)
+
+    def test_same_seed_same_arrangement(self):
+        """
+        With a seed and max_moves, the result doesn't depend on how fast the
+        moves are made: the clock runs 10 times faster in the second search,
+        which reaches 80% of the time budget instead of 8%
+        """
+        results = []
+        for step in [0.001, 0.01]:
+            clock = itertools.count(step=step)
+            with Scenario():
+                people = generate_cohort(num_site_leaders=12, num_staff=8,
+                                         num_nonstaff=40, num_sites=12,
+                                         num_time_slots=6,
+                                         availability_density=0.4)
+                with mock.patch("local_search.time.perf_counter",
+                                lambda: next(clock)):
+                    arrangement = improve_site_arrangement(
+                        people, 12.5, seed=0, max_moves=1000, verbose=False)
+                results.append(arrangement.site_assignments)
+        self.assertDictEqual(results[0], results[1])
+
+
+if __name__ == "__main__":
+    unittest.main()
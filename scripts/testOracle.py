@@ -0,0 +1,103 @@
+import unittest
+from classes import (
+    DecalMember, SiteLeader, District, Scenario, clear_all_records
+)
+from compiled import iter_compiled_arrangements
+from generator import generate_cohort, generate_planted_cohort
+from oracle import (brute_force_site_arrangements, compare_with_brute_force,
+                    get_arrangement_key)
+from solver import iter_site_arrangements
+
+
+MONDAY = "Monday 3PM - 4PM"
+
+
+class TestOracle(unittest.TestCase):
+
+    def test_brute_force_site_arrangements(self):
+        """
+        Same cohort as test_create_site_arrangements_full: 2 ways to place
+        the SLs * C(6, 3) ways to split the decal members
+        """
+        clear_all_records()
+        school = District(name="EBAYC").add_school(name="Harding Elementary")
+        school.add_site(name="Harding A", time=MONDAY)
+        school.add_site(name="Harding B", time=MONDAY)
+        people = [SiteLeader(f"SL {i}", True, [MONDAY]) for i in range(2)]
+        people += [DecalMember(f"Decal {i}", False, [MONDAY])
+                   for i in range(6)]
+
+        self.assertEqual(len(brute_force_site_arrangements(people, 'full')),
+                         40)
+
+        # In 'partial' mode, one site can also take 2 decal members and the
+        # other 4: 2 * (C(6, 3) + 2 * C(6, 2))
+        self.assertEqual(
+            len(brute_force_site_arrangements(people, 'partial')), 100)
+
+    def test_engines_match_brute_force(self):
+        """
+        Both engines find exactly the arrangements of the brute-force search
+        on small random cohorts, in both modes
+        """
+        engines = [
+            lambda people, mode: iter_site_arrangements(
+                people, mode, break_symmetry=False),
+            iter_compiled_arrangements
+        ]
+        for seed in range(20):
+            for mode in ['full', 'partial']:
+                with Scenario():
+                    people = generate_cohort(
+                        num_site_leaders=2, num_staff=seed % 2,
+                        num_nonstaff=5 + seed % 3, num_sites=2,
+                        num_time_slots=2, availability_density=0.6,
+                        driver_fraction=0.4, seed=seed)
+                    for engine in engines:
+                        missing, unsound, num_duplicates = (
+                            compare_with_brute_force(
+                                list(engine(people, mode)), people, mode))
+                        self.assertSetEqual(missing, set())
+                        self.assertSetEqual(unsound, set())
+                        self.assertEqual(num_duplicates, 0)
+
+    def test_many_completions_match_brute_force(self):
+        """
+        Branches with more than MAX_STORED_COMPLETIONS arrangements are not
+        stored in the transposition table, and neither are the branches above
+        them
+        """
+        with Scenario():
+            people = generate_cohort(
+                num_site_leaders=3, num_staff=1, num_nonstaff=5, num_sites=3,
+                num_time_slots=3, availability_density=0.6,
+                driver_fraction=0.4, seed=47)
+            missing, unsound, num_duplicates = compare_with_brute_force(
+                list(iter_site_arrangements(people, 'partial',
+                                            break_symmetry=False)),
+                people, 'partial')
+            self.assertSetEqual(missing, set())
+            self.assertSetEqual(unsound, set())
+            self.assertEqual(num_duplicates, 0)
+
+    def test_planted_arrangement_is_found(self):
+        """
+        The planted arrangement is among the arrangements of both engines
+        """
+        for num_sites in [4, 8]:
+            with Scenario():
+                people, planted = generate_planted_cohort(
+                    num_sites, num_schools=2, seed=num_sites)
+                key = get_arrangement_key(planted)
+                self.assertIn(key, [get_arrangement_key(arrangement)
+                                    for arrangement in iter_site_arrangements(
+                                        people, 'full',
+                                        break_symmetry=False)])
+                self.assertIn(key, [get_arrangement_key(arrangement)
+                                    for arrangement
+                                    in iter_compiled_arrangements(people,
+                                                                  'full')])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,9 +1,13 @@
 import unittest
+from typeguard import TypeCheckError
+import settings
 from classes import (
     DecalMember, StaffMember, SiteLeader,
     District, School, Site, SiteArrangement,
     add_to_times_to_sites, remove_from_times_to_sites, clear_all_sites,
-    times_to_sites, eliminate_all_sites
+    get_time_id,
+    times_to_sites, eliminate_all_sites, clear_all_records,
+    Scenario, get_scenario, names_to_people
 )
 
 class TestDecalMember(unittest.TestCase):
@@ -23,7 +27,7 @@ class TestDecalMember(unittest.TestCase):
                              availabilities=["Monday", "Wednesday"])
         self.assertEqual(member.name, "Alice")
         self.assertTrue(member.drives)
-        self.assertEqual(member.availabilities, ["Monday", "Wednesday"])
+        self.assertEqual(member.availabilities, ("Monday", "Wednesday"))
         self.assertIsNone(member.assigned_site)
         self.assertFalse(member.in_staff)
         self.assertFalse(member.leads_site)
@@ -50,6 +54,41 @@ class TestDecalMember(unittest.TestCase):
         member.remove_availability("Monday")
         self.assertNotIn("Monday", member.availabilities)
 
+    def test_decal_member_availability_mask(self):
+        """
+        Check that the availability bitmask follows the availabilities and
+        that people no longer share the default availabilities list
+        """
+        member = DecalMember(name="Alice", can_drive=True)
+        other = DecalMember(name="Bob", can_drive=True)
+        member.add_availability("Tuesday")
+        self.assertTupleEqual(other.availabilities, ())
+        self.assertEqual(other.availability_mask, 0)
+        with self.assertRaises(AttributeError):
+            member.availabilities.append("Wednesday")
+        with self.assertRaises(AttributeError):
+            member.availabilities = ("Wednesday",)
+
+        time_id = get_time_id("Tuesday")
+        self.assertEqual(get_time_id("Tuesday"), time_id)
+        self.assertEqual(member.availability_mask, 1 << time_id)
+        member.remove_availability("Tuesday")
+        self.assertEqual(member.availability_mask, 0)
+
+    def test_decal_member_find_potential_sites(self):
+        """
+        Check that the potential sites are refreshed when a site is added
+        """
+        district = District(name="EBAYC")
+        school = district.add_school(name="Malcolm X Elementary")
+        member = DecalMember(name="Alice",
+                             can_drive=True,
+                             availabilities=["Thursday 3PM - 4PM"])
+        self.assertListEqual(member.find_potential_sites(), [])
+        site = school.add_site(name="MX A", time="Thursday 3PM - 4PM")
+        self.assertListEqual(member.find_potential_sites(), [site])
+        school.remove_site(site)
+
 
 class TestStaffMember(unittest.TestCase):
 
@@ -65,8 +104,8 @@ class TestStaffMember(unittest.TestCase):
         """
         staff = StaffMember(name="Bob", can_drive=False)
         self.assertEqual(staff.name, "Bob")
-        self.assertFalse(staff.can_drive)
-        self.assertListEqual(staff.availabilities, [])
+        self.assertFalse(staff.drives)
+        self.assertTupleEqual(staff.availabilities, ())
         self.assertIsNone(staff.assigned_site)
         self.assertTrue(staff.in_staff)
         self.assertFalse(staff.leads_site)
@@ -201,6 +240,9 @@ class TestSite(unittest.TestCase):
         decal2 = DecalMember(name="David",
                              can_drive=False,
                              availabilities=["9:00 AM"])
+        decal3 = DecalMember(name="Henry",
+                             can_drive=False,
+                             availabilities=["9:00 AM"])
 
         self.assertTrue(site.validate_person(sl))
         site.add_member(sl)
@@ -220,6 +262,10 @@ class TestSite(unittest.TestCase):
         site.add_member(decal1)
         self.assertTrue(site.validate_person(decal2))
         site.add_member(decal2)
+        self.assertTrue(site.validate_person(decal3))
+        site.add_member(decal3)
+
+        # The site already has MAX_PEOPLE_PER_SITE people
         self.assertFalse(site.validate_person(
             DecalMember(name="Grace",
                         can_drive=True,
@@ -233,9 +279,10 @@ class TestSite(unittest.TestCase):
         sl = SiteLeader(name="Charlie",
                         can_drive=True,
                         availabilities=["9:00 AM"])
-        decal = DecalMember(name="Alice",
-                            can_drive=False,
-                            availabilities=["9:00 AM"])
+        decals = [DecalMember(name=name,
+                              can_drive=False,
+                              availabilities=["9:00 AM"])
+                  for name in ["Alice", "David", "Henry"]]
 
         site.add_member(sl)
         site.update_booleans()
@@ -243,10 +290,86 @@ class TestSite(unittest.TestCase):
         self.assertTrue(site.has_driver)
         self.assertFalse(site.is_full)
 
-        site.add_member(decal)
+        # A full site needs MIN_NONSTAFF_PER_SITE decal members
+        site.add_member(decals[0])
+        site.update_booleans()
+        self.assertFalse(site.is_full)
+
+        site.add_member(decals[1])
+        site.add_member(decals[2])
         site.update_booleans()
         self.assertTrue(site.is_full)
 
+    def test_running_counts(self):
+        """
+        Check that the running counts and booleans follow add_member,
+        remove_member and clear
+        """
+        district = District(name="EBAYC")
+        school = district.add_school(name="Malcolm X Elementary")
+        site = school.add_site(name="Harding A", time="9:00 AM")
+
+        sl = SiteLeader(name="Charlie",
+                        can_drive=False,
+                        availabilities=["9:00 AM"])
+        staff = StaffMember(name="Bob",
+                            can_drive=False,
+                            availabilities=["9:00 AM"])
+        decals = [DecalMember(name=f"Decal {i}",
+                              can_drive=(i == 0),
+                              availabilities=["9:00 AM"])
+                  for i in range(3)]
+
+        for person in [sl, staff] + decals:
+            site.add_member(person)
+        self.assertEqual(site.get_num_staff(), 2)
+        self.assertEqual(site.get_num_nonstaff(), 3)
+        self.assertEqual(site.get_num_drivers(), 1)
+        self.assertEqual(site.get_num_site_leaders(), 1)
+        self.assertTrue(site.has_driver)
+        self.assertTrue(site.is_full)
+
+        site.remove_member(decals[0])
+        self.assertEqual(site.get_num_nonstaff(), 2)
+        self.assertEqual(site.get_num_drivers(), 0)
+        self.assertFalse(site.has_driver)
+        self.assertFalse(site.is_full)
+
+        site.clear()
+        self.assertEqual(site.get_num_staff(), 0)
+        self.assertEqual(site.get_num_site_leaders(), 0)
+        self.assertFalse(site.has_site_leader)
+        self.assertIsNone(sl.assigned_site)
+
+    def test_score_person(self):
+        district = District(name="EBAYC")
+        school = district.add_school(name="Malcolm X Elementary")
+        site = school.add_site(name="Harding A", time="9:00 AM")
+        times = ["9:00 AM", "10:00 AM", "11:00 AM", "12:00 PM"]
+
+        sl = SiteLeader(name="Charlie",
+                        can_drive=True,
+                        availabilities=["9:00 AM"])
+        flexible_driver = DecalMember(name="Alice",
+                                      can_drive=True,
+                                      availabilities=times)
+        busy = DecalMember(name="Bob",
+                           can_drive=False,
+                           availabilities=["9:00 AM"])
+        site.add_member(sl)
+
+        # Backup driver (+1) and closer to 2 nonstaff per staff (+1)
+        self.assertEqual(site.score_person(flexible_driver), 2)
+
+        # Closer to 2 nonstaff per staff (+1) but Charlie is busy too (-1)
+        self.assertEqual(site.score_person(busy), 0)
+
+        # Members are not compared with themselves
+        site.add_member(flexible_driver)
+        self.assertEqual(site.score_person(flexible_driver), 2)
+        self.assertEqual(site.get_score(),
+                         site.score_person(sl) + 2)
+
 
 
 
@@ -279,6 +402,47 @@ class TestSiteArrangement(unittest.TestCase):
         self.assertIn(member, site.members)
         eliminate_all_sites()
 
+    def test_compact_encoding(self):
+        """
+        Arrangements are stored as the site ID of every person and can be
+        installed in bulk, with validation only when asked for
+        """
+        clear_all_records()
+        district = District(name="BUSD")
+        school = district.add_school("Malcolm X Elementary")
+        site = school.add_site(name="MX C", time="9:00 AM")
+        sl1 = SiteLeader("Charlie", True, ["9:00 AM"])
+        sl2 = SiteLeader("Dana", False, ["9:00 AM"])
+        decal = DecalMember("Eve", False, ["9:00 AM"])
+        site.add_member(decal)
+        site.add_member(sl1)
+
+        arrangement = SiteArrangement().freeze()
+        self.assertEqual(arrangement.sites[sl1.index], site.id)
+        self.assertEqual(arrangement.sites[sl2.index], -1)
+        self.assertListEqual(arrangement[site.id], ["Charlie", "Eve"])
+
+        copy = SiteArrangement()
+        copy.site_assignments = arrangement.site_assignments
+        self.assertEqual(copy.sites, arrangement.sites)
+
+        clear_all_sites()
+        arrangement.unfreeze(validate=True)
+        self.assertEqual(site.get_num_staff(), 1)
+        self.assertTrue(site.has_site_leader)
+        clear_all_sites()
+
+        # A site cannot have 2 SLs
+        invalid = SiteArrangement()
+        invalid.site_assignments = {site.id: ["Charlie", "Dana"]}
+        invalid.unfreeze()
+        self.assertEqual(site.get_num_site_leaders(), 2)
+        clear_all_sites()
+        with self.assertRaises(Exception):
+            invalid.unfreeze(validate=True)
+        self.assertListEqual(site.members, [])
+        eliminate_all_sites()
+
     def test_create_site_arrangements(self):
         district = District(name="EBAYC")
         school = district.add_school("Malcolm X Elementary")
@@ -342,5 +506,48 @@ class testSchoolAndSite(unittest.TestCase):
         self.assertNotIn(site2, school.sites)
 
 
+class TestScenario(unittest.TestCase):
+
+    def test_scenarios_are_independent(self):
+        """
+        1. Objects belong to the scenario that was active when they were
+           created
+        2. The module-level dictionaries follow the active scenario
+        3. The same names can be used in two scenarios
+        """
+        outer = get_scenario()
+        outer_person = DecalMember("Scenario Person", True, ["Monday"])
+        with Scenario() as scenario:
+            self.assertIs(get_scenario(), scenario)
+            self.assertNotIn("Scenario Person", names_to_people)
+            person = DecalMember("Scenario Person", False, ["Tuesday"])
+            site = District("EBAYC").add_school("Harding").add_site(
+                "Harding A", "Tuesday")
+            site.add_member(person)
+            self.assertIs(names_to_people["Scenario Person"], person)
+            self.assertEqual(SiteArrangement().freeze()[site.id],
+                             ["Scenario Person"])
+        self.assertIs(get_scenario(), outer)
+        self.assertIs(person.scenario, scenario)
+        self.assertIs(names_to_people["Scenario Person"], outer_person)
+        self.assertNotIn("Tuesday", times_to_sites)
+
+class TestProductionMode(unittest.TestCase):
+
+    def test_runtime_checks_are_on(self):
+        """
+        The tests must run with the runtime type checks on.
+        1. Check that production mode is off
+        2. Check that a wrong type is caught
+        3. Check that the domain classes use __slots__
+        """
+        self.assertFalse(settings.PRODUCTION)
+        with self.assertRaises(TypeCheckError):
+            DecalMember("Alice", "yes", ["Monday 2PM - 3PM"])
+        person = DecalMember("Bob", True, ["Monday 2PM - 3PM"])
+        with self.assertRaises(AttributeError):
+            person.nickname = "Bobby"
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,171 @@
+import unittest
+from classes import (
+    DecalMember, SiteLeader, District, clear_all_records
+)
+from presolve import bound_availabilities, explain_infeasibility
+from solver import create_site_arrangements
+
+
+MONDAY = "Monday 3PM - 4PM"
+TUESDAY = "Tuesday 3PM - 4PM"
+WEDNESDAY = "Wednesday 3PM - 4PM"
+
+
+class TestMatchSiteLeaders(unittest.TestCase):
+
+    def setUp(self):
+        clear_all_records()
+        district = District(name="EBAYC")
+        self.school = district.add_school(name="Harding Elementary")
+
+    def test_perfect_matching(self):
+        """
+        SL 1 can only lead the Monday site, so SL 2 has to take Tuesday even
+        though SL 2 is listed first
+        """
+        self.school.add_site(name="Harding A", time=MONDAY)
+        self.school.add_site(name="Harding B", time=TUESDAY)
+        sl2 = SiteLeader("SL 2", True, [MONDAY, TUESDAY])
+        sl1 = SiteLeader("SL 1", True, [MONDAY])
+
+        self.assertListEqual(explain_infeasibility([sl2, sl1], 'partial'), [])
+
+    def test_unmatched_site_leaders(self):
+        """
+        Both SLs can only lead on Monday, so 1 SL is left without a site
+        """
+        self.school.add_site(name="Harding A", time=MONDAY)
+        self.school.add_site(name="Harding B", time=TUESDAY)
+        sl1 = SiteLeader("SL 1", True, [MONDAY])
+        sl2 = SiteLeader("SL 2", True, [MONDAY, WEDNESDAY])
+
+        self.assertListEqual(
+            explain_infeasibility([sl1, sl2], 'partial'),
+            ["2 site leaders (SL 2 and SL 1) can only lead 1 site: "
+             "Harding A (Monday 3PM - 4PM)"])
+
+    def test_partial_mode_allows_sites_without_site_leaders(self):
+        self.school.add_site(name="Harding A", time=MONDAY)
+        self.school.add_site(name="Harding B", time=TUESDAY)
+        sl = SiteLeader("SL", True, [MONDAY])
+
+        self.assertIn("Tuesday 3PM - 4PM has 1 site without a site leader "
+                      "but no site leaders available",
+                      explain_infeasibility([sl], 'full'))
+        self.assertListEqual(explain_infeasibility([sl], 'partial'), [])
+
+    def test_create_site_arrangements_skips_search(self):
+        """
+        The Tuesday site has no possible SL, so the search never starts
+        """
+        self.school.add_site(name="Harding A", time=MONDAY)
+        self.school.add_site(name="Harding B", time=TUESDAY)
+        people = [SiteLeader("SL", True, [MONDAY, TUESDAY])]
+        people += [DecalMember(f"Decal {i}", True, [MONDAY, TUESDAY])
+                   for i in range(6)]
+
+        self.assertListEqual(create_site_arrangements(people, 'full'), [])
+
+
+class TestExplainInfeasibility(unittest.TestCase):
+
+    def setUp(self):
+        clear_all_records()
+        district = District(name="EBAYC")
+        self.school = district.add_school(name="Harding Elementary")
+
+    def test_driver_shortage(self):
+        """
+        Both Monday sites need a driver of their own but only Ann drives
+        """
+        self.school.add_site(name="Harding A", time=MONDAY)
+        self.school.add_site(name="Harding B", time=MONDAY)
+        people = [SiteLeader("Ann", True, [MONDAY]),
+                  SiteLeader("Ben", False, [MONDAY])]
+        people += [DecalMember(f"Decal {i}", False, [MONDAY])
+                   for i in range(6)]
+
+        self.assertListEqual(
+            explain_infeasibility(people, 'full'),
+            [f"{MONDAY} has 2 sites without a driver but only 1 driver "
+             f"available (Ann)"])
+        self.assertListEqual(explain_infeasibility(people, 'partial'), [])
+
+    def test_only_site_leader(self):
+        """
+        Ann is the only SL for the Tuesday site, which leaves the Monday
+        site without one. Dan has nowhere to go at all.
+        """
+        self.school.add_site(name="Harding A", time=MONDAY)
+        self.school.add_site(name="Harding B", time=TUESDAY)
+        people = [SiteLeader("Ann", True, [MONDAY, TUESDAY]),
+                  DecalMember("Dan", True, [WEDNESDAY])]
+
+        reasons = explain_infeasibility(people, 'full')
+        self.assertIn("Dan is not available at the time of any site",
+                      reasons)
+        self.assertIn(f"Ann is the only site leader available for Harding A "
+                      f"({MONDAY}) and Harding B ({TUESDAY})", reasons)
+
+    def test_capacity(self):
+        """
+        6 decal members can only go to the one Monday site, which fits 4.
+        The search is never started.
+        """
+        self.school.add_site(name="Harding A", time=MONDAY)
+        people = [SiteLeader("SL", True, [MONDAY])]
+        people += [DecalMember(f"Decal {i}", False, [MONDAY])
+                   for i in range(6)]
+
+        self.assertIn(f"{MONDAY} has 1 site with room for 4 more decal "
+                      f"members but 6 decal members cannot go anywhere else",
+                      explain_infeasibility(people, 'partial'))
+        self.assertListEqual(create_site_arrangements(people, 'partial'), [])
+
+
+class TestBoundAvailabilities(unittest.TestCase):
+
+    def setUp(self):
+        clear_all_records()
+        district = District(name="EBAYC")
+        self.school = district.add_school(name="Harding Elementary")
+
+    def test_full_time_slot_is_dropped(self):
+        """
+        4 decal members can only go on Monday, which fills the Monday site,
+        so the other decal members cannot go on Monday either
+        """
+        self.school.add_site(name="Harding A", time=MONDAY)
+        self.school.add_site(name="Harding B", time=TUESDAY)
+        people = [DecalMember(f"Monday {i}", False, [MONDAY])
+                  for i in range(4)]
+        people += [DecalMember(f"Both {i}", False, [MONDAY, TUESDAY])
+                   for i in range(2)]
+
+        bounds = bound_availabilities(people, 'partial')
+        self.assertTrue(bounds.is_feasible())
+        self.assertDictEqual(bounds.dropped, {"Both 0": [MONDAY],
+                                              "Both 1": [MONDAY]})
+
+    def test_needed_people_are_kept(self):
+        """
+        Ann is the only SL who can lead on Monday, so they cannot lead on
+        Tuesday. Once Cat can also only lead on Monday, Ann has nowhere left.
+        """
+        self.school.add_site(name="Harding A", time=MONDAY)
+        self.school.add_site(name="Harding B", time=TUESDAY)
+        people = [SiteLeader("Ann", True, [MONDAY, TUESDAY]),
+                  SiteLeader("Ben", True, [TUESDAY])]
+        people += [DecalMember(f"Decal {i}", False, [MONDAY, TUESDAY])
+                   for i in range(6)]
+
+        bounds = bound_availabilities(people, 'full')
+        self.assertTrue(bounds.is_feasible())
+        self.assertDictEqual(bounds.dropped, {"Ann": [TUESDAY]})
+
+        people.append(SiteLeader("Cat", True, [MONDAY]))
+        bounds = bound_availabilities(people, 'full')
+        self.assertFalse(bounds.is_feasible())
+
+if __name__ == "__main__":
+    unittest.main()
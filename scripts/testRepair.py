@@ -0,0 +1,78 @@
+import unittest
+from classes import (
+    DecalMember, SiteArrangement, SiteLeader, District,
+    check_all_sites_are_clear, clear_all_records
+)
+from repair import repair_site_arrangement
+
+
+MONDAY = "Monday 3PM - 4PM"
+TUESDAY = "Tuesday 3PM - 4PM"
+
+
+class TestRepairSiteArrangement(unittest.TestCase):
+
+    def setUp(self):
+        """
+        A full Monday site and a full Tuesday site
+        """
+        clear_all_records()
+        school = District(name="EBAYC").add_school(name="Harding Elementary")
+        self.monday = school.add_site(name="Harding A", time=MONDAY)
+        self.tuesday = school.add_site(name="Harding B", time=TUESDAY)
+        self.people = [SiteLeader("Monday SL", True, [MONDAY]),
+                       SiteLeader("Tuesday SL", True, [MONDAY, TUESDAY])]
+        self.people += [DecalMember(f"Monday {i}", False, [MONDAY, TUESDAY])
+                        for i in range(3)]
+        self.people += [DecalMember(f"Tuesday {i}", False, [MONDAY, TUESDAY])
+                        for i in range(3)]
+        self.arrangement = SiteArrangement()
+        self.arrangement.site_assignments = {
+            self.monday.id: ["Monday SL", "Monday 0", "Monday 1", "Monday 2"],
+            self.tuesday.id: ["Tuesday SL", "Tuesday 0", "Tuesday 1",
+                              "Tuesday 2"]}
+
+    def test_replacement_keeps_everyone_else(self):
+        """
+        A late response on Monday replaces a Monday decal member who dropped
+        out. Nobody on Tuesday is searched again.
+        """
+        late = DecalMember("Late", False, [MONDAY])
+        repaired = repair_site_arrangement(
+            self.arrangement, added=[late], removed=[self.people[2]],
+            verbose=False)
+
+        self.assertListEqual(
+            sorted(repaired.site_assignments[self.monday.id]),
+            ["Late", "Monday 1", "Monday 2", "Monday SL"])
+        self.assertListEqual(repaired.site_assignments[self.tuesday.id],
+                             self.arrangement.site_assignments[
+                                 self.tuesday.id])
+        self.assertTrue(check_all_sites_are_clear())
+
+    def test_changed_availability_moves_few_people(self):
+        """
+        Tuesday 0 can no longer make it on Tuesday, so they swap with one
+        of the Monday decal members
+        """
+        self.people[5].remove_availability(TUESDAY)
+        repaired = repair_site_arrangement(
+            self.arrangement, changed=[self.people[5]], verbose=False)
+
+        repaired.unfreeze(validate=True)
+        self.assertIs(self.people[5].assigned_site, self.monday)
+        self.assertEqual(self.people[0].assigned_site, self.monday)
+        self.assertEqual(len([person for person in self.people
+                              if person.assigned_site is self.tuesday and
+                              person.name.startswith("Monday")]), 1)
+        self.monday.clear()
+        self.tuesday.clear()
+
+        # Nobody else can lead on Monday, so there is no arrangement
+        # without the Monday SL
+        self.assertIsNone(repair_site_arrangement(
+            repaired, removed=[self.people[0]], verbose=False))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+import os
+import pickle
+import tempfile
+import unittest
+from classes import (
+    DecalMember, SiteArrangement, SiteLeader, District, clear_all_records,
+    ids_to_sites, names_to_people, names_to_schools
+)
+from snapshot import SNAPSHOT_VERSION, load_snapshot, save_snapshot
+
+
+MONDAY = "Monday 3PM - 4PM"
+TUESDAY = "Tuesday 3PM - 4PM"
+
+
+class TestSnapshot(unittest.TestCase):
+
+    def setUp(self):
+        clear_all_records()
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "data",
+                                 "snapshot.pickle")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_round_trip(self):
+        """
+        Everything comes back after clearing the records: sites with their
+        IDs, availabilities with the same bitmasks, the confirmed SL and the
+        saved arrangement
+        """
+        school = District(name="EBAYC").add_school(name="Harding Elementary")
+        # Create the Tuesday time slot first so that the IDs are not simply
+        # in the order of the sites
+        decal = DecalMember("Decal", False, [TUESDAY, MONDAY])
+        monday = school.add_site(name="Harding A", time=MONDAY)
+        tuesday = school.add_site(name="Harding B", time=TUESDAY)
+        sl = SiteLeader("SL", True, [MONDAY])
+        monday.add_member(sl)
+        arrangement = SiteArrangement()
+        arrangement.site_assignments = {monday.id: ["SL"],
+                                        tuesday.id: ["Decal"]}
+        masks = {person.name: person.availability_mask
+                 for person in [decal, sl]}
+
+        save_snapshot(2, [arrangement], path=self.path)
+        clear_all_records()
+        snapshot = load_snapshot(self.path)
+
+        self.assertEqual(snapshot.stage, 2)
+        self.assertListEqual(list(names_to_schools), ["Harding Elementary"])
+        self.assertEqual(ids_to_sites[tuesday.id].time, TUESDAY)
+        for name, mask in masks.items():
+            self.assertEqual(names_to_people[name].availability_mask, mask)
+        self.assertIs(names_to_people["SL"].assigned_site,
+                      ids_to_sites[monday.id])
+        self.assertDictEqual(snapshot.arrangements[0].site_assignments,
+                             arrangement.site_assignments)
+
+    def test_other_version_is_refused(self):
+        save_snapshot(1, path=self.path)
+        with open(self.path, "rb") as file:
+            contents = pickle.load(file)
+        contents['version'] = SNAPSHOT_VERSION + 1
+        with open(self.path, "wb") as file:
+            pickle.dump(contents, file)
+
+        with self.assertRaises(Exception):
+            load_snapshot(self.path)
+
+
+if __name__ == "__main__":
+    unittest.main()
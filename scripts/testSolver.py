@@ -0,0 +1,436 @@
+import json
+import multiprocessing
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from classes import (
+    DecalMember, StaffMember, SiteLeader, District, Scenario,
+    check_all_sites_are_clear, clear_all_records, names_to_people
+)
+from solver import (ForwardCheckingSearch, TranspositionTable,
+                    create_site_arrangements, find_best_site_arrangement,
+                    group_equivalent_sites, iter_site_arrangements,
+                    keep_top_site_arrangements)
+from parallel import (iter_components_parallel,
+                      iter_site_arrangements_parallel, solve_portfolio)
+from generator import generate_planted_cohort
+from stats import SearchStats
+
+
+MONDAY = "Monday 3PM - 4PM"
+TUESDAY = "Tuesday 3PM - 4PM"
+WEDNESDAY = "Wednesday 3PM - 4PM"
+
+
+class TestForwardCheckingSearch(unittest.TestCase):
+
+    def setUp(self):
+        clear_all_records()
+        district = District(name="EBAYC")
+        self.school = district.add_school(name="Harding Elementary")
+
+    def test_create_site_arrangements_full(self):
+        """
+        2 sites at the same time with 2 SLs who drive and 6 decal members.
+        Each site gets 1 SL and 3 decal members:
+        2 ways to place the SLs * C(6, 3) ways to split the decal members
+        """
+        self.school.add_site(name="Harding A", time=MONDAY)
+        self.school.add_site(name="Harding B", time=MONDAY)
+        people = [SiteLeader(f"SL {i}", True, [MONDAY]) for i in range(2)]
+        people += [DecalMember(f"Decal {i}", False, [MONDAY])
+                   for i in range(6)]
+
+        arrangements = create_site_arrangements(people, 'full',
+                                                break_symmetry=False)
+        self.assertEqual(len(arrangements), 40)
+        self.assertTrue(check_all_sites_are_clear())
+        for arrangement in arrangements:
+            for names in arrangement.site_assignments.values():
+                self.assertEqual(len(names), 4)
+
+    def test_create_site_arrangements_break_symmetry(self):
+        """
+        Harding A and Harding B are interchangeable, so each arrangement is
+        only found once instead of once per way of ordering the 2 sites
+        """
+        site_a = self.school.add_site(name="Harding A", time=MONDAY)
+        site_b = self.school.add_site(name="Harding B", time=MONDAY)
+        other_school = District(name="BUSD").add_school(name="Franklin")
+        site_c = other_school.add_site(name="Franklin A", time=MONDAY)
+        self.assertListEqual(group_equivalent_sites([site_c, site_b, site_a]),
+                             [[site_a, site_b]])
+
+        other_school.remove_site(site_c)
+
+        people = [SiteLeader(f"SL {i}", True, [MONDAY]) for i in range(2)]
+        people += [DecalMember(f"Decal {i}", False, [MONDAY])
+                   for i in range(6)]
+
+        # Half of the 40 arrangements from test_create_site_arrangements_full
+        arrangements = create_site_arrangements(people, 'full')
+        self.assertEqual(len(arrangements), 20)
+
+    def test_search_stats(self):
+        """
+        Same cohort as test_create_site_arrangements_full. Once a site has a
+        SL, the other SL is pruned from it by the 'site_leader' rule.
+        """
+        self.school.add_site(name="Harding A", time=MONDAY)
+        self.school.add_site(name="Harding B", time=MONDAY)
+        people = [SiteLeader(f"SL {i}", True, [MONDAY]) for i in range(2)]
+        people += [DecalMember(f"Decal {i}", False, [MONDAY])
+                   for i in range(6)]
+
+        progress = []
+        stats = SearchStats(progress_callback=progress.append,
+                            progress_interval=0.0)
+        arrangements = create_site_arrangements(people, 'full',
+                                                break_symmetry=False,
+                                                stats=stats)
+        self.assertEqual(stats.num_solutions, len(arrangements))
+        self.assertEqual(sum(stats.depth_histogram), stats.num_nodes)
+        self.assertEqual(stats.depth_histogram[0], 1)
+        self.assertGreater(stats.prunes_by_rule['site_leader'], 0)
+        self.assertGreater(stats.prunes_by_rule['people_cap'], 0)
+        self.assertEqual(len(progress), stats.num_nodes)
+        self.assertSetEqual(set(stats.phase_times),
+                            {'presolve', 'setup', 'search'})
+
+        exported = json.loads(stats.to_json())
+        self.assertEqual(exported['num_solutions'], 40)
+        self.assertEqual(sum(exported['backtracks_by_reason'].values()),
+                         sum(exported['dead_end_histogram']))
+
+    def test_transposition_table(self):
+        """
+        The transposition table should not change which arrangements are
+        found, only how fast they are found
+        """
+        self.school.add_site(name="Harding A", time=MONDAY)
+        self.school.add_site(name="Harding B", time=TUESDAY)
+        people = [SiteLeader(f"SL {i}", True, [MONDAY, TUESDAY])
+                  for i in range(2)]
+        people += [StaffMember("Staff", False, [MONDAY, TUESDAY])]
+        people += [DecalMember(f"Decal {i}", i == 0, [MONDAY, TUESDAY])
+                   for i in range(6)]
+
+        def get_assignments(transposition_table_size):
+            search = ForwardCheckingSearch(people, 'full',
+                                           transposition_table_size=(
+                                               transposition_table_size))
+            assignments = [arrangement.site_assignments
+                           for arrangement in search.search()]
+            return search, sorted(map(str, assignments))
+
+        search, with_table = get_assignments(1000)
+        _, without_table = get_assignments(0)
+        self.assertListEqual(with_table, without_table)
+        self.assertGreater(search.transposition_table.num_hits, 0)
+        self.assertTrue(check_all_sites_are_clear())
+
+    def test_transposition_table_eviction(self):
+        table = TranspositionTable(max_entries=2)
+        table.put((1, 0), ())
+        table.put((2, 0), ())
+        table.get((1, 0))
+        table.put((3, 0), ())
+        self.assertEqual(len(table), 2)
+        self.assertIsNone(table.get((2, 0)))
+        self.assertEqual(table.get((1, 0)), ())
+
+    def test_iter_site_arrangements(self):
+        """
+        Check max_results, deadline_seconds and that the sites are cleared
+        when the caller stops early
+        """
+        self.school.add_site(name="Harding A", time=MONDAY)
+        self.school.add_site(name="Harding B", time=MONDAY)
+        people = [SiteLeader(f"SL {i}", True, [MONDAY]) for i in range(2)]
+        people += [DecalMember(f"Decal {i}", False, [MONDAY])
+                   for i in range(6)]
+
+        arrangements = iter_site_arrangements(people, 'full')
+        first = next(arrangements)
+        self.assertFalse(check_all_sites_are_clear())
+        arrangements.close()
+        self.assertTrue(check_all_sites_are_clear())
+        self.assertEqual(len(first.site_assignments), 2)
+
+        self.assertEqual(
+            len(list(iter_site_arrangements(people, 'full', max_results=3))),
+            3)
+        self.assertListEqual(
+            list(iter_site_arrangements(people, 'full', deadline_seconds=0)),
+            [])
+        self.assertTrue(check_all_sites_are_clear())
+
+    def test_iter_site_arrangements_parallel(self):
+        """
+        Splitting the tree between worker processes should find the same
+        arrangements as the serial search
+        """
+        self.school.add_site(name="Harding A", time=MONDAY)
+        self.school.add_site(name="Harding B", time=TUESDAY)
+        people = [SiteLeader(f"SL {i}", True, [MONDAY, TUESDAY])
+                  for i in range(2)]
+        people += [StaffMember("Staff", False, [MONDAY, TUESDAY])]
+        people += [DecalMember(f"Decal {i}", i == 0, [MONDAY, TUESDAY])
+                   for i in range(6)]
+
+        serial = sorted(str(arrangement.site_assignments) for arrangement
+                        in iter_site_arrangements(people, 'full'))
+        for split_depth in [None, 1, 3]:
+            parallel = sorted(
+                str(arrangement.site_assignments) for arrangement
+                in iter_site_arrangements_parallel(people, 'full',
+                                                   num_workers=2,
+                                                   split_depth=split_depth))
+            self.assertListEqual(parallel, serial)
+        self.assertTrue(check_all_sites_are_clear())
+
+    def test_parallel_early_exit(self):
+        """
+        Finding every arrangement of this cohort takes far longer than
+        finding the first one. Once the first one is found, the workers are
+        stopped even though there is no deadline.
+        """
+        with Scenario():
+            people, _ = generate_planted_cohort(num_sites=8,
+                                                availability_density=0.3)
+            for iter_parallel in [iter_site_arrangements_parallel,
+                                  iter_components_parallel]:
+                start_time = time.perf_counter()
+                arrangements = iter_parallel(people, 'full', num_workers=2,
+                                             max_results=1)
+                self.assertEqual(len(list(arrangements)), 1)
+                self.assertLess(time.perf_counter() - start_time, 10)
+                self.assertListEqual(multiprocessing.active_children(), [])
+
+    def test_parallel_streams_results(self):
+        """
+        With split_depth=0 the whole tree is a single subtree that takes far
+        too long to finish, so the first arrangement has to be sent before
+        the subtree is done
+        """
+        with Scenario():
+            people, _ = generate_planted_cohort(num_sites=8,
+                                                availability_density=0.3)
+            start_time = time.perf_counter()
+            arrangements = iter_site_arrangements_parallel(
+                people, 'full', num_workers=1, split_depth=0)
+            self.assertIsNotNone(next(arrangements))
+            arrangements.close()
+            self.assertLess(time.perf_counter() - start_time, 10)
+            self.assertListEqual(multiprocessing.active_children(), [])
+
+    def test_independent_components(self):
+        """
+        Nobody is available on both days, so each day is searched on its own
+        and the 40 arrangements of each day (refer to
+        test_create_site_arrangements_full) are combined
+        """
+        for name, site_time in [("A", MONDAY), ("B", MONDAY),
+                           ("C", TUESDAY), ("D", TUESDAY)]:
+            self.school.add_site(name=f"Harding {name}", time=site_time)
+        people = []
+        for day, site_time in [("Monday", MONDAY), ("Tuesday", TUESDAY)]:
+            people += [SiteLeader(f"{day} SL {i}", True, [site_time])
+                       for i in range(2)]
+            people += [DecalMember(f"{day} {i}", False, [site_time])
+                       for i in range(6)]
+
+        serial = sorted(str(arrangement.site_assignments) for arrangement
+                        in iter_site_arrangements(people, 'full',
+                                                  break_symmetry=False))
+        self.assertEqual(len(serial), 40 * 40)
+        self.assertEqual(len(set(serial)), len(serial))
+        self.assertTrue(check_all_sites_are_clear())
+
+        parallel = sorted(str(arrangement.site_assignments) for arrangement
+                          in iter_components_parallel(people, 'full',
+                                                      num_workers=2,
+                                                      break_symmetry=False))
+        self.assertListEqual(parallel, serial)
+
+    def test_components_keep_confirmed_site_leaders(self):
+        """
+        Nobody else can go to the Wednesday site, so it is in none of the
+        groups of find_components, but its confirmed SL should stay there
+        in every arrangement
+        """
+        wednesday = self.school.add_site(name="Harding W", time=WEDNESDAY)
+        wednesday.add_member(SiteLeader("Confirmed SL", True, [WEDNESDAY]))
+        for name, site_time in [("A", MONDAY), ("C", TUESDAY)]:
+            self.school.add_site(name=f"Harding {name}", time=site_time)
+        people = []
+        for day, site_time in [("Monday", MONDAY), ("Tuesday", TUESDAY)]:
+            people += [SiteLeader(f"{day} SL", True, [site_time])]
+            people += [DecalMember(f"{day} {i}", False, [site_time])
+                       for i in range(4)]
+
+        serial = [arrangement.site_assignments for arrangement
+                  in iter_site_arrangements(people, 'partial')]
+        parallel = [arrangement.site_assignments for arrangement
+                    in iter_components_parallel(people, 'partial',
+                                                num_workers=2)]
+        self.assertEqual(len(parallel), 1)
+        self.assertListEqual(parallel[0][wednesday.id], ["Confirmed SL"])
+        self.assertListEqual(parallel, serial)
+
+    def test_search_strategies(self):
+        """
+        Every ordering finds the same arrangements, and the portfolio returns
+        one of them
+        """
+        self.school.add_site(name="Harding A", time=MONDAY)
+        self.school.add_site(name="Harding B", time=TUESDAY)
+        people = [SiteLeader(f"SL {i}", True, [MONDAY, TUESDAY])
+                  for i in range(2)]
+        people += [StaffMember("Staff", False, [MONDAY, TUESDAY])]
+        people += [DecalMember(f"Decal {i}", i == 0, [MONDAY, TUESDAY])
+                   for i in range(6)]
+
+        def get_key(arrangement):
+            return str({site_id: sorted(names) for site_id, names
+                        in arrangement.site_assignments.items()})
+
+        def get_assignments(**options):
+            search = ForwardCheckingSearch(people, 'full', **options)
+            return sorted(get_key(arrangement)
+                          for arrangement in search.search())
+
+        expected = get_assignments()
+        self.assertGreater(len(expected), 0)
+        self.assertListEqual(
+            get_assignments(variable_ordering='drivers_first',
+                            value_ordering='fewest_candidates'),
+            expected)
+        self.assertListEqual(get_assignments(seed=3), expected)
+
+        arrangement = solve_portfolio(people, 'full')
+        self.assertIn(get_key(arrangement), expected)
+        self.assertTrue(check_all_sites_are_clear())
+
+    def test_keep_top_site_arrangements(self):
+        self.school.add_site(name="Harding A", time=MONDAY)
+        self.school.add_site(name="Harding B", time=TUESDAY)
+        people = [SiteLeader(f"SL {i}", True, [MONDAY, TUESDAY])
+                  for i in range(2)]
+        people += [StaffMember("Staff", False, [MONDAY])]
+        people += [DecalMember(f"Decal {i}", i < 2, [MONDAY, TUESDAY][:i + 1])
+                   for i in range(6)]
+
+        scores = sorted((arrangement.score for arrangement
+                         in iter_site_arrangements(people, 'full')),
+                        reverse=True)
+        self.assertGreater(len(scores), 3)
+
+        top = create_site_arrangements(people, 'full', top_k=3)
+        self.assertListEqual([arrangement.score for arrangement in top],
+                             scores[:3])
+        self.assertEqual(len(keep_top_site_arrangements(iter([]), 3)), 0)
+
+    def test_concurrent_scenarios(self):
+        """
+        Two scenarios with the same names are solved in two threads at once
+        and each gets the same result as when it is solved on its own
+        """
+        def solve(num_decal_members):
+            District(name="EBAYC").add_school(
+                name="Harding Elementary").add_site(name="Harding A",
+                                                    time=MONDAY)
+            people = [SiteLeader("SL", True, [MONDAY])]
+            people += [DecalMember(f"Decal {i}", False, [MONDAY])
+                       for i in range(num_decal_members)]
+            return len(create_site_arrangements(people, 'partial'))
+
+        scenarios = [Scenario(), Scenario()]
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            futures = [executor.submit(scenario.run, solve, num_decal_members)
+                       for scenario, num_decal_members in zip(scenarios,
+                                                              [3, 4])]
+            self.assertListEqual([future.result() for future in futures],
+                                 [1, 1])
+        self.assertEqual(len(scenarios[1].names_to_people), 5)
+
+        # The default scenario was never touched
+        self.assertNotIn("SL", names_to_people)
+
+    def test_create_site_arrangements_no_driver(self):
+        """
+        No one can drive, so no site can ever be full
+        """
+        self.school.add_site(name="Harding A", time=MONDAY)
+        people = [SiteLeader("SL", False, [MONDAY])]
+        people += [DecalMember(f"Decal {i}", False, [MONDAY])
+                   for i in range(3)]
+
+        self.assertListEqual(create_site_arrangements(people, 'full'), [])
+        self.assertEqual(len(create_site_arrangements(people, 'partial')), 1)
+
+    def test_create_site_arrangements_too_many_people(self):
+        """
+        7 people cannot fit into a site with at most 5 people
+        """
+        self.school.add_site(name="Harding A", time=MONDAY)
+        people = [SiteLeader("SL", True, [MONDAY])]
+        people += [DecalMember(f"Decal {i}", True, [MONDAY])
+                   for i in range(6)]
+
+        self.assertListEqual(create_site_arrangements(people, 'partial'), [])
+
+    def test_find_best_site_arrangement(self):
+        """
+        Only 1 of the 2 sites can get a driver, so no arrangement is full.
+        The best one fills Harding A and puts everyone who is left into
+        Harding B.
+        """
+        self.school.add_site(name="Harding A", time=MONDAY)
+        self.school.add_site(name="Harding B", time=TUESDAY)
+        people = [SiteLeader(f"SL {i}", i == 0, [MONDAY, TUESDAY])
+                  for i in range(2)]
+        people += [DecalMember(f"Decal {i}", False, [MONDAY, TUESDAY])
+                   for i in range(7)]
+        self.assertListEqual(create_site_arrangements(people, 'full'), [])
+
+        arrangement = find_best_site_arrangement(people, verbose=False)
+        self.assertTrue(check_all_sites_are_clear())
+        sizes = sorted(len(names)
+                       for names in arrangement.site_assignments.values())
+        self.assertListEqual(sizes, [4, 5])
+
+        # Too many people: 2 full sites but 1 person left out
+        people.append(DecalMember("Decal 7", True, [MONDAY, TUESDAY]))
+        people.append(DecalMember("Decal 8", False, [MONDAY, TUESDAY]))
+        arrangement = find_best_site_arrangement(people, verbose=False)
+        sizes = sorted(len(names)
+                       for names in arrangement.site_assignments.values())
+        self.assertListEqual(sizes, [5, 5])
+
+    def test_forward_checking(self):
+        """
+        Once a site has a SL, the other SL loses it from their domain
+        """
+        site_a = self.school.add_site(name="Harding A", time=MONDAY)
+        site_b = self.school.add_site(name="Harding B", time=TUESDAY)
+        sl1 = SiteLeader("SL 1", True, [MONDAY, TUESDAY])
+        sl2 = SiteLeader("SL 2", True, [MONDAY, TUESDAY])
+        staff = StaffMember("Staff", False, [MONDAY])
+
+        search = ForwardCheckingSearch([sl1, sl2, staff], 'partial')
+        index1 = search.people.index(sl1)
+        index2 = search.people.index(sl2)
+        self.assertSetEqual(search.domains[index2], {site_a.id, site_b.id})
+
+        trail_length = len(search.trail)
+        self.assertTrue(search.assign(index1, site_a))
+        self.assertSetEqual(search.domains[index2], {site_b.id})
+
+        search.unassign(index1, site_a, trail_length)
+        self.assertSetEqual(search.domains[index2], {site_a.id, site_b.id})
+        self.assertTrue(check_all_sites_are_clear())
+
+
+if __name__ == "__main__":
+    unittest.main()
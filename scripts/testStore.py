@@ -0,0 +1,130 @@
+import unittest
+from classes import (
+    DecalMember, SiteArrangement, SiteLeader, District, Scenario,
+    clear_all_records, ids_to_sites, names_to_people
+)
+from store import SQLiteStore
+
+
+MONDAY = "Monday 3PM - 4PM"
+TUESDAY = "Tuesday 3PM - 4PM"
+
+
+class TestSQLiteStore(unittest.TestCase):
+
+    def setUp(self):
+        """
+        Two sites and two arrangements that swap Decal 0 and Decal 3
+        """
+        clear_all_records()
+        school = District(name="EBAYC").add_school(name="Harding Elementary")
+        other_school = District(name="OUSD").add_school(
+            name="Franklin Elementary")
+        self.harding = school.add_site(name="Harding A", time=MONDAY)
+        self.franklin = other_school.add_site(name="Franklin A", time=MONDAY)
+        self.sl = SiteLeader("SL", True, [MONDAY])
+        self.decals = [DecalMember(f"Decal {i}", i == 0, [MONDAY, TUESDAY])
+                       for i in range(6)]
+
+        self.arrangements = []
+        for harding, franklin in [(["SL", "Decal 0", "Decal 1", "Decal 2"],
+                                   ["Decal 3", "Decal 4", "Decal 5"]),
+                                  (["SL", "Decal 3", "Decal 1", "Decal 2"],
+                                   ["Decal 0", "Decal 4", "Decal 5"])]:
+            arrangement = SiteArrangement()
+            arrangement.site_assignments = {self.harding.id: harding,
+                                            self.franklin.id: franklin}
+            self.arrangements.append(arrangement)
+
+        self.store = SQLiteStore()
+        self.store.save_records()
+        self.arrangement_ids = self.store.save_arrangements(
+            self.arrangements, label="Fall")
+
+    def tearDown(self):
+        self.store.close()
+
+    def test_queries(self):
+        site_ids = self.store.get_site_ids()
+        self.assertListEqual(
+            self.store.find_arrangements_with("Decal 0",
+                                              "Harding Elementary"),
+            [self.arrangement_ids[0]])
+        self.assertListEqual(self.store.find_arrangements_with("Decal 1"),
+                             self.arrangement_ids)
+
+        # Decal 0 and the SL drive
+        self.assertListEqual(
+            self.store.find_sites_with_num_drivers(2),
+            [(self.arrangement_ids[0], site_ids[self.harding.id])])
+        self.assertListEqual(
+            self.store.find_sites_with_num_drivers(
+                0, self.arrangement_ids[0]),
+            [(self.arrangement_ids[0], site_ids[self.franklin.id])])
+
+        self.assertListEqual(self.store.find_people_available_at(TUESDAY),
+                             [f"Decal {i}" for i in range(6)])
+
+    def test_load(self):
+        """
+        Saving the records again does not duplicate anything, and everything
+        can be loaded into another scenario
+        """
+        self.store.save_records()
+        site_ids = self.store.get_site_ids()
+        with Scenario():
+            self.store.load_records()
+            self.assertEqual(len(names_to_people), 7)
+            self.assertEqual(len(ids_to_sites), 2)
+            franklin = ids_to_sites[site_ids[self.franklin.id]]
+            self.assertEqual(franklin.school.name, "Franklin Elementary")
+            self.assertTupleEqual(names_to_people["Decal 0"].availabilities,
+                                  (MONDAY, TUESDAY))
+            self.assertTrue(names_to_people["Decal 0"].drives)
+
+            arrangement = self.store.load_arrangement(
+                self.arrangement_ids[1])
+            self.assertDictEqual(
+                arrangement.site_assignments,
+                {site_ids[site_id]: names for site_id, names
+                 in self.arrangements[1].site_assignments.items()})
+
+    def test_several_scenarios(self):
+        """
+        The sites of another semester also start at ID 0, but they don't
+        replace the sites of the first one
+        """
+        with Scenario():
+            school = District(name="EBAYC").add_school(
+                name="Lincoln Elementary")
+            lincoln = school.add_site(name="Lincoln A", time=TUESDAY)
+            self.assertEqual(lincoln.id, self.harding.id)
+            SiteLeader("SL", True, [TUESDAY])
+            for i in range(3):
+                DecalMember(f"Decal {i}", True, [TUESDAY])
+            arrangement = SiteArrangement()
+            arrangement.site_assignments = {
+                lincoln.id: ["SL", "Decal 0", "Decal 1", "Decal 2"]}
+            self.store.save_records()
+            spring_ids = self.store.save_arrangements([arrangement],
+                                                      label="Spring")
+
+            loaded = self.store.load_arrangement(spring_ids[0])
+            self.assertDictEqual(loaded.site_assignments,
+                                 arrangement.site_assignments)
+
+        self.assertListEqual(
+            self.store.find_arrangements_with("Decal 0",
+                                              "Harding Elementary"),
+            [self.arrangement_ids[0]])
+        self.assertListEqual(
+            self.store.find_arrangements_with("Decal 0",
+                                              "Lincoln Elementary"),
+            spring_ids)
+        loaded = self.store.load_arrangement(self.arrangement_ids[1])
+        self.assertDictEqual(loaded.site_assignments,
+                             self.arrangements[1].site_assignments)
+
+
+if __name__ == "__main__":
+    unittest.main()